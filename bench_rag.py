@@ -0,0 +1,213 @@
+"""
+FitLife AI - RAG 파이프라인 오프라인 벤치마크
+API 키/네트워크 없이(src.fakes 대역 사용) FitLifeRAG.query의 처리량과 지연 시간을 측정합니다.
+
+    python bench_rag.py                                  # 기본: 문서 500/2000/10000개 × 동시 1/4/16
+    python bench_rag.py --sizes 1000 --concurrency 1,8 --queries 200
+    python bench_rag.py --llm-latency 0 --tokens-per-second 0   # LLM 대기를 빼고 검색/조립 비용만
+    python bench_rag.py --output bench_output.txt        # 결과 표를 파일로도 저장
+    python bench_rag.py --batch                          # query 대신 query_batch(max_concurrency=동시 수)
+
+같은 인자로 실행하면 같은 말뭉치/질문/응답이 만들어지므로 변경 전후 비교에 쓸 수 있습니다.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 프로젝트 루트 경로 설정
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import src.config as config
+
+FOODS = ["닭가슴살", "현미밥", "고구마", "연어", "두부", "브로콜리", "귀리", "계란", "아보카도", "그릭요거트",
+         "고등어", "시금치", "퀴노아", "블루베리", "아몬드", "렌틸콩", "단호박", "양배추", "토마토", "낫또"]
+NUTRIENTS = ["단백질", "식이섬유", "오메가3", "비타민C", "칼륨", "철분", "마그네슘", "칼슘"]
+EXERCISES = ["스쿼트", "플랭크", "런지", "버피", "푸시업", "걷기", "자전거", "수영", "요가", "데드리프트",
+             "스트레칭", "줄넘기", "계단 오르기", "케틀벨 스윙", "필라테스"]
+TARGETS = ["하체", "코어", "전신", "상체", "심폐지구력", "유연성"]
+CONDITIONS = ["당뇨", "고혈압", "무릎 통증", "허리 디스크", "고지혈증", "비만"]
+GOALS = ["다이어트", "근육량증가", "체력증진", "체형교정"]
+
+
+def make_corpus(size: int, seed: int):
+    """식품/운동 문서를 절반씩 결정적으로 생성합니다. (템플릿 조합이라 서로 비슷한 문서가 자연스럽게 섞임)"""
+    rng = random.Random(seed)
+    food, exercise = [], []
+    for i in range(size):
+        if i % 2 == 0:
+            name = rng.choice(FOODS)
+            nutrient = rng.choice(NUTRIENTS)
+            kcal = rng.randint(40, 400)
+            food.append({
+                "title": f"{name} 영양 정보 #{i}",
+                "content": (
+                    f"{name} 100g에는 약 {kcal}kcal와 {nutrient}이(가) 풍부합니다. "
+                    f"{rng.choice(CONDITIONS)} 관리 중이라면 {rng.choice(['아침', '점심', '저녁', '간식'])}에 "
+                    f"{rng.randint(50, 250)}g 정도 섭취하는 것을 권장합니다. "
+                    f"{rng.choice(GOALS)} 목표에 도움이 되며 {rng.choice(FOODS)}와(과) 함께 먹으면 좋습니다."
+                ),
+                "source": "bench"
+            })
+        else:
+            name = rng.choice(EXERCISES)
+            exercise.append({
+                "title": f"{name} 가이드 #{i}",
+                "content": (
+                    f"{name}은(는) {rng.choice(TARGETS)} 강화에 효과적인 운동입니다. "
+                    f"{rng.randint(2, 5)}세트 {rng.randint(8, 20)}회, 세트 사이 {rng.randint(30, 90)}초 휴식을 권장합니다. "
+                    f"{rng.choice(CONDITIONS)}이(가) 있다면 강도를 낮추고 {rng.choice(['천천히', '가볍게', '짧게'])} 진행하세요."
+                ),
+                "source": "bench"
+            })
+    return food, exercise
+
+
+def make_queries(n: int, seed: int):
+    rng = random.Random(seed + 1)
+    templates = [
+        "{c} 환자에게 좋은 {f} 식단 알려줘",
+        "{g}를 위한 {t} 운동 루틴 추천해줘",
+        "{f}의 {n} 함량과 효능은?",
+        "{c}이 있는데 {e} 해도 괜찮을까?",
+        "하루 {k}kcal로 {g} 식단 짜줘",
+    ]
+    queries = []
+    for _ in range(n):
+        queries.append(rng.choice(templates).format(
+            c=rng.choice(CONDITIONS), f=rng.choice(FOODS), g=rng.choice(GOALS), t=rng.choice(TARGETS),
+            n=rng.choice(NUTRIENTS), e=rng.choice(EXERCISES), k=rng.choice([1500, 1800, 2000, 2500])
+        ))
+    return queries
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def build_rag(size: int, args):
+    from src.fakes import FakeChatModel, FakeSupabaseClient, HashEmbeddings
+    from src.rag import FitLifeRAG, KnowledgeBase
+
+    # 말뭉치 크기마다 새 로컬 벡터 파일을 쓰도록 디렉터리 분리 (이전 크기의 문서가 섞이지 않게)
+    config.EMBEDDING_STORE_DIR = str(Path(args.workdir) / f"embeddings_{size}")
+    kb = KnowledgeBase(
+        supabase_client=FakeSupabaseClient(rpc_latency=args.rpc_latency),
+        embedding_model=HashEmbeddings(dim=args.dim)
+    )
+    food, exercise = make_corpus(size, args.seed)
+    kb.add_documents(food, category="food")
+    kb.add_documents(exercise, category="exercise")
+
+    llm = FakeChatModel(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens
+    )
+    return FitLifeRAG(kb=kb, llm=llm)
+
+
+def run_batch_level(rag, queries, concurrency: int, profile: dict):
+    """query_batch 한 번으로 처리 → (초당 질의 수, 호출 전체 시간을 항목 수만큼 반복한 목록)"""
+    requests = [
+        {"user_query": query, "user_profile": profile, "mode": "food" if "식단" in query else "general"}
+        for query in queries
+    ]
+    started = time.perf_counter()
+    rag.query_batch(requests, max_concurrency=concurrency)
+    wall = time.perf_counter() - started
+    return len(queries) / wall, [wall] * len(queries)
+
+
+def run_level(rag, queries, concurrency: int, profile: dict):
+    """
+    동시 concurrency개로 queries를 모두 처리 → (초당 질의 수, 질의별 지연 시간 목록)
+    쿼리 임베딩 캐시는 실제 서버처럼 켜 두므로 두 번째 단계부터는 같은 질문의 임베딩이 재사용됩니다.
+    """
+    def one(query):
+        started = time.perf_counter()
+        rag.query(query, profile, mode="food" if "식단" in query else "general")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, queries))
+    wall = time.perf_counter() - started
+    return len(queries) / wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FitLifeRAG.query 오프라인 벤치마크 (처리량 / p50 / p99)")
+    parser.add_argument("--sizes", default="500,2000,10000", help="말뭉치 문서 수 (쉼표 구분)")
+    parser.add_argument("--concurrency", default="1,4,16", help="동시 요청 수 (쉼표 구분)")
+    parser.add_argument("--queries", type=int, default=100, help="단계별 질의 수")
+    parser.add_argument("--backend", default="numpy", choices=["supabase", "numpy"], help="검색 백엔드")
+    parser.add_argument("--rpc-latency", type=float, default=0.02, help="가짜 match_documents 왕복 시간 (초)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="가짜 LLM 첫 토큰까지 시간 (초)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="가짜 LLM 생성 속도 (0이면 즉시)")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="가짜 LLM 응답 길이 (토큰)")
+    parser.add_argument("--dim", type=int, default=384, help="해시 임베딩 차원")
+    parser.add_argument("--answer-cache", action="store_true", help="의미 기반 응답 캐시 사용 (기본: 끔)")
+    parser.add_argument("--batch", action="store_true", help="FitLifeRAG.query_batch로 측정 (p50/p99는 배치 전체 시간)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 표를 저장할 파일 (예: bench_output.txt)")
+    args = parser.parse_args()
+
+    # 벤치마크 상태가 실제 데이터 디렉터리를 건드리지 않도록 임시 경로 사용
+    workdir = Path(tempfile.mkdtemp(prefix="fitlife_bench_"))
+    args.workdir = str(workdir)
+    config.VECTOR_BACKEND = args.backend
+    config.EMBEDDING_CACHE_PATH = None
+    config.KB_STATE_PATH = str(workdir / "kb_state.json")
+    config.ANSWER_CACHE_ENABLED = args.answer_cache
+    config.ANSWER_CACHE_PATH = None
+
+    sizes = [int(v) for v in args.sizes.split(",") if v.strip()]
+    levels = [int(v) for v in args.concurrency.split(",") if v.strip()]
+    queries = make_queries(args.queries, args.seed)
+    profile = {"goal": "다이어트", "diseases": ["당뇨"], "calories": 1800}
+
+    print("=" * 60)
+    print(f"🏁 FitLife RAG 벤치마크 (백엔드 {args.backend}, LLM {args.llm_latency}s + "
+          f"{args.answer_tokens}토큰 @ {args.tokens_per_second}/s, 질의 {args.queries}개)")
+    print("=" * 60)
+
+    rows = []
+    for size in sizes:
+        print(f"\n📚 문서 {size}개 말뭉치 구축 중...")
+        build_started = time.perf_counter()
+        rag = build_rag(size, args)
+        print(f"   구축 {time.perf_counter() - build_started:.1f}초")
+        rag.query(queries[0], profile)  # 워밍업
+
+        for concurrency in levels:
+            runner = run_batch_level if args.batch else run_level
+            qps, latencies = runner(rag, queries, concurrency, profile)
+            row = {
+                "docs": size,
+                "concurrency": concurrency,
+                "qps": qps,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000
+            }
+            rows.append(row)
+            print(f"   동시 {concurrency:3d}: {qps:7.2f} q/s | p50 {row['p50_ms']:8.1f}ms | p99 {row['p99_ms']:8.1f}ms")
+
+    lines = [f"{'docs':>8} {'conc':>5} {'q/s':>9} {'p50_ms':>10} {'p99_ms':>10}"]
+    for row in rows:
+        lines.append(f"{row['docs']:>8} {row['concurrency']:>5} {row['qps']:>9.2f} "
+                     f"{row['p50_ms']:>10.1f} {row['p99_ms']:>10.1f}")
+    table = "\n".join(lines)
+    print("\n" + table)
+    if args.output:
+        Path(args.output).write_text(table + "\n", encoding="utf-8")
+        print(f"\n💾 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
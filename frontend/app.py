@@ -6,9 +6,9 @@ import streamlit as st
 import sys
 import os
 import asyncio
+import uuid
 import pandas as pd
 import plotly.express as px
-import time
 import psycopg2
 from pathlib import Path
 from PIL import Image
@@ -27,11 +27,12 @@ load_dotenv()
 # 사용자 정의 모듈 임포트
 # (파일 경로가 src/rag/chain.py, src/vision/analysis.py 등에 있어야 함)
 try:
-    from src.rag.chain import FitLifeRAG
+    from src.rag.chain import FitLifeRAG, LLM_ERROR_MESSAGE
     from src.xai.explainer import HealthExplainer
     from src.models.user_profile import UserProfile
     from src.vision.image_analyzer import ImageAnalyzer  # v2.2 (analysis.py)
     from src.auth.manager import UserManager
+    from src.rag.daily_plans import DailyPlanStore, exercise_variant, food_variant, plan_profile_hash, plan_request
 except ImportError as e:
     st.error(f"모듈 임포트 오류: {e}")
     st.stop()
@@ -48,9 +49,11 @@ st.set_page_config(
 # 2. 세션 상태(Session State) 초기화
 # --------------------------------------------------------------------------
 if "messages" not in st.session_state: st.session_state.messages = []
+if "chat_session_id" not in st.session_state: st.session_state.chat_session_id = uuid.uuid4().hex  # 서버 측 대화 메모리 키
 if "rag" not in st.session_state: st.session_state.rag = None
 if "xai" not in st.session_state: st.session_state.xai = HealthExplainer()
 if "analyzer" not in st.session_state: st.session_state.analyzer = None  # 비전 분석기
+if "plan_store" not in st.session_state: st.session_state.plan_store = None  # 사전 계산 플랜 저장소
 
 # 인증 관련 상태
 if "user_manager" not in st.session_state: st.session_state.user_manager = UserManager()
@@ -72,6 +75,34 @@ def init_analyzer():
         with st.spinner("🔄 비전 AI(Gemini Vision) 모델 로딩 중..."):
             st.session_state.analyzer = ImageAnalyzer()
 
+def get_daily_plan(username: str, variant: str, profile: UserProfile) -> dict:
+    """
+    오늘의 플랜: 야간 배치(precompute_plans.py)가 같은 프로필로 만든 답변이 있으면 바로 사용,
+    없으면(프로필 변경/만료/배치 미실행) 실시간 생성 후 저장해 두고 다음부터 재사용
+    """
+    if st.session_state.plan_store is None:
+        try:
+            st.session_state.plan_store = DailyPlanStore()
+        except Exception as e:
+            print(f"⚠️ 플랜 저장소 연결 실패: {e}")
+            st.session_state.plan_store = False
+
+    store = st.session_state.plan_store
+    profile_hash = plan_profile_hash(profile)
+    if store:
+        plan = store.get(username, variant, profile_hash)
+        if plan:
+            return {"answer": plan.get("answer", ""), "sources": plan.get("sources") or [], "precomputed": True}
+
+    init_rag()
+    result = st.session_state.rag.query(**plan_request(variant, profile))
+    if store and result.get("answer") and result["answer"] != LLM_ERROR_MESSAGE:
+        try:
+            store.save(username, variant, profile_hash, result)
+        except Exception as e:
+            print(f"⚠️ 플랜 저장 실패: {e}")
+    return result
+
 def create_profile_object() -> UserProfile:
     """세션 상태의 입력값들을 모아 UserProfile 객체 생성"""
     # Multiselect(리스트)와 Text Input(문자열) 병합 로직
@@ -166,6 +197,11 @@ def main():
             if st.button("로그아웃"):
                 st.session_state.logged_in = False
                 st.session_state.current_user = None
+                # 다음 사용자에게 대화 내용/서버 측 메모리가 이어지지 않도록 새 세션으로
+                if st.session_state.rag is not None:
+                    st.session_state.rag.memory.clear(st.session_state.chat_session_id)
+                st.session_state.messages = []
+                st.session_state.chat_session_id = uuid.uuid4().hex
                 st.rerun()
         
         st.divider()
@@ -229,8 +265,11 @@ def main():
             
             st.selectbox("건강 목표", goals, index=g_idx, key="goal")
             
-            activity_val = st.slider("활동량 레벨", 1, 5, 3)
-            st.session_state.activity_level = {1:"비활동적", 2:"가벼움", 3:"보통", 4:"활발함", 5:"매우활발함"}[activity_val]
+            # 저장된 활동량으로 시작 (사전 계산 플랜과 같은 권장 칼로리가 나오도록)
+            activity_levels = {1:"비활동적", 2:"가벼움", 3:"보통", 4:"활발함", 5:"매우활발함"}
+            curr_activity = next((k for k, v in activity_levels.items() if v == user.get('activity_level')), 3)
+            activity_val = st.slider("활동량 레벨", 1, 5, curr_activity)
+            st.session_state.activity_level = activity_levels[activity_val]
         
         with st.expander("📊 오늘의 기록"):
             st.number_input("섭취 칼로리(kcal)", 0, 5000, 2000, key="calories")
@@ -260,13 +299,13 @@ def main():
                 update_query = """
                 UPDATE users 
                 SET age = %s, gender = %s, height = %s, weight = %s, 
-                    diseases = %s, allergies = %s, notes = %s, goal = %s
+                    diseases = %s, allergies = %s, notes = %s, goal = %s, activity_level = %s
                 WHERE username = %s;
                 """
                 cur.execute(update_query, (
                     st.session_state.age, st.session_state.gender, st.session_state.height,
                     st.session_state.weight, diseases_str, allergies_str, notes_str, 
-                    st.session_state.goal, user['username']
+                    st.session_state.goal, st.session_state.activity_level, user['username']
                 ))
 
                 st.success("✅ 저장 완료!")
@@ -279,6 +318,7 @@ def main():
                 user['allergies'] = final_allergies
                 user['notes'] = notes_str
                 user['goal'] = st.session_state.goal
+                user['activity_level'] = st.session_state.activity_level
                 
                 cur.close()
                 conn.close()
@@ -308,33 +348,30 @@ def main():
             with st.chat_message("user"): st.markdown(prompt)
             
             with st.chat_message("assistant"):
-                message_placeholder = st.empty()
-                full_response = ""
-                
-                with st.spinner("🧠 지식베이스 검색 및 생각 중..."):
+                with st.spinner("🧠 지식베이스 검색 중..."):
                     init_rag() # RAG 로드
-                    result = st.session_state.rag.query(
+                    events = st.session_state.rag.stream_query(
                         prompt, 
                         user_profile=create_profile_object(), 
                         mode="general",
-                        chat_history=st.session_state.messages[:-1] 
+                        session_id=st.session_state.chat_session_id  # 이전 대화는 롤링 요약 + 최근 턴으로 전달
                     )
-                    
-                    answer_text = result.get("answer", "죄송합니다. 답변을 생성할 수 없습니다.")
-                    
-                    # 스트리밍 효과
-                    for chunk in answer_text.split(" "):
-                        full_response += chunk + " "
-                        message_placeholder.markdown(full_response + "▌")
-                        time.sleep(0.02)
-                    
-                    message_placeholder.markdown(full_response)
-                    
-                    # 출처 표시
-                    if result.get("sources"):
-                        with st.expander("📚 근거 자료 (Reference)"):
-                            for src in result["sources"][:3]:
-                                st.caption(f"- {src.get('title')} (유사도: {src.get('score', 0):.2f})")
+                    # 첫 이벤트(출처/신뢰도)는 검색이 끝나면 바로 도착
+                    meta = next(events)
+
+                # 실제 LLM 응답 조각을 도착하는 대로 표시
+                full_response = st.write_stream(
+                    event["content"] for event in events if event["type"] == "token"
+                )
+                if not full_response:
+                    full_response = "죄송합니다. 답변을 생성할 수 없습니다."
+                    st.markdown(full_response)
+                
+                # 출처 표시
+                if meta.get("sources"):
+                    with st.expander("📚 근거 자료 (Reference)"):
+                        for src in meta["sources"][:3]:
+                            st.caption(f"- {src.get('title')} (유사도: {src.get('score', 0):.2f})")
             
             st.session_state.messages.append({"role": "assistant", "content": full_response})
 
@@ -560,20 +597,10 @@ def main():
             
             if st.button("🍽️ 오늘의 식단 생성", type="primary", use_container_width=True):
                 with st.spinner("레시피 검색 중..."):
-                    init_rag()
-                    context_query = f"{p.goal} 식단 추천."
-                    if workout_done:
-                        context_query += " (방금 고강도 운동을 했으니 근육 회복을 위한 고단백 식단 위주로)"
-                    else:
-                        context_query += " (활동량이 적으므로 저칼로리, 소화가 잘 되는 식단 위주로)"
-
-                    result = st.session_state.rag.query(
-                        context_query, 
-                        user_profile=p,
-                        search_categories=['food'],
-                        mode="food"
-                    )
+                    result = get_daily_plan(user['username'], food_variant(workout_done), p)
                     st.markdown(result.get("answer", ""))
+                    if result.get("precomputed"):
+                        st.caption("⚡ 오늘 새벽 미리 준비된 플랜입니다.")
 
         with rec_tab2:
             st.subheader("개인 맞춤 운동 루틴")
@@ -581,20 +608,10 @@ def main():
             
             if st.button("🏃 오늘의 운동 루틴 생성", type="primary", use_container_width=True):
                 with st.spinner("운동 루틴 구성 중..."):
-                    init_rag()
-                    context_query = f"{p.goal}을 위한 운동 루틴."
-                    if condition == "나쁨":
-                        context_query += " (컨디션이 안 좋으니 저강도, 스트레칭 위주로)"
-                    elif condition == "최상":
-                        context_query += " (컨디션 최상, 고강도 인터벌 포함)"
-                    
-                    result = st.session_state.rag.query(
-                        context_query, 
-                        user_profile=p,
-                        search_categories=['video'],
-                        mode="exercise"
-                    )
+                    result = get_daily_plan(user['username'], exercise_variant(condition), p)
                     st.markdown(result.get("answer", ""))
+                    if result.get("precomputed"):
+                        st.caption("⚡ 오늘 새벽 미리 준비된 플랜입니다.")
                     
                     if result.get("sources"):
                         st.markdown("### 📺 관련 영상")
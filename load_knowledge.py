@@ -1,6 +1,9 @@
 """
 FitLife AI - 통합 데이터 로더 (API + 동영상)
 이 스크립트 하나로 모든 데이터를 Supabase에 업로드합니다.
+
+    python load_knowledge.py         # 증분 동기화 (변경된 문서만 임베딩, 사라진 문서는 삭제 표시)
+    python load_knowledge.py --full  # 기존 데이터를 모두 지우고 전체 재적재
 """
 import sys
 from pathlib import Path
@@ -16,11 +19,14 @@ def main():
     print("🚀 FitLife AI - 지식베이스 데이터 통합 업로드")
     print("=" * 60)
     
+    full_reload = "--full" in sys.argv
     loader = PublicDataLoader()
     
-    # ★ [핵심] 여기에 초기화 코드를 추가하세요!
-    print("\n🧹 [중복 방지] 기존 데이터를 모두 삭제하고 새로 시작합니다...")
-    loader.kb.clear()
+    if full_reload:
+        print("\n🧹 [전체 재적재] 기존 데이터를 모두 삭제하고 새로 시작합니다...")
+        loader.kb.clear()
+    else:
+        print("\n🔄 [증분 동기화] 변경된 문서만 반영합니다. (전체 재적재: --full)")
 
     # ---------------------------------------------------------
     # 1. [API] 건강 식재료 데이터 자동 수집
@@ -66,7 +72,10 @@ def main():
         "올리브유", "들기름", "참기름", "코코넛오일"
     ]
     
-    loader.fetch_and_upload_from_api(target_foods)
+    if full_reload:
+        loader.fetch_and_upload_from_api(target_foods)
+    else:
+        loader.sync_food_from_api(target_foods)
     
     # ---------------------------------------------------------
     # 2. [CSV] 국민체력100 동영상 데이터 업로드
@@ -76,7 +85,10 @@ def main():
     # data 폴더에 넣은 파일명을 정확히 적어주세요!
     video_filename = "서울올림픽기념국민체육진흥공단_국민체력100 운동처방 동영상주소 정보_20210727 (1).csv"
     
-    loader.upload_video_csv_to_supabase(video_filename)
+    if full_reload:
+        loader.upload_video_csv_to_supabase(video_filename)
+    else:
+        loader.sync_video_csv(video_filename)
     
     print("\n" + "=" * 60)
     print("🎉 모든 데이터 업로드 작업이 완료되었습니다!")
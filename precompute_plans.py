@@ -0,0 +1,107 @@
+"""
+FitLife AI - 오늘의 식단/운동 플랜 사전 계산 (야간 배치)
+users 테이블의 모든 사용자에 대해 맞춤 추천 탭의 경우별(식단 2 + 운동 3) 답변을 미리 만들어
+daily_plans 테이블에 프로필 해시와 함께 저장합니다. 화면은 해시가 같을 때 저장된 답변을 바로 보여 줍니다.
+
+    python precompute_plans.py                  # 프로필이 바뀌었거나 만료된 플랜만 다시 생성
+    python precompute_plans.py --force          # 전체 재생성
+    python precompute_plans.py --user alice     # 특정 사용자만
+    python precompute_plans.py --concurrency 4  # 동시에 진행할 항목 수 (기본: QUERY_BATCH_CONCURRENCY)
+
+cron 예시 (매일 새벽 3시): 0 3 * * * cd /path/to/FitLife && python precompute_plans.py
+사전 준비: python setup_db.py --plans (daily_plans 테이블 생성)
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 프로젝트 루트 경로 설정
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import src.config as config
+from src.rag import FitLifeRAG
+from src.rag.daily_plans import DailyPlanStore, PLAN_VARIANTS, plan_profile_hash, plan_request, profile_from_user
+
+
+def iter_user_pages(supabase, page_size: int, username: str = None):
+    """users 테이블을 page_size개씩 읽어 옴"""
+    start = 0
+    while True:
+        query = supabase.table("users").select("username, name, age, gender, height, weight, diseases, allergies, notes, goal, activity_level")
+        if username:
+            query = query.eq("username", username)
+        rows = query.range(start, start + page_size - 1).execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def precompute_page(rag: FitLifeRAG, store: DailyPlanStore, users, force: bool, concurrency: int):
+    """사용자 한 페이지 처리 → (생성, 건너뜀, 실패) 수"""
+    profiles = {row["username"]: profile_from_user(row) for row in users}
+    hashes = {name: plan_profile_hash(profile) for name, profile in profiles.items()}
+    fresh = set() if force else store.fresh_keys(list(profiles), hashes)
+
+    jobs = [
+        (name, variant)
+        for name in profiles
+        for variant in PLAN_VARIANTS
+        if store.plan_key(name, variant) not in fresh
+    ]
+    skipped = len(profiles) * len(PLAN_VARIANTS) - len(jobs)
+    if not jobs:
+        return 0, skipped, 0
+
+    results = rag.query_batch([plan_request(variant, profiles[name]) for name, variant in jobs], max_concurrency=concurrency)
+
+    # 실패한 항목은 저장하지 않음 (화면에서 실시간 생성으로 대체, 다음 실행 때 다시 시도)
+    plans = [
+        (name, variant, hashes[name], result)
+        for (name, variant), result in zip(jobs, results)
+        if not result.get("error")
+    ]
+    store.save_many(plans)
+    return len(plans), skipped, len(jobs) - len(plans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오늘의 식단/운동 플랜 사전 계산")
+    parser.add_argument("--force", action="store_true", help="최신 플랜이 있어도 모두 다시 생성")
+    parser.add_argument("--user", help="이 사용자만 처리")
+    parser.add_argument("--concurrency", type=int, default=config.QUERY_BATCH_CONCURRENCY, help="동시 처리 항목 수")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🌙 FitLife AI - 오늘의 플랜 사전 계산")
+    print("=" * 60)
+
+    rag = FitLifeRAG()
+    store = DailyPlanStore(supabase_client=rag.kb.supabase_client)
+
+    started = time.perf_counter()
+    created = skipped = failed = users = 0
+    for page in iter_user_pages(rag.kb.supabase_client, config.DAILY_PLAN_USER_PAGE, args.user):
+        try:
+            page_created, page_skipped, page_failed = precompute_page(rag, store, page, args.force, args.concurrency)
+        except Exception as e:
+            print(f"❌ 사용자 {len(page)}명 처리 실패: {e}")
+            failed += len(page) * len(PLAN_VARIANTS)
+            continue
+        users += len(page)
+        created += page_created
+        skipped += page_skipped
+        failed += page_failed
+        print(f"   👥 누적 {users}명 | 생성 {created} | 최신 유지 {skipped} | 실패 {failed}")
+
+    print(f"\n✅ 완료: 사용자 {users}명, 플랜 {created}개 생성 ({time.perf_counter() - started:.1f}초)")
+    if failed:
+        print(f"⚠️ 실패 {failed}개는 화면에서 실시간으로 생성됩니다.")
+
+
+if __name__ == "__main__":
+    main()
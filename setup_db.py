@@ -1,7 +1,14 @@
 import psycopg2
+import psycopg2.extras
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+# 프로젝트 루트 경로 설정 (content_hash 계산을 업로드 코드와 같은 함수로)
+sys.path.insert(0, str(Path(__file__).parent))
+from src.rag.bulk_writer import document_hash
+
 # 1. .env 파일 로드
 load_dotenv()
 
@@ -41,6 +48,8 @@ def reset_table():
             diseases TEXT,
             allergies TEXT,
             notes TEXT,  -- ★ 특이사항 컬럼 포함됨
+            goal TEXT,
+            activity_level TEXT,  -- 권장 칼로리 계산용 (사전 계산 플랜의 프로필 해시에 포함)
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
         """
@@ -63,5 +72,162 @@ def reset_table():
     except Exception as e:
         print(f"❌ 오류 발생: {e}")
 
+# 기본 검색 RPC (증분 동기화로 tombstone 처리된 문서 제외)
+MATCH_DOCUMENTS_SQL = """
+DROP FUNCTION IF EXISTS match_documents(vector, float, int);
+CREATE FUNCTION match_documents (
+    query_embedding vector(384),
+    match_threshold float,
+    match_count int
+)
+RETURNS TABLE (id uuid, content text, metadata jsonb, similarity float)
+LANGUAGE sql STABLE
+AS $$
+    SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+    FROM documents d
+    WHERE d.deleted_at IS NULL
+      AND 1 - (d.embedding <=> query_embedding) > match_threshold
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+$$;
+"""
+
+# 메타데이터 필터를 검색 함수 안에서 처리하는 확장 RPC
+# (필터를 WHERE 절에서 먼저 적용하므로 조건에 맞는 문서만 match_count개 반환)
+MATCH_DOCUMENTS_FILTERED_SQL = """
+CREATE OR REPLACE FUNCTION match_documents_filtered (
+    query_embedding vector(384),
+    match_threshold float,
+    match_count int,
+    filter_category text DEFAULT NULL,
+    filter_source text DEFAULT NULL,
+    filter_tags jsonb DEFAULT NULL
+)
+RETURNS TABLE (id uuid, content text, metadata jsonb, similarity float)
+LANGUAGE sql STABLE
+AS $$
+    SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+    FROM documents d
+    WHERE d.deleted_at IS NULL
+      AND (filter_category IS NULL OR d.metadata->>'category' = filter_category)
+      AND (filter_source IS NULL OR d.metadata->>'source' = filter_source)
+      AND (filter_tags IS NULL OR d.metadata->'tags' @> filter_tags)
+      AND 1 - (d.embedding <=> query_embedding) > match_threshold
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+$$;
+"""
+
+def migrate_documents():
+    """
+    documents 테이블 마이그레이션 (데이터 유지)
+    - content_hash(업서트 키) 컬럼과 유니크 인덱스
+    - deleted_at(증분 동기화 tombstone) 컬럼
+    - content_hash가 비어 있는 기존 행에 해시 채우기 (backfill_content_hashes)
+    - category/source 필터용 인덱스와 match_documents / match_documents_filtered 함수
+    """
+    try:
+        print("🔌 데이터베이스 연결 중...")
+        conn = psycopg2.connect(DB_URL)
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("🔨 'documents' 테이블 마이그레이션 중...")
+        cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS documents_content_hash_key ON documents (content_hash);")
+        cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;")
+        cur.execute("CREATE INDEX IF NOT EXISTS documents_category_idx ON documents ((metadata->>'category'));")
+        cur.execute("CREATE INDEX IF NOT EXISTS documents_source_idx ON documents ((metadata->>'source'));")
+        backfill_content_hashes(cur)
+        cur.execute(MATCH_DOCUMENTS_SQL)
+        cur.execute(MATCH_DOCUMENTS_FILTERED_SQL)
+
+        print("✅ 'documents' 마이그레이션 완료!")
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ 오류 발생: {e}")
+
+def backfill_content_hashes(cur, batch_size: int = 500):
+    """
+    content_hash 컬럼 추가 전에 올라간 행에 해시를 채웁니다. (업로드 때와 같은 document_hash 정규화)
+    비워 두면 증분 동기화가 이 행들을 모르는 채로 전체 문서를 한 번 더 올려 검색 결과가 중복됩니다.
+    같은 해시가 이미 있는(본문/메타데이터가 같은) 행은 유니크 인덱스와 겹치지 않도록 삭제 표시합니다.
+    """
+    cur.execute("SELECT id, content, metadata FROM documents WHERE content_hash IS NULL;")
+    legacy = cur.fetchall()
+    if not legacy:
+        return
+
+    cur.execute("SELECT content_hash FROM documents WHERE content_hash IS NOT NULL;")
+    taken = {row[0] for row in cur.fetchall()}
+    updates, duplicates = [], []
+    for doc_id, content, metadata in legacy:
+        content_hash = document_hash(content or "", metadata or {})
+        if content_hash in taken:
+            duplicates.append(str(doc_id))
+            continue
+        taken.add(content_hash)
+        updates.append((str(doc_id), content_hash))
+
+    for i in range(0, len(updates), batch_size):
+        psycopg2.extras.execute_values(
+            cur,
+            "UPDATE documents AS d "
+            "SET content_hash = v.content_hash, "
+            "    metadata = COALESCE(d.metadata, '{}'::jsonb) || jsonb_build_object('content_hash', v.content_hash) "
+            "FROM (VALUES %s) AS v(id, content_hash) WHERE d.id::text = v.id;",
+            updates[i:i + batch_size]
+        )
+    if duplicates:
+        cur.execute(
+            "UPDATE documents SET deleted_at = NOW() WHERE id::text = ANY(%s) AND deleted_at IS NULL;",
+            (duplicates,)
+        )
+    print(f"🔑 기존 문서 content_hash 채움: {len(updates)}개 (중복 삭제 표시 {len(duplicates)}개)")
+
+# 오늘의 식단/운동 플랜 사전 계산 결과 (precompute_plans.py가 채우고 맞춤 추천 탭이 읽음)
+DAILY_PLANS_SQL = """
+CREATE TABLE IF NOT EXISTS daily_plans (
+    plan_key TEXT PRIMARY KEY,      -- "사용자:경우" (예: alice:food_rest)
+    username TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    profile_hash TEXT NOT NULL,     -- 생성 당시 프로필 해시 (다르면 화면에서 실시간 생성)
+    answer TEXT,
+    sources JSONB,
+    generated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS daily_plans_username_idx ON daily_plans (username);
+"""
+
+def migrate_plans():
+    """daily_plans 테이블 생성 (데이터 유지)"""
+    try:
+        print("🔌 데이터베이스 연결 중...")
+        conn = psycopg2.connect(DB_URL)
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        print("🔨 'daily_plans' 테이블 생성 중...")
+        cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS goal TEXT;")
+        cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS activity_level TEXT;")
+        cur.execute(DAILY_PLANS_SQL)
+
+        print("✅ 'daily_plans' 준비 완료!")
+        cur.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ 오류 발생: {e}")
+
 if __name__ == "__main__":
-    reset_table()
\ No newline at end of file
+    # python setup_db.py --documents : users 테이블은 건드리지 않고 documents 마이그레이션만 실행
+    # python setup_db.py --plans     : daily_plans 테이블만 생성
+    if "--plans" in sys.argv:
+        migrate_plans()
+        sys.exit(0)
+    if "--documents" not in sys.argv:
+        reset_table()
+    migrate_documents()
+    migrate_plans()
\ No newline at end of file
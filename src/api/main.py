@@ -1,8 +1,13 @@
 """
 FitLife AI - FastAPI 백엔드
 """
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import nullcontext
+
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import uvicorn
@@ -10,6 +15,7 @@ import uvicorn
 from ..rag import FitLifeRAG
 from ..xai import HealthExplainer
 from ..config import API_HOST, API_PORT
+from ..utils.metrics import span, stage_metrics, trace_request
 
 
 # FastAPI 앱 생성
@@ -59,6 +65,7 @@ class HealthData(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None  # 주면 서버가 대화 맥락(롤링 요약 + 최근 턴)을 기억
     profile: Optional[UserProfile] = None
     health_data: Optional[HealthData] = None
 
@@ -68,6 +75,8 @@ class ChatResponse(BaseModel):
     sources: List[Dict]
     confidence: float
     health_analysis: Optional[Dict] = None
+    prompt_tokens: Optional[Dict] = None  # 프롬프트 구간별 토큰 수 (예산/생략 현황 포함)
+    timings: Optional[Dict] = None        # 단계별 소요 시간(ms) - 요청 헤더 X-Debug-Timings: 1 일 때만
 
 
 # 시작 이벤트
@@ -75,6 +84,7 @@ class ChatResponse(BaseModel):
 async def startup_event():
     global rag_system, explainer
     try:
+        # 임베딩 모델 로드 + 워밍업 인코딩을 서버 시작 시점에 끝내 둠 (첫 요청 지연 방지)
         rag_system = FitLifeRAG()
         explainer = HealthExplainer()
         print("✅ FitLife AI 시스템 초기화 완료")
@@ -88,7 +98,7 @@ async def root():
     return {
         "message": "FitLife AI API",
         "version": "1.0.0",
-        "endpoints": ["/chat", "/analyze", "/health"]
+        "endpoints": ["/chat", "/chat/stream", "/analyze", "/health", "/metrics"]
     }
 
 
@@ -98,9 +108,10 @@ async def health_check():
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_debug_timings: Optional[str] = Header(None)):
     """
     RAG 기반 건강 상담 챗봇
+    요청 헤더에 X-Debug-Timings: 1 을 주면 단계별 소요 시간(timings)을 함께 반환합니다.
     """
     if not rag_system:
         raise HTTPException(status_code=503, detail="시스템 초기화 중입니다")
@@ -108,22 +119,58 @@ async def chat(request: ChatRequest):
     # 프로필 변환
     profile_dict = request.profile.dict() if request.profile else None
     
-    # RAG 쿼리
-    result = rag_system.query(
-        user_query=request.message,
-        user_profile=profile_dict
-    )
-    
-    # 건강 데이터가 있으면 분석 추가
-    health_analysis = None
-    if request.health_data:
-        health_analysis = explainer.analyze_health_factors(request.health_data.dict())
+    # 디버그 헤더가 없으면 요청별 추적은 하지 않음 (히스토그램만 기록)
+    with (trace_request() if x_debug_timings else nullcontext({})) as timings, span("chat"):
+        # RAG 쿼리 (비동기 - 임베딩/검색/LLM 대기 중에도 다른 요청 처리)
+        result = await rag_system.aquery(
+            user_query=request.message,
+            user_profile=profile_dict,
+            session_id=request.session_id
+        )
+        
+        # 건강 데이터가 있으면 분석 추가 (SHAP 계산은 CPU 작업이므로 스레드에서)
+        health_analysis = None
+        if request.health_data:
+            with span("health_analysis"):
+                health_analysis = await asyncio.to_thread(explainer.analyze_health_factors, request.health_data.dict())
     
     return ChatResponse(
         answer=result["answer"],
         sources=result["sources"],
         confidence=result["confidence"],
-        health_analysis=health_analysis
+        health_analysis=health_analysis,
+        prompt_tokens=result.get("prompt_tokens"),
+        timings={name: round(seconds * 1000, 2) for name, seconds in timings.items()} if x_debug_timings else None
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    RAG 챗봇 스트리밍 응답 (Server-Sent Events)
+
+    event: meta  → 출처/신뢰도 (LLM 호출 전에 먼저 전송)
+    event: token → 응답 조각
+    event: done  → 전체 응답 (+ 건강 분석)
+    """
+    if not rag_system:
+        raise HTTPException(status_code=503, detail="시스템 초기화 중입니다")
+
+    profile_dict = request.profile.dict() if request.profile else None
+
+    def event_stream():
+        # 동기 제너레이터는 StreamingResponse가 스레드풀에서 순회하므로 이벤트 루프를 막지 않습니다.
+        for event in rag_system.stream_query(
+            user_query=request.message, user_profile=profile_dict, session_id=request.session_id
+        ):
+            if event["type"] == "done" and request.health_data:
+                event["health_analysis"] = explainer.analyze_health_factors(request.health_data.dict())
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -135,8 +182,8 @@ async def analyze_health(health_data: HealthData):
     if not explainer:
         raise HTTPException(status_code=503, detail="시스템 초기화 중입니다")
     
-    analysis = explainer.analyze_health_factors(health_data.dict())
-    explanation = explainer.generate_explanation(analysis)
+    analysis = await asyncio.to_thread(explainer.analyze_health_factors, health_data.dict())
+    explanation = await asyncio.to_thread(explainer.generate_explanation, analysis)
     
     return {
         "analysis": analysis,
@@ -152,7 +199,21 @@ async def get_stats():
     if not rag_system:
         raise HTTPException(status_code=503, detail="시스템 초기화 중입니다")
     
-    return rag_system.kb.get_stats()
+    stats = rag_system.kb.get_stats()
+    if rag_system.answer_cache is not None:
+        stats["answer_cache"] = rag_system.answer_cache.stats()
+    stats["llm"] = rag_system.llm.stats()
+    stats["memory"] = rag_system.memory.stats()
+    stats["singleflight"] = rag_system.flights.stats()
+    return stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    단계별 지연 시간 히스토그램 (Prometheus 텍스트 형식)
+    """
+    return PlainTextResponse(stage_metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 def run_server():
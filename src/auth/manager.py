@@ -9,9 +9,9 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
 class UserManager:
-    def __init__(self):
-        # 클라우드 DB 연결
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    def __init__(self, supabase_client: Optional[Client] = None):
+        # 클라우드 DB 연결 (supabase_client를 주면 그대로 사용 - 오프라인 대역: src.fakes)
+        self.supabase: Client = supabase_client or create_client(SUPABASE_URL, SUPABASE_KEY)
 
     def _hash_pw(self, password: str) -> str:
         return hashlib.sha256(password.encode()).hexdigest()
@@ -30,11 +30,34 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 # 공공데이터포털 (식품안전나라)
 FOOD_SAFETY_API_KEY = os.getenv("FOOD_SAFETY_API_KEY")
 
+# 공공데이터 API 수집량 (키워드당 최대 행 수, 페이지당 행 수)
+FOOD_API_MAX_ROWS = int(os.getenv("FOOD_API_MAX_ROWS", 1000))
+FOOD_API_PAGE_SIZE = 100
+
 # ==========================================
 # 3. 데이터베이스 설정 (Supabase)
 # ==========================================
 VECTOR_DB_TABLE = "documents"          # 우리가 만든 테이블 이름
 VECTOR_DB_QUERY_FUNC = "match_documents" # 우리가 만든 검색 함수 이름
+VECTOR_DB_FILTERED_QUERY_FUNC = "match_documents_filtered"  # 메타데이터 필터 지원 검색 함수 (setup_db.py --documents)
+VECTOR_DB_FALLBACK_OVERFETCH = 4       # 필터를 색인에서 처리할 수 없을 때 후보를 몇 배 더 가져올지
+VECTOR_DB_PAGE_SIZE = 1000             # 로컬 인덱스 적재 시 한 번에 읽을 행 수
+
+# 대량 업로드 (KnowledgeBase.add_documents)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 200))   # 한 번에 임베딩/업서트할 문서 수
+INGEST_MAX_RETRIES = 3                                          # 배치별 최대 재시도 횟수
+INGEST_RETRY_BACKOFF = 1.0                                      # 재시도 대기 (초, 1 → 2 → 4 ...)
+INGEST_FILTER_CHUNK = 50                                        # content_hash in.(...) 필터 한 번에 넣을 해시 수 (GET URL 길이 제한)
+
+# 검색 백엔드 선택: "supabase"(원격 RPC) / "numpy"(프로세스 내 인덱스) / "chroma"(로컬 영구 저장)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "supabase")
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", str(DATA_DIR / "chroma_db"))
+
+# numpy 백엔드 벡터 압축: "none" / "float16" / "pca" / "int8" (비교: python -m src.rag.quantization)
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+VECTOR_PCA_DIM = int(os.getenv("VECTOR_PCA_DIM", 128))   # pca: 남길 주성분 수
+VECTOR_RESCORE_FACTOR = 4                                 # 압축 점수 상위 top_k × 이 값을 원본 벡터로 재채점
+VECTOR_RESCORE_DIR = os.getenv("VECTOR_RESCORE_DIR", str(DATA_DIR / "cache"))  # 재채점용 원본 벡터 임시 파일 위치
 
 # ==========================================
 # 4. AI 모델 설정 (Models)
@@ -43,17 +66,97 @@ VECTOR_DB_QUERY_FUNC = "match_documents" # 우리가 만든 검색 함수 이름
 # 로컬에서 한국어 성능이 가장 좋은 모델 중 하나
 EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
+# 임베딩 실행 백엔드: "torch"(기본) / "onnx" / "onnx-int8"(동적 양자화, CPU에서 가장 빠름)
+# 호환성 확인: python -m src.rag.embeddings
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(DATA_DIR / "onnx"))
+
+# 쿼리 임베딩 캐시 (LRU + TTL, 경로를 지정하면 디스크에도 저장되어 재시작 후에도 유지)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 1024))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", 60 * 60 * 24))  # 초 단위
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")  # 예: ./data/cache/query_embeddings.sqlite
+EMBEDDING_CACHE_DISK_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ROWS", 100000))  # sqlite 최대 행 수 (넘으면 오래된 행부터 삭제)
+
+# 문서 임베딩 로컬 저장소 (content_hash 기준 append-only 벡터 파일, 인덱스 재구축 시 재임베딩 불필요)
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", str(DATA_DIR / "embeddings"))
+
 # LLM 설정 (Gemini)
 LLM_MODEL = "gemini-2.5-flash"  # 가성비/속도 최적화 모델
 LLM_TEMPERATURE = 0.7           # 0~1 사이 (창의성 조절)
 LLM_MAX_TOKENS = 4096
 
+# LLM 호출 보호 (src/utils/llm_guard.py - 챗봇과 비전 분석이 같은 서킷 브레이커를 공유)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))            # 시도별 응답 대기 시간 (초)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))     # 최초 시도 포함 최대 시도 횟수
+LLM_RETRY_BASE_DELAY = 0.5                                   # 재시도 대기 = 0 ~ min(최대, 기본 × 2^시도) 무작위
+LLM_RETRY_MAX_DELAY = 8.0
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))  # 이 분위수만큼 지나도 응답이 없으면 요청 하나 더 (0이면 끔)
+LLM_HEDGE_MIN_SAMPLES = 20                                   # 헤징을 시작하기 전 필요한 응답 시간 관측 수
+LLM_BREAKER_FAILURES = 5                                     # 연속 실패가 이만큼 쌓이면 호출 중단
+LLM_BREAKER_RESET = 30.0                                     # 중단 후 시험 호출까지 대기 시간 (초)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 16))  # 동시에 진행 중인 동기 호출 상한 (넘으면 큐에 쌓지 않고 즉시 실패)
+
 # ==========================================
 # 5. RAG (검색 증강 생성) 설정
 # ==========================================
 RAG_TOP_K = 5              # 검색할 문서 수 (5개 정도가 적당)
 RAG_SCORE_THRESHOLD = 0.4  # 유사도 임계값 (0~1, 낮을수록 더 많이 검색됨)
 
+# 컨텍스트 구성 (중복 제거 + MMR 다양화)
+RAG_CANDIDATE_POOL = 20    # 검색해 올 후보 문서 수
+RAG_CONTEXT_DOCS = 10      # LLM에게 넘길 최종 문서 수
+RAG_DEDUP_THRESHOLD = 0.95  # 임베딩 코사인 유사도가 이 값 이상이면 같은 문서로 보고 하나만 남김
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", 0.7))  # 1에 가까울수록 관련도, 0에 가까울수록 다양성 우선
+RAG_MMR_JITTER = float(os.getenv("RAG_MMR_JITTER", 0.0))  # >0이면 관련도에 잡음을 더해 매번 조금씩 다른 조합 선택
+RAG_MMR_SEED = int(os.getenv("RAG_MMR_SEED")) if os.getenv("RAG_MMR_SEED") else None  # jitter 사용 시 재현용 시드
+
+# 의미 기반 응답 캐시 (비슷한 질문 + 같은 모드 + 비슷한 프로필이면 Gemini 호출 생략)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))  # 질문 임베딩 코사인 유사도 기준
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 60 * 60 * 6))  # 초 단위
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")  # 예: ./data/cache/answers.sqlite (지정 시 재시작 후에도 유지)
+ANSWER_CACHE_CALORIE_BUCKET = 250  # 프로필 지문의 칼로리 구간 폭 (kcal)
+
+# 프롬프트 토큰 예산 (시스템 프롬프트/질문 → 프로필 → 상위 문서 → 최근 대화 순으로 채움)
+RAG_PROMPT_TOKEN_BUDGET = int(os.getenv("RAG_PROMPT_TOKEN_BUDGET", 4000))  # 입력 프롬프트 전체 상한 (추정 토큰)
+RAG_MIN_SNIPPET_TOKENS = 40      # 남은 예산이 이보다 적으면 문서/대화를 잘라 넣지 않고 생략
+RAG_HISTORY_MESSAGES = 6         # 후보로 볼 최근 대화 메시지 수
+RAG_HISTORY_RESERVE_TOKENS = 300  # 대화가 있을 때 문서가 아닌 대화 몫으로 남겨 둘 토큰
+
+# 세션별 대화 메모리 (src/rag/memory.py - 오래된 턴은 요약, 최근 턴만 원문)
+MEMORY_RECENT_TURNS = 2            # 항상 원문으로 유지할 최근 턴 수 (질문 + 답변 = 1턴)
+MEMORY_SUMMARIZE_EVERY = int(os.getenv("MEMORY_SUMMARIZE_EVERY", 2))  # 원문이 최근 턴보다 이만큼 더 쌓이면 요약에 반영
+MEMORY_SUMMARY_TOKENS = 300        # 롤링 요약 최대 길이 (추정 토큰)
+MEMORY_SUMMARY_INPUT_TOKENS = 400  # 요약 호출에 넘길 메시지당 최대 토큰 (긴 답변은 잘라서 전달)
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gemini-2.5-flash-lite")  # 요약 전용 경량 모델
+MEMORY_MAX_SESSIONS = 1000
+MEMORY_SESSION_TTL = 60 * 60 * 2   # 마지막 사용 후 이 시간(초)이 지나면 세션 메모리 삭제
+
+# 하이브리드 검색 (벡터 + BM25 어휘 색인)
+LEXICAL_INDEX_ENABLED = True
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "weighted")  # "weighted"(벡터 + 가중 BM25) / "rrf"(순위 융합)
+HYBRID_LEXICAL_WEIGHT = 0.15   # weighted: 정규화된 BM25 점수에 곱할 가중치 (기존 최대 가산점과 동일)
+HYBRID_RRF_K = 60              # rrf: 순위 완화 상수
+HYBRID_LEXICAL_CANDIDATES = 4  # 어휘 후보 수 = top_k × 이 값
+SEARCH_MANY_MAX_WORKERS = 4    # 다중 카테고리 검색 시 동시 조회 수 (원격 백엔드)
+EMBED_EXECUTOR_WORKERS = 1     # 비동기 경로에서 쿼리 임베딩을 계산할 전용 스레드 수 (모델 호출은 직렬화됨)
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", 8))  # query_batch: 동시에 진행할 항목(검색 + LLM) 수
+
+# 오늘의 식단/운동 플랜 사전 계산 (precompute_plans.py → daily_plans 테이블 → 맞춤 추천 탭)
+DAILY_PLANS_TABLE = "daily_plans"
+DAILY_PLAN_TTL_HOURS = float(os.getenv("DAILY_PLAN_TTL_HOURS", 36))  # 이보다 오래된 플랜은 실시간 생성으로 대체
+DAILY_PLAN_USER_PAGE = 200  # users 테이블을 한 번에 읽어 올 행 수 (이 단위로 query_batch 실행)
+
+# 지식베이스 통계 (KnowledgeBase.get_stats)
+STATS_LATENCY_WINDOW = 1000                        # 구간별 지연 시간 백분위 계산에 쓰는 최근 관측 수
+KB_STATE_PATH = os.getenv("KB_STATE_PATH", str(DATA_DIR / "kb_state.json"))  # 마지막 동기화 시각/문서 수 기록
+
+# 단계별 지연 시간 추적 (GET /metrics, /chat 요청 헤더 X-Debug-Timings: 1 이면 응답에 timings 포함)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # 히스토그램 경계 (초)
+
 # ==========================================
 # 6. API 서버 설정 (FastAPI)
 # ==========================================
@@ -5,15 +5,19 @@ import os
 import json
 import requests
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Iterator
 from pathlib import Path
 from dotenv import load_dotenv
 
 from src.rag.knowledge_base import KnowledgeBase 
+import src.config as config
 
 # .env 파일 로드
 load_dotenv()
 
+FOOD_API_SOURCE = "식품의약품안전처 API"
+VIDEO_SOURCE = "국민체력100 유튜브"
+
 class PublicDataLoader:
     def __init__(self):
         # .env에서 Decoding 키를 가져옵니다.
@@ -26,8 +30,9 @@ class PublicDataLoader:
 
         self.base_path = Path(__file__).parent.parent.parent / "data"
         self.kb = KnowledgeBase()
+        self.api_errors = 0  # 증분 동기화 중 API 오류 횟수 (tombstone 안전장치)
     
-    def search_food_api(self, keyword: str, limit: int = 5) -> List[Dict]:
+    def search_food_api(self, keyword: str, limit: int = 5, page_no: int = 1) -> List[Dict]:
         """
         식품영양성분조회 API (getFoodNtrCpntDbInq02)
         """
@@ -38,7 +43,7 @@ class PublicDataLoader:
         
         params = {
             "serviceKey": self.api_key, 
-            "pageNo": "1",
+            "pageNo": str(page_no),
             "numOfRows": str(limit),
             "type": "json",
             "FOOD_NM_KR": keyword
@@ -51,6 +56,7 @@ class PublicDataLoader:
                 data = response.json()
             except json.JSONDecodeError:
                 print(f"🔥 [API 오류] JSON 응답이 아닙니다. ({keyword})")
+                self.api_errors += 1
                 return []
             
             # === [핵심 수정] 데이터 구조 유연하게 처리 ===
@@ -60,6 +66,7 @@ class PublicDataLoader:
                 if "NODATA" in header.get("resultMsg", ""): 
                     return []
                 print(f"❌ API 메시지: {header.get('resultMsg')}")
+                self.api_errors += 1
                 return []
             
             body = data.get("body", {})
@@ -99,7 +106,7 @@ class PublicDataLoader:
                     "protein": safe_float(item.get("AMT_NUM3")),  # 단백질
                     "fat": safe_float(item.get("AMT_NUM4")),      # 지방
                     "carbs": safe_float(item.get("AMT_NUM7")),    # 탄수화물
-                    "source": "식품의약품안전처 API"
+                    "source": FOOD_API_SOURCE
                 }
                 
                 # 이름이 없는 데이터는 스킵
@@ -111,63 +118,96 @@ class PublicDataLoader:
         except Exception as e:
             # 여기서 에러가 나면 무슨 에러인지 정확히 출력
             print(f"⚠️ 시스템 에러 ({keyword}): {e}")
+            self.api_errors += 1
             return []
 
-    def fetch_and_upload_from_api(self, keywords: List[str]):
-        print(f"\n🔍 API 자동 수집 시작 (키워드: {len(keywords)}개)")
-        total_count = 0
+    def iter_food_documents(self, keywords: List[str], max_rows: int = None) -> Iterator[Dict]:
+        """
+        키워드별로 API를 페이지 단위로 끝까지 조회하며 문서를 하나씩 내보냅니다.
+        (전체 결과를 메모리에 모으지 않으므로 대량 수집에도 안전)
+        """
+        max_rows = max_rows or config.FOOD_API_MAX_ROWS
+        page_size = min(config.FOOD_API_PAGE_SIZE, max_rows)
+
         for keyword in keywords:
-            print(f"   - '{keyword}' 검색 중...", end="")
-            foods = self.search_food_api(keyword, limit=5)
-            
-            if not foods:
-                print(" [결과 없음]")
-                continue
-            
-            print(f" [OK] {len(foods)}개 발견 -> 업로드")
-            
-            documents = []
-            for food in foods:
-                content = f"{food['name']}: 칼로리 {food['calories']}kcal, 단백질 {food['protein']}g, 탄수화물 {food['carbs']}g, 지방 {food['fat']}g."
-                documents.append({
-                    "title": food['name'],
-                    "content": content,
-                    "source": "식품의약품안전처 API"
-                })
-            
-            if documents:
-                self.kb.add_documents(documents, category="food")
-                total_count += len(documents)
-        
-        print(f"✅ API 데이터 총 {total_count}개 업로드 완료!")
+            fetched = 0
+            page_no = 1
+            while fetched < max_rows:
+                foods = self.search_food_api(keyword, limit=page_size, page_no=page_no)
+                for food in foods[:max_rows - fetched]:
+                    content = f"{food['name']}: 칼로리 {food['calories']}kcal, 단백질 {food['protein']}g, 탄수화물 {food['carbs']}g, 지방 {food['fat']}g."
+                    yield {
+                        "title": food['name'],
+                        "content": content,
+                        "source": FOOD_API_SOURCE
+                    }
+                fetched += len(foods)
+                if len(foods) < page_size:
+                    break
+                page_no += 1
 
-    def upload_video_csv_to_supabase(self, filename: str):
+            print(f"   - '{keyword}' {fetched}개 수집" if fetched else f"   - '{keyword}' [결과 없음]")
+
+    def fetch_and_upload_from_api(self, keywords: List[str], max_rows: int = None):
+        print(f"\n🔍 API 자동 수집 시작 (키워드: {len(keywords)}개)")
+        result = self.kb.add_documents(self.iter_food_documents(keywords, max_rows), category="food")
+        print(f"✅ API 데이터 업로드 완료! ({result})")
+        return result
+
+    def load_video_documents(self, filename: str) -> List[Dict]:
+        """국민체력100 동영상 CSV를 문서 리스트로 변환합니다."""
         file_path = self.base_path / filename
         print(f"\n🎬 동영상 데이터 로딩 중: {file_path}")
         if not file_path.exists():
             print(f"❌ 파일을 찾을 수 없습니다: {filename}")
-            return
+            return []
+
+        try: df = pd.read_csv(file_path, encoding='cp949')
+        except: df = pd.read_csv(file_path, encoding='utf-8')
+        
+        documents = []
+        for idx, row in df.iterrows():
+            category_mid = row.get('중분류', '')
+            category_sub = row.get('소분류', '') 
+            title = row.get('제목', '')
+            video_url = row.get('동영상주소', '')
+            content = f"운동 영상. 분류: {category_mid} - {category_sub}. 제목: {title}. 이 운동은 {category_sub} 및 {category_mid}에 도움을 줍니다."
+            documents.append({
+                "title": str(title),
+                "content": content,
+                "source": VIDEO_SOURCE,
+                "video_url": video_url,
+                "category": "video"
+            })
+        return documents
+
+    def upload_video_csv_to_supabase(self, filename: str):
         try:
-            try: df = pd.read_csv(file_path, encoding='cp949')
-            except: df = pd.read_csv(file_path, encoding='utf-8')
-            
-            documents = []
-            for idx, row in df.iterrows():
-                category_mid = row.get('중분류', '')
-                category_sub = row.get('소분류', '') 
-                title = row.get('제목', '')
-                video_url = row.get('동영상주소', '')
-                content = f"운동 영상. 분류: {category_mid} - {category_sub}. 제목: {title}. 이 운동은 {category_sub} 및 {category_mid}에 도움을 줍니다."
-                documents.append({
-                    "title": str(title),
-                    "content": content,
-                    "source": "국민체력100 유튜브",
-                    "video_url": video_url,
-                    "category": "video"
-                })
+            documents = self.load_video_documents(filename)
             if documents:
                 print(f"🎥 {len(documents)}개 동영상 데이터 업로드 시작...")
-                self.kb.add_documents(documents, category="video")
-                print("✅ 동영상 업로드 완료!")
+                result = self.kb.add_documents(documents, category="video")
+                print(f"✅ 동영상 업로드 완료! ({result})")
         except Exception as e:
-            print(f"❌ 업로드 실패: {e}")
\ No newline at end of file
+            print(f"❌ 업로드 실패: {e}")
+
+    # ------------------------------------------------------------------
+    # 증분 동기화 (변경된 문서만 임베딩, 사라진 문서는 tombstone)
+    # ------------------------------------------------------------------
+    def sync_food_from_api(self, keywords: List[str], max_rows: int = None):
+        print(f"\n🔄 API 데이터 증분 동기화 (키워드: {len(keywords)}개)")
+        self.api_errors = 0
+        documents = list(self.iter_food_documents(keywords, max_rows))
+
+        # API 오류로 일부 키워드가 비어 있으면, 그 문서들을 삭제로 오인하지 않도록 tombstone을 건너뜀
+        allow_tombstone = self.api_errors == 0 and bool(documents)
+        if not allow_tombstone:
+            print(f"⚠️ API 오류 {self.api_errors}건 발생 → 이번 동기화에서는 삭제 표시를 하지 않습니다.")
+        return self.kb.sync_documents(documents, category="food", source=FOOD_API_SOURCE, tombstone=allow_tombstone)
+
+    def sync_video_csv(self, filename: str):
+        documents = self.load_video_documents(filename)
+        if not documents:
+            print("⚠️ 동영상 데이터가 없어 동기화를 건너뜁니다.")
+            return None
+        return self.kb.sync_documents(documents, category="video", source=VIDEO_SOURCE)
@@ -0,0 +1,9 @@
+"""
+오프라인 대역 (Supabase / Gemini / 임베딩 모델)
+API 키와 네트워크 없이 파이프라인을 실행하고 성능을 측정할 때 사용합니다. (bench_rag.py)
+"""
+from .supabase_client import FakeSupabaseClient
+from .chat_model import FakeChatModel
+from .embeddings import HashEmbeddings
+
+__all__ = ["FakeSupabaseClient", "FakeChatModel", "HashEmbeddings"]
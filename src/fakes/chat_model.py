@@ -0,0 +1,73 @@
+"""
+FitLife AI - 오프라인용 Gemini 대역 (결정적 응답 + 지연 시간/토큰 속도 흉내)
+FitLifeRAG / ImageAnalyzer가 쓰는 invoke / ainvoke / stream만 구현합니다.
+
+    llm = FakeChatModel(latency=0.3, tokens_per_second=80, answer_tokens=200)
+    rag = FitLifeRAG(kb=kb, llm=llm)
+
+응답 시간 ≈ latency(첫 토큰까지) + answer_tokens / tokens_per_second
+같은 프롬프트에는 항상 같은 응답을 돌려주므로 벤치마크 결과를 재현할 수 있습니다.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Iterator, List
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+_WORDS = ["단백질", "탄수화물", "운동", "식단", "칼로리", "회복", "근력", "유산소", "수분", "수면", "균형", "채소"]
+
+
+class FakeChatModel:
+    """설정한 지연 시간과 토큰 속도로 응답하는 결정적 채팅 모델"""
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        tokens_per_second: float = 80.0,
+        answer_tokens: int = 200,
+        failure_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.failure_rate = failure_rate  # 0~1, 프롬프트 해시 기준으로 결정적으로 실패
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prompt_text(messages) -> str:
+        if isinstance(messages, str):
+            return messages
+        return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+    def _tokens(self, messages) -> List[str]:
+        with self._lock:
+            self.calls += 1
+        digest = hashlib.sha1(self._prompt_text(messages).encode("utf-8")).digest()
+        if self.failure_rate and digest[0] / 255 < self.failure_rate:
+            raise RuntimeError("fake LLM failure")
+        return [_WORDS[(digest[i % len(digest)] + i) % len(_WORDS)] + " " for i in range(self.answer_tokens)]
+
+    def _generation_seconds(self) -> float:
+        return self.answer_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + self._generation_seconds())
+        return AIMessage(content="".join(tokens))
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + self._generation_seconds())
+        return AIMessage(content="".join(tokens))
+
+    def stream(self, messages, chunk_tokens: int = 8, **kwargs) -> Iterator[AIMessageChunk]:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency)
+        per_token = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for start in range(0, len(tokens), chunk_tokens):
+            chunk = tokens[start:start + chunk_tokens]
+            time.sleep(per_token * len(chunk))
+            yield AIMessageChunk(content="".join(chunk))
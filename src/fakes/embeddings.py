@@ -0,0 +1,43 @@
+"""
+FitLife AI - 오프라인용 임베딩 대역 (문자 bigram 해싱)
+모델 다운로드 없이 결정적인 벡터를 만듭니다. 글자가 많이 겹치는 문장일수록 코사인 유사도가 높으므로
+검색/중복 제거/MMR/응답 캐시가 실제와 비슷하게 동작합니다.
+"""
+import hashlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """문자 unigram + bigram을 dim개 버킷에 부호 해싱한 뒤 L2 정규화"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_name = f"hash-{dim}"
+        self.backend = "hash"
+
+    def _bucket(self, gram: str):
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = " ".join(str(text).split())
+        grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+        for gram in grams:
+            if gram.strip():
+                index, sign = self._bucket(gram)
+                vector[index] += sign
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,228 @@
+"""
+FitLife AI - 오프라인용 Supabase 대역 (메모리 테이블 + match_documents RPC)
+KnowledgeBase / BulkWriter / SupabaseVectorStore / UserManager가 쓰는 쿼리 빌더 부분만 구현합니다.
+
+    client = FakeSupabaseClient()
+    kb = KnowledgeBase(supabase_client=client, embedding_model=HashEmbeddings())
+    UserManager(supabase_client=client)
+
+- table(name).select / insert / upsert(on_conflict) / update / delete
+  + eq / neq / in_ / is_("col", "null") / range / limit, "metadata->>key" 경로 지원
+- rpc("match_documents" | "match_documents_filtered"): deleted_at이 비어 있는 행만 코사인 유사도 정렬
+- id는 순번 문자열, embedding은 실제 Supabase처럼 문자열("[0.1, ...]")로 돌려줍니다.
+"""
+import json
+import threading
+import time
+from itertools import count
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import src.config as config
+
+
+def _field(row: Dict, column: str):
+    if "->>" in column:
+        parent, key = column.split("->>", 1)
+        value = (row.get(parent) or {}).get(key)
+        return None if value is None else str(value)
+    return row.get(column)
+
+
+class _Query:
+    """supabase-py 쿼리 빌더 흉내 (체이닝 후 execute()에서 실행)"""
+
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._columns = None
+        self._count = None
+        self._filters = []
+        self._range = None
+        self._payload = None
+        self._on_conflict = None
+
+    # --- 작업 종류 ---
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        self._op = "select"
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        self._count = count
+        return self
+
+    def insert(self, rows) -> "_Query":
+        self._op, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None) -> "_Query":
+        self._op, self._payload, self._on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values: Dict) -> "_Query":
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self) -> "_Query":
+        self._op = "delete"
+        return self
+
+    # --- 조건 ---
+    def eq(self, column: str, value) -> "_Query":
+        self._filters.append(lambda row: _field(row, column) == value)
+        return self
+
+    def neq(self, column: str, value) -> "_Query":
+        self._filters.append(lambda row: _field(row, column) != value)
+        return self
+
+    def in_(self, column: str, values) -> "_Query":
+        values = set(values)
+        self._filters.append(lambda row: _field(row, column) in values)
+        return self
+
+    def is_(self, column: str, value) -> "_Query":
+        expected = None if value in (None, "null") else value
+        self._filters.append(lambda row: _field(row, column) is expected)
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._range = (start, end + 1)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._range = (0, n)
+        return self
+
+    def execute(self) -> SimpleNamespace:
+        return self._client._execute(self)
+
+
+class FakeSupabaseClient:
+    """메모리에 테이블을 두는 Supabase 클라이언트 대역 (스레드 안전)"""
+
+    def __init__(self, rpc_latency: float = 0.0):
+        self.tables: Dict[str, List[Dict]] = {}
+        self.rpc_latency = rpc_latency  # 원격 RPC 왕복 시간 흉내 (초)
+        self.rpc_calls = 0
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self._matrix = None  # (행 목록, 정규화된 벡터 행렬) - 쓰기가 있으면 무효화
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    # ------------------------------------------------------------------
+    # 테이블 작업
+    # ------------------------------------------------------------------
+    def _execute(self, query: _Query) -> SimpleNamespace:
+        with self._lock:
+            rows = self.tables.setdefault(query._table, [])
+            matched = [row for row in rows if all(f(row) for f in query._filters)]
+
+            if query._op == "select":
+                total = len(matched)
+                if query._range:
+                    matched = matched[query._range[0]:query._range[1]]
+                data = [self._project(row, query._columns) for row in matched]
+                return SimpleNamespace(data=data, count=total if query._count else None)
+
+            if query._op in ("insert", "upsert"):
+                self._matrix = None
+                payload = query._payload if isinstance(query._payload, list) else [query._payload]
+                key = query._on_conflict if query._op == "upsert" else None
+                index = {row.get(key): row for row in rows if row.get(key) is not None} if key else {}
+                written = []
+                for item in payload:
+                    item = dict(item)
+                    if isinstance(item.get("embedding"), (list, np.ndarray)):
+                        item["embedding"] = json.dumps([float(v) for v in item["embedding"]])
+                    existing = index.get(item.get(key)) if key else None
+                    if existing is not None:
+                        existing.update(item)
+                        written.append(dict(existing))
+                    else:
+                        item.setdefault("id", str(next(self._ids)))
+                        rows.append(item)
+                        if key:
+                            index[item.get(key)] = item
+                        written.append(dict(item))
+                return SimpleNamespace(data=written, count=None)
+
+            if query._op == "update":
+                self._matrix = None
+                for row in matched:
+                    row.update(query._payload)
+                return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+
+            if query._op == "delete":
+                self._matrix = None
+                removed = {id(row) for row in matched}
+                self.tables[query._table] = [row for row in rows if id(row) not in removed]
+                return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+
+        raise ValueError(f"⚠️ 지원하지 않는 작업입니다: {query._op}")
+
+    @staticmethod
+    def _project(row: Dict, columns: Optional[List[str]]) -> Dict:
+        if columns is None:
+            return dict(row)
+        return {column: row.get(column) for column in columns}
+
+    # ------------------------------------------------------------------
+    # RPC (match_documents / match_documents_filtered)
+    # ------------------------------------------------------------------
+    def rpc(self, name: str, params: Dict) -> SimpleNamespace:
+        if name not in (config.VECTOR_DB_QUERY_FUNC, config.VECTOR_DB_FILTERED_QUERY_FUNC):
+            raise ValueError(f"⚠️ 알 수 없는 RPC입니다: {name}")
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=self._match_documents(name, params)))
+
+    def _live_matrix(self):
+        with self._lock:
+            if self._matrix is None:
+                rows = [
+                    row for row in self.tables.get(config.VECTOR_DB_TABLE, [])
+                    if row.get("deleted_at") is None and row.get("embedding")
+                ]
+                vectors = np.asarray([json.loads(row["embedding"]) for row in rows], dtype=np.float32)
+                if len(rows):
+                    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+                self._matrix = (rows, vectors)
+            return self._matrix
+
+    def _match_documents(self, name: str, params: Dict) -> List[Dict]:
+        self.rpc_calls += 1
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+        rows, vectors = self._live_matrix()
+        if not rows:
+            return []
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        sims = vectors @ query
+
+        candidates = np.flatnonzero(sims > params.get("match_threshold", 0.0))
+        if name == config.VECTOR_DB_FILTERED_QUERY_FUNC:
+            category, source = params.get("filter_category"), params.get("filter_source")
+            tags = set(params.get("filter_tags") or [])
+
+            def keep(row):
+                meta = row.get("metadata") or {}
+                return (not category or meta.get("category") == category) \
+                    and (not source or meta.get("source") == source) \
+                    and tags.issubset(meta.get("tags") or [])
+
+            candidates = np.asarray([i for i in candidates if keep(rows[i])], dtype=np.int64)
+
+        order = candidates[np.argsort(-sims[candidates])][:params.get("match_count", 5)]
+        return [
+            {
+                "id": rows[i]["id"],
+                "content": rows[i].get("content", ""),
+                "metadata": rows[i].get("metadata") or {},
+                "similarity": float(sims[i])
+            }
+            for i in order
+        ]
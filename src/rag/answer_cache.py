@@ -0,0 +1,210 @@
+"""
+FitLife AI - 의미 기반 응답 캐시 (Semantic Answer Cache)
+비슷한 질문("당뇨에 좋은 운동" / "당뇨 환자 운동 추천")을 비슷한 프로필의 사용자가 다시 물으면
+Gemini를 호출하지 않고 저장된 응답(답변 + 출처)을 돌려줍니다.
+
+- 같은 모드(general / food / exercise) + 같은 프로필 지문 안에서만 비교
+- 검색어(질문 + 프로필 키워드) 임베딩 코사인 유사도가 threshold 이상이면 적중 (검색에 쓰는 벡터를 그대로 키로 사용)
+- 메모리 계층: 전체 항목 LRU + 항목별 TTL
+- 디스크 계층(선택): sqlite에 기록, 시작 시 만료되지 않은 항목을 다시 적재
+- 이전 대화에 의존하는 질문(chat_history가 있는 턴)은 호출하는 쪽에서 bypass()로 건너뜀
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .embedding_cache import normalize_query
+
+
+def _profile_value(profile: Union[Dict, object], name: str):
+    if isinstance(profile, dict):
+        return profile.get(name)
+    return getattr(profile, name, None)
+
+
+def _as_set(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace("/", ",").split(",")
+    return sorted({str(v).strip() for v in value if str(v).strip()})
+
+
+def profile_fingerprint(user_profile: Optional[Union[Dict, object]], target_calories: int, calorie_bucket: int = 250) -> str:
+    """
+    응답에 영향을 주는 프로필 요소만 뽑은 거친 지문
+    질환/알러지 집합, 목표, 칼로리 구간(calorie_bucket 단위), 특이사항(notes)
+    특이사항은 자유 입력이지만 안전과 직결되므로(예: "무릎 통증") 지문에 포함합니다.
+    """
+    if not user_profile:
+        parts = {"calorie_bucket": int(target_calories) // calorie_bucket}
+    else:
+        parts = {
+            "diseases": _as_set(_profile_value(user_profile, "diseases")),
+            "allergies": _as_set(_profile_value(user_profile, "allergies")),
+            "goal": str(_profile_value(user_profile, "goal") or ""),
+            "notes": normalize_query(_profile_value(user_profile, "notes") or ""),
+            "calorie_bucket": int(target_calories) // calorie_bucket
+        }
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class _Entry:
+    bucket: str
+    vector: np.ndarray
+    result: Dict
+    expires_at: float
+    elapsed: float  # 원래 응답 생성에 걸린 시간 (적중 시 절약한 지연 시간)
+
+
+class AnswerCache:
+    """모드 + 프로필 지문별로 묶은 질문 임베딩 → 응답 캐시"""
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_size: int = 512,
+        ttl: float = 6 * 60 * 60,
+        disk_path: Optional[str] = None
+    ):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+
+        self._db = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers "
+                "(key TEXT PRIMARY KEY, bucket TEXT NOT NULL, vector BLOB NOT NULL, "
+                "result TEXT NOT NULL, expires_at REAL NOT NULL, elapsed REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load_from_disk()
+
+    @staticmethod
+    def bucket_key(mode: str, fingerprint: str) -> str:
+        return f"{mode}:{fingerprint}"
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _load_from_disk(self):
+        rows = self._db.execute(
+            "SELECT key, bucket, vector, result, expires_at, elapsed FROM answers "
+            "WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+            (time.time(), self.max_size)
+        ).fetchall()
+        for key, bucket, vector, result, expires_at, elapsed in reversed(rows):
+            self._insert(key, _Entry(bucket, np.frombuffer(vector, dtype=np.float32), json.loads(result), expires_at, elapsed))
+
+    def _insert(self, key: str, entry: _Entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._buckets.setdefault(entry.bucket, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        keys = self._buckets.get(entry.bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._buckets[entry.bucket]
+
+    def bypass(self):
+        """캐시를 쓰지 않은 요청 수 집계 (대화 맥락 의존 턴 등)"""
+        with self._lock:
+            self.bypassed += 1
+
+    def lookup(self, query_vector, mode: str, fingerprint: str) -> Optional[Dict]:
+        """가장 비슷한 저장 질문이 threshold 이상이면 저장된 응답(사본)을 반환합니다."""
+        bucket = self.bucket_key(mode, fingerprint)
+        query = self._normalize(query_vector)
+        now = time.time()
+
+        with self._lock:
+            keys = [k for k in self._buckets.get(bucket, ()) if self._entries[k].expires_at > now]
+            for expired in set(self._buckets.get(bucket, ())) - set(keys):
+                self._remove(expired)
+            if keys:
+                sims = np.stack([self._entries[k].vector for k in keys]) @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = keys[best]
+                    entry = self._entries[key]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += entry.elapsed
+                    result = dict(entry.result)
+                    result["cache"] = {"hit": True, "similarity": round(float(sims[best]), 4)}
+                    return result
+            self.misses += 1
+        return None
+
+    def store(self, query: str, query_vector, mode: str, fingerprint: str, result: Dict, elapsed: float):
+        bucket = self.bucket_key(mode, fingerprint)
+        key = hashlib.sha1(f"{bucket}\x00{normalize_query(query)}".encode("utf-8")).hexdigest()
+        entry = _Entry(
+            bucket,
+            self._normalize(query_vector),
+            {k: v for k, v in result.items() if k != "cache"},
+            time.time() + self.ttl,
+            elapsed
+        )
+        with self._lock:
+            self._insert(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO answers (key, bucket, vector, result, expires_at, elapsed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, bucket, entry.vector.tobytes(), json.dumps(entry.result, ensure_ascii=False, default=str),
+                         entry.expires_at, elapsed)
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    print(f"⚠️ 응답 캐시 디스크 기록 실패: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "latency_saved_seconds": round(self.saved_seconds, 2)
+        }
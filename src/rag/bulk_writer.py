@@ -0,0 +1,200 @@
+"""
+FitLife AI - 대량 업로드(Bulk Upsert) 모듈
+문서를 배치 단위로 임베딩/저장하여 페이로드 한도와 메모리 사용량을 제한합니다.
+
+- content_hash 기준 upsert: 같은 문서를 다시 올려도 중복 행이 생기지 않음 (멱등)
+- 배치별 재시도 + 지수 백오프, 끝까지 실패한 배치는 행 단위로 나눠 불량 행만 격리
+- 결과는 BulkWriteResult(written / failed / skipped)로 반환
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import src.config as config
+
+
+def document_hash(content: str, metadata: Optional[Dict] = None) -> str:
+    """정규화한 본문 + 메타데이터로 문서 고유 해시를 계산합니다."""
+    meta = {k: v for k, v in (metadata or {}).items() if k != "content_hash"}
+    normalized = " ".join(str(content).split())
+    raw = normalized + "\x00" + json.dumps(meta, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@dataclass
+class BulkWriteResult:
+    """대량 업로드 결과 요약"""
+    written: int = 0
+    failed: int = 0
+    skipped: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def merge(self, other: "BulkWriteResult"):
+        self.written += other.written
+        self.failed += other.failed
+        self.skipped += other.skipped
+        self.batches += other.batches
+        self.errors.extend(other.errors)
+
+    def __str__(self):
+        return f"저장 {self.written}개 / 실패 {self.failed}개 / 건너뜀 {self.skipped}개 (배치 {self.batches}회)"
+
+
+@dataclass
+class SyncResult:
+    """증분 동기화 결과 요약"""
+    added: int = 0
+    unchanged: int = 0
+    tombstoned: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        return (f"추가/변경 {self.added}개 / 변경 없음 {self.unchanged}개 / "
+                f"삭제 표시 {self.tombstoned}개 / 실패 {self.failed}개 ({self.elapsed:.1f}초)")
+
+
+class BulkWriter:
+    """
+    documents 테이블용 배치 업서트 작성기
+
+    rows는 {"content", "metadata"} 형태이며, 임베딩과 content_hash는 여기서 채웁니다.
+    """
+
+    def __init__(
+        self,
+        supabase_client,
+        embedding_model,
+        batch_size: int = None,
+        max_retries: int = None,
+        backoff: float = None,
+        on_batch_written: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        self.supabase_client = supabase_client
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.max_retries = max_retries if max_retries is not None else config.INGEST_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else config.INGEST_RETRY_BACKOFF
+        self.on_batch_written = on_batch_written
+
+    def write(self, rows: Iterable[Dict]) -> BulkWriteResult:
+        """rows를 batch_size 단위로 끊어서 임베딩 → upsert 합니다. (제너레이터 입력 가능)"""
+        result = BulkWriteResult()
+        seen = set()
+
+        for batch in _chunked(rows, self.batch_size):
+            result.merge(self._write_batch(batch, seen))
+        return result
+
+    def _existing_hashes(self, hashes: List[str]) -> set:
+        existing = set()
+        try:
+            # in.(...) 필터는 URL에 실리므로 배치를 작은 묶음으로 나눠 조회
+            for chunk in _chunked(hashes, config.INGEST_FILTER_CHUNK):
+                response = self.supabase_client.table(config.VECTOR_DB_TABLE)\
+                    .select("content_hash")\
+                    .in_("content_hash", chunk)\
+                    .is_("deleted_at", "null")\
+                    .execute()
+                existing.update(item["content_hash"] for item in (response.data or []))
+            return existing
+        except Exception as e:
+            # 조회 실패 시에도 upsert 자체가 멱등이므로 그대로 진행
+            print(f"⚠️ 기존 해시 조회 실패 (전체 업서트로 진행): {e}")
+            return set()
+
+    def _write_batch(self, batch: List[Dict], seen: set) -> BulkWriteResult:
+        result = BulkWriteResult(batches=1)
+
+        # 1. 해시 계산 + 배치 내/이전 배치와의 중복 제거
+        pending = []
+        for row in batch:
+            meta = dict(row.get("metadata") or {})
+            content_hash = document_hash(row["content"], meta)
+            if content_hash in seen:
+                result.skipped += 1
+                continue
+            seen.add(content_hash)
+            meta["content_hash"] = content_hash
+            # deleted_at을 비워 두면 tombstone 처리됐던 문서가 다시 들어올 때 되살아납니다.
+            pending.append({"content": row["content"], "metadata": meta, "content_hash": content_hash, "deleted_at": None})
+
+        # 2. 이미 저장된 문서는 임베딩 계산 없이 건너뜀
+        if pending:
+            existing = self._existing_hashes([row["content_hash"] for row in pending])
+            result.skipped += sum(1 for row in pending if row["content_hash"] in existing)
+            pending = [row for row in pending if row["content_hash"] not in existing]
+        if not pending:
+            return result
+
+        # 3. 배치 임베딩
+        try:
+            embeddings = self.embedding_model.embed_documents([row["content"] for row in pending])
+        except Exception as e:
+            result.failed += len(pending)
+            result.errors.append(f"임베딩 실패: {e}")
+            return result
+        for row, embedding in zip(pending, embeddings):
+            row["embedding"] = embedding
+
+        # 4. upsert (재시도) → 끝까지 실패하면 행 단위로 격리
+        error = self._upsert_with_retry(pending)
+        if error is None:
+            result.written += len(pending)
+            return result
+
+        print(f"⚠️ 배치 저장 실패, 행 단위로 재시도합니다: {error}")
+        for row in pending:
+            row_error = self._upsert_with_retry([row], retries=1)
+            if row_error is None:
+                result.written += 1
+            else:
+                result.failed += 1
+                result.errors.append(f"{row['metadata'].get('title', '')}: {row_error}")
+        return result
+
+    def _upsert_with_retry(self, rows: List[Dict], retries: int = None) -> Optional[Exception]:
+        # retries=0이 들어와도 최소 한 번은 시도 (시도 없이 성공으로 보고하지 않도록)
+        retries = max(1, retries if retries is not None else self.max_retries)
+        for attempt in range(retries):
+            try:
+                response = self.supabase_client.table(config.VECTOR_DB_TABLE)\
+                    .upsert(rows, on_conflict="content_hash")\
+                    .execute()
+            except Exception as e:
+                if attempt < retries - 1:
+                    time.sleep(self.backoff * (2 ** attempt))
+                    continue
+                return e
+
+            # 응답 행의 순서는 보장되지 않으므로 content_hash로 id를 되찾음
+            saved_ids = {}
+            for saved in response.data or []:
+                content_hash = saved.get("content_hash") or (saved.get("metadata") or {}).get("content_hash")
+                saved_ids[content_hash] = saved.get("id")
+            for row in rows:
+                row["id"] = saved_ids.get(row["content_hash"])
+
+            if self.on_batch_written:
+                try:
+                    self.on_batch_written(rows)
+                except Exception as e:
+                    # 저장은 이미 끝났으므로 실패로 세지 않음 (로컬 색인/임베딩 저장소만 뒤처짐)
+                    print(f"⚠️ 저장 후 처리(on_batch_written) 실패: {e}")
+            return None
+        return RuntimeError("업서트를 한 번도 시도하지 않았습니다.")
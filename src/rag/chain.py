@@ -1,42 +1,142 @@
 """
 RAG 체인 - LLM과 지식베이스 연동 (하이브리드 검색 + 시퀀스 추천 + 칼로리 계산 + 대화 메모리 + 다양성 확보)
 """
+import asyncio
+import hashlib
+import json
 import time
-import random  # ★ [추가] 랜덤 셔플링을 위해 필요
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from typing import List, Dict, Optional, Union
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 
 # 상대 경로 import 유지
 from .knowledge_base import KnowledgeBase
+from .diversity import mmr_select
+from .dedup import DedupReport, collapse_duplicates
+from .answer_cache import AnswerCache, profile_fingerprint
+from .prompt_budget import PromptBudget, PromptReport
+from .memory import ConversationMemory
+from .embedding_cache import normalize_query
+from .. import config
 from ..config import GOOGLE_API_KEY
+from ..utils.llm_guard import ResilientLLM
+from ..utils.metrics import record_span, span
+from ..utils.singleflight import SingleFlight
+from ..utils.tokens import estimate_tokens
+
+LLM_ERROR_MESSAGE = "⚠️ 일시적인 AI 서비스 오류입니다. 잠시 후 다시 시도해주세요."
+
+# query_batch 요청 항목의 기본값 (query()의 인자와 같은 이름)
+_BATCH_DEFAULTS = {"user_profile": None, "search_categories": None, "mode": "general", "chat_history": []}
+
 
 class FitLifeRAG:
     """FitLife AI RAG 시스템"""
     
-    def __init__(self):
-        self.kb = KnowledgeBase()
+    def __init__(self, kb: Optional[KnowledgeBase] = None, llm=None):
+        """kb / llm을 주면 그대로 사용합니다. (오프라인 벤치마크: src.fakes)"""
+        self.kb = kb or KnowledgeBase()
         
         # 사용자가 성공한 Gemini 2.5 모델 유지
-        self.llm = ChatGoogleGenerativeAI(
+        # 재시도(백오프 + 지터) / 시도별 타임아웃 / 헤징 / 서킷 브레이커는 ResilientLLM이 담당
+        self.llm = ResilientLLM(llm or ChatGoogleGenerativeAI(
             model="gemini-2.5-flash", 
             google_api_key=GOOGLE_API_KEY,
             temperature=0.4, # ★ [수정] 창의성을 위해 0.3 -> 0.4로 약간 높임
             max_output_tokens=4096
+        ), name="gemini")
+
+        # 의미 기반 응답 캐시 (비슷한 질문 + 같은 모드 + 비슷한 프로필이면 LLM 호출 생략)
+        self.answer_cache = None
+        if config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                threshold=config.ANSWER_CACHE_THRESHOLD,
+                max_size=config.ANSWER_CACHE_SIZE,
+                ttl=config.ANSWER_CACHE_TTL,
+                disk_path=config.ANSWER_CACHE_PATH
+            )
+
+        # 프롬프트 토큰 예산 (프로필 → 상위 문서 → 최근 대화 순으로 채움)
+        self.prompt_budget = PromptBudget(
+            budget=config.RAG_PROMPT_TOKEN_BUDGET,
+            min_snippet_tokens=config.RAG_MIN_SNIPPET_TOKENS,
+            history_reserve=config.RAG_HISTORY_RESERVE_TOKENS
         )
 
-    def query(
-        self, 
-        user_query: str, 
-        user_profile: Optional[Union[Dict, object]] = None,
-        search_categories: Optional[List[str]] = None,
-        mode: str = "general",
-        chat_history: List = []  # 대화 기록 받기
-    ) -> Dict:
+        # 세션별 대화 메모리 (session_id를 주면 chat_history 대신 롤링 요약 + 최근 턴 원문 사용)
+        # llm을 주입한 경우(오프라인 대역) 요약도 같은 모델로 처리
+        self.memory = ConversationMemory(llm=llm)
+
+        # 동시에 들어온 같은 요청 병합 (푸시 알림 직후 같은 질문이 몰릴 때 검색/LLM 호출 1번)
+        # 결과가 kb/llm에 따라 달라지므로 인스턴스마다 따로 둠
+        self.flights = SingleFlight()
+
+    def _prepare(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]],
+        search_categories: Optional[List[str]],
+        mode: str,
+        chat_history: List,
+        expanded: Tuple[str, int],
+        query_vector: Optional[List[float]] = None
+    ) -> Tuple[List, List, DedupReport, PromptReport]:
         """
-        사용자 질문에 대한 RAG 기반 응답 생성 (하이브리드 검색 + 메모리 사용 + 결과 셔플링)
+        검색 → 컨텍스트 구성 → 프롬프트 생성까지 (query / stream_query 공통)
+        expanded는 _expand_query 결과, query_vector는 응답 캐시 조회 때 계산한 검색어 임베딩 (없으면 여기서 임베딩)
         """
-        
+        enhanced_query, target_calories = expanded
+        search_results_raw = self._retrieve(enhanced_query, search_categories, query_vector)
+        return self._assemble(user_query, user_profile, mode, chat_history, search_results_raw, target_calories)
+
+    def _retrieve(
+        self,
+        enhanced_query: str,
+        search_categories: Optional[List[str]],
+        query_vector: Optional[List[float]] = None
+    ) -> List:
+        """2. [데이터 확보] 하이브리드 검색 실행 (MMR로 고를 후보 풀 확보)"""
+        pool_size = config.RAG_CANDIDATE_POOL
+        with span("search"):
+            if search_categories:
+                # 카테고리별로 충분히 가져와서 섞음 (임베딩 1회 + 카테고리별 동시 조회 + 중복 제거)
+                return self.kb.search_many(enhanced_query, search_categories, top_k=pool_size, query_vector=query_vector)
+            return self.kb.search(enhanced_query, top_k=pool_size, query_vector=query_vector)
+
+    async def _aprepare(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]],
+        search_categories: Optional[List[str]],
+        mode: str,
+        chat_history: List,
+        expanded: Tuple[str, int],
+        query_vector: Optional[List[float]] = None
+    ) -> Tuple[List, List, DedupReport, PromptReport]:
+        """_prepare의 비동기 버전 - 임베딩/검색/문서 벡터 계산을 모두 이벤트 루프 밖에서 실행"""
+        enhanced_query, target_calories = expanded
+        pool_size = config.RAG_CANDIDATE_POOL
+        with span("search"):
+            if search_categories:
+                search_results_raw = await self.kb.asearch_many(
+                    enhanced_query, search_categories, top_k=pool_size, query_vector=query_vector
+                )
+            else:
+                search_results_raw = await self.kb.asearch(enhanced_query, top_k=pool_size, query_vector=query_vector)
+
+        # 중복 제거/MMR에 쓰는 문서 벡터 조회(필요하면 임베딩)도 CPU 작업이므로 스레드에서 실행
+        return await asyncio.to_thread(
+            self._assemble, user_query, user_profile, mode, chat_history, search_results_raw, target_calories
+        )
+
+    def _expand_query(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]],
+        mode: str
+    ) -> Tuple[str, int]:
+        """검색어 확장 → (검색어, 목표 칼로리)"""
         # 1. [검색어 확장] 사용자 의도 및 프로필 정보를 섞어 검색어 보강 (벡터 다양성 확보)
         enhanced_query = user_query
         target_goal = ""
@@ -78,81 +178,415 @@ class FitLifeRAG:
         elif mode == "exercise":
             enhanced_query += " 운동방법 자세 주의사항 효과 루틴"
 
-        # 2. [데이터 확보] 하이브리드 검색 실행 (Top-K를 3배수로 늘려서 다양성 풀 확보)
-        search_results_raw = []
-        pool_size = 30 # ★ [수정] 15~20개 대신 30개를 가져와서 섞을 예정
+        return enhanced_query, target_calories
 
-        if search_categories:
-            for category in search_categories:
-                # 카테고리별로 충분히 가져와서 섞음
-                results = self.kb.search(enhanced_query, top_k=pool_size, category=category)
-                search_results_raw.extend(results)
-        else:
-            search_results_raw = self.kb.search(enhanced_query, top_k=pool_size)
-        
-        # 3. [컨텍스트 구성] 셔플링 & 샘플링 전략 적용
-        # 중복 제거 및 점수순 정렬
-        # (딕셔너리 등을 이용해 중복 문서가 있다면 제거하는 로직이 필요하다면 추가, 여기선 생략)
-        search_results_raw.sort(key=lambda x: x[1], reverse=True)
-        
-        final_results = []
-        target_count = 10 # LLM에게 줄 최종 문서 개수
+    def _assemble(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]],
+        mode: str,
+        chat_history: List,
+        search_results_raw: List,
+        target_calories: int
+    ) -> Tuple[List, List, DedupReport, PromptReport]:
+        """검색 결과로 컨텍스트와 LLM 메시지를 구성합니다. (토큰 예산: 프로필 → 문서 → 최근 대화 순)"""
+        # 3. [컨텍스트 구성] 중복 제거 후 MMR로 관련도 높고 서로 겹치지 않는 문서 선택
+        with span("select"):
+            search_results_raw.sort(key=lambda x: x[1], reverse=True)
+            final_results, dedup_report = self._select_documents(search_results_raw, config.RAG_CONTEXT_DOCS)
+        prompt_started = time.perf_counter()
+        if dedup_report.removed:
+            print(f"🧹 중복 문서 {dedup_report.removed}개 제거 (프롬프트 약 {dedup_report.tokens_saved}토큰 절약)")
 
-        if len(search_results_raw) >= target_count:
-            # ★ [핵심 기능] MMR 유사 방식: 상위권은 유지하되 나머지는 랜덤 섞기
-            # (A) Top Tier: 정확도가 가장 높은 상위 3개는 무조건 포함 (할루시네이션 방지)
-            top_tier = search_results_raw[:3]
-            
-            # (B) Random Tier: 나머지 문서들 중에서 랜덤으로 7개 뽑기 (다양성 확보)
-            remaining_pool = search_results_raw[3:]
-            random_tier = random.sample(remaining_pool, k=min(target_count - 3, len(remaining_pool)))
-            
-            # 합치고 다시 점수순 정렬 (LLM이 읽기 편하게)
-            final_results = top_tier + random_tier
-            final_results.sort(key=lambda x: x[1], reverse=True)
+        profile_info = self._format_profile(user_profile) if user_profile else ""
+
+        # 대화 맥락(History) - 최근 RAG_HISTORY_MESSAGES개 후보, 길면 예산 안에서 문장 단위로 자름
+        # 세션 메모리에서 온 기록(첫 항목이 요약)은 이미 요약 + 최근 턴으로 줄어 있으므로 그대로 사용
+        if chat_history and chat_history[0].get("role") == "summary":
+            recent_history = chat_history
         else:
-            final_results = search_results_raw
+            recent_history = chat_history[-config.RAG_HISTORY_MESSAGES:]
+        history_lines = []
+        for msg in recent_history:
+            if not msg.get("content"):
+                continue
+            role = {"user": "사용자", "summary": "이전 대화 요약"}.get(msg["role"], "AI")
+            history_lines.append(f"- {role}: {msg['content']}")
+
+        # 4. [토큰 예산] 시스템 프롬프트/질문은 고정, 나머지는 우선순위대로 채움
+        system_prompt, skeleton = self._create_xai_prompt(mode, "", user_query, "", target_calories)
+        profile_info, doc_lines, history_lines, prompt_report = self.prompt_budget.fill(
+            {"system": system_prompt, "query": skeleton},
+            profile_info,
+            [self._format_context_line(i, doc, score) for i, (doc, score) in enumerate(final_results, 1)],
+            history_lines
+        )
+        final_results = final_results[:len(doc_lines)]  # 출처/신뢰도는 실제로 프롬프트에 들어간 문서 기준
+        if prompt_report.docs_dropped or prompt_report.history_dropped:
+            print(f"✂️ 프롬프트 예산 {prompt_report.budget}토큰: 문서 {prompt_report.docs_dropped}개, "
+                  f"대화 {prompt_report.history_dropped}개 생략")
+
+        # [XAI 프롬프트] 모드별 구조화된 프롬프트 생성
+        context = "\n".join(doc_lines) if doc_lines else "관련 자료 없음."
+        _, base_user_message = self._create_xai_prompt(mode, profile_info, user_query, context, target_calories)
 
-        context = self._build_context(final_results)
-        profile_info = self._format_profile(user_profile) if user_profile else ""
-        
-        # 4. [XAI 프롬프트] 모드별 구조화된 프롬프트 생성
-        system_prompt, base_user_message = self._create_xai_prompt(mode, profile_info, user_query, context, target_calories)
-        
-        # 대화 맥락(History) 주입
         history_text = ""
-        if chat_history:
-            history_text = "\n[이전 대화 내역 (참고용)]:\n"
-            for msg in chat_history[-6:]: 
-                role = "사용자" if msg["role"] == "user" else "AI"
-                content = str(msg.get("content", ""))
-                if len(content) < 500:
-                    history_text += f"- {role}: {content}\n"
-        
+        if history_lines:
+            history_text = "\n[이전 대화 내역 (참고용)]:\n" + "\n".join(history_lines) + "\n"
+
         final_user_message = f"{base_user_message}\n{history_text}"
 
         messages = [
             SystemMessage(content=system_prompt),
             HumanMessage(content=final_user_message)
         ]
-        
-        # 5. LLM 호출 (재시도 로직 포함)
-        response_content = ""
-        max_retries = 3
-        
-        for attempt in range(max_retries):
+
+        record_span("prompt", time.perf_counter() - prompt_started)
+        return messages, final_results, dedup_report, prompt_report
+
+    def query(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]] = None,
+        search_categories: Optional[List[str]] = None,
+        mode: str = "general",
+        chat_history: List = [],  # 대화 기록 받기
+        session_id: Optional[str] = None  # 세션 메모리 사용 (chat_history 대신)
+    ) -> Dict:
+        """
+        사용자 질문에 대한 RAG 기반 응답 생성 (하이브리드 검색 + 메모리 사용 + 중복 제거/MMR)
+        같은 요청(정규화한 질문 + 프로필 + 카테고리 + 모드 + 대화)이 처리 중이면 그 결과를 함께 받습니다.
+        """
+        key = self._flight_key(user_query, user_profile, search_categories, mode, chat_history, session_id)
+        return self.flights.do(
+            key, self._query, user_query, user_profile, search_categories, mode, chat_history, session_id
+        )
+
+    async def aquery(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]] = None,
+        search_categories: Optional[List[str]] = None,
+        mode: str = "general",
+        chat_history: List = [],
+        session_id: Optional[str] = None
+    ) -> Dict:
+        """query()의 비동기 버전 (FastAPI용) - 같은 이벤트 루프에서 처리 중인 같은 요청과 병합"""
+        key = self._flight_key(user_query, user_profile, search_categories, mode, chat_history, session_id)
+        return await self.flights.do_async(
+            key, self._aquery, user_query, user_profile, search_categories, mode, chat_history, session_id
+        )
+
+    def _flight_key(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]],
+        search_categories: Optional[List[str]],
+        mode: str,
+        chat_history: List,
+        session_id: Optional[str]
+    ) -> str:
+        """응답을 결정하는 입력 전체의 지문 (질문은 공백/대소문자 정규화)"""
+        if user_profile is not None and not isinstance(user_profile, dict):
+            user_profile = getattr(user_profile, "__dict__", str(user_profile))
+        raw = json.dumps({
+            "query": normalize_query(user_query),
+            "profile": user_profile,
+            "categories": sorted(search_categories or []),
+            "mode": mode,
+            "history": chat_history,
+            "session": session_id
+        }, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _query(
+        self, 
+        user_query: str, 
+        user_profile: Optional[Union[Dict, object]] = None,
+        search_categories: Optional[List[str]] = None,
+        mode: str = "general",
+        chat_history: List = [],  # 대화 기록 받기
+        session_id: Optional[str] = None  # 세션 메모리 사용 (chat_history 대신)
+    ) -> Dict:
+        """
+        query()의 실제 처리 (병합되지 않은 요청만 실행)
+        비슷한 질문/프로필의 응답이 캐시에 있으면 검색과 LLM 호출 없이 바로 반환합니다.
+        """
+        if session_id:
+            chat_history = self.memory.context(session_id)
+        with span("expand"):
+            expanded = self._expand_query(user_query, user_profile, mode)
+        cache_key = query_vector = None
+        if self._use_answer_cache(chat_history):
             try:
-                response = self.llm.invoke(messages)
-                response_content = response.content
-                break 
+                # 검색에 쓸 검색어 벡터를 그대로 캐시 키로 사용 (원문 질문을 따로 임베딩하지 않음)
+                query_vector = self.kb.embed_query(expanded[0])
+                cache_key = self._answer_cache_key(query_vector, user_profile, search_categories, mode, expanded[1])
+                with span("answer_cache"):
+                    cached = self.answer_cache.lookup(*cache_key)
+                if cached is not None:
+                    self._remember(session_id, user_query, cached["answer"])
+                    return cached
             except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
-                else:
-                    response_content = "⚠️ 일시적인 AI 서비스 오류입니다. 잠시 후 다시 시도해주세요."
+                print(f"⚠️ 응답 캐시 조회 실패 (캐시 없이 진행): {e}")
+                cache_key = None
+        started = time.perf_counter()
+
+        messages, final_results, dedup_report, prompt_report = self._prepare(
+            user_query, user_profile, search_categories, mode, chat_history, expanded, query_vector
+        )
+        
+        # 5. LLM 호출 (재시도/타임아웃/서킷 브레이커는 ResilientLLM 내부에서 처리)
+        try:
+            with span("llm"):
+                response_content = self.llm.invoke(messages).content
+        except Exception as e:
+            print(f"⚠️ LLM 호출 실패: {e}")
+            response_content = LLM_ERROR_MESSAGE
         
         # 6. 결과 반환 포맷팅
+        result = self._response_meta(final_results, dedup_report, prompt_report)
+        result["answer"] = response_content
+        self._store_answer(cache_key, user_query, result, started)
+        self._remember(session_id, user_query, response_content)
+        return result
+
+    async def _aquery(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]] = None,
+        search_categories: Optional[List[str]] = None,
+        mode: str = "general",
+        chat_history: List = [],
+        session_id: Optional[str] = None
+    ) -> Dict:
+        """
+        _query()의 비동기 버전
+        임베딩은 전용 스레드, 검색 RPC는 스레드풀, LLM은 ainvoke로 처리하여 이벤트 루프를 막지 않습니다.
+        """
+        if session_id:
+            chat_history = self.memory.context(session_id)
+        with span("expand"):
+            expanded = self._expand_query(user_query, user_profile, mode)
+        cache_key = query_vector = None
+        if self._use_answer_cache(chat_history):
+            try:
+                query_vector = await self.kb.aembed_query(expanded[0])
+                cache_key = self._answer_cache_key(query_vector, user_profile, search_categories, mode, expanded[1])
+                with span("answer_cache"):
+                    cached = self.answer_cache.lookup(*cache_key)
+                if cached is not None:
+                    self._remember(session_id, user_query, cached["answer"])
+                    return cached
+            except Exception as e:
+                print(f"⚠️ 응답 캐시 조회 실패 (캐시 없이 진행): {e}")
+                cache_key = None
+        started = time.perf_counter()
+
+        messages, final_results, dedup_report, prompt_report = await self._aprepare(
+            user_query, user_profile, search_categories, mode, chat_history, expanded, query_vector
+        )
+
+        try:
+            with span("llm"):
+                response_content = (await self.llm.ainvoke(messages)).content
+        except Exception as e:
+            print(f"⚠️ LLM 호출 실패: {e}")
+            response_content = LLM_ERROR_MESSAGE
+
+        result = self._response_meta(final_results, dedup_report, prompt_report)
+        result["answer"] = response_content
+        self._store_answer(cache_key, user_query, result, started)
+        self._remember(session_id, user_query, response_content)
+        return result
+
+    def stream_query(
+        self,
+        user_query: str,
+        user_profile: Optional[Union[Dict, object]] = None,
+        search_categories: Optional[List[str]] = None,
+        mode: str = "general",
+        chat_history: List = [],
+        session_id: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        query()의 스트리밍 버전 - LLM 응답 조각을 도착하는 즉시 내보냅니다.
+
+        이벤트 순서:
+            {"type": "meta", "sources", "confidence", "dedup", "prompt_tokens"}  # 검색 직후 (LLM 호출 전)
+            {"type": "token", "content"}                         # 응답 조각 (여러 번)
+            {"type": "done", "answer"}                           # 전체 응답
+        첫 조각을 받기 전 실패하면 query()와 같이 재시도하고, 도중에 끊기면 받은 데까지 반환합니다.
+        응답 캐시에 적중하면 meta 다음에 전체 답변을 한 조각으로 보냅니다.
+        """
+        if session_id:
+            chat_history = self.memory.context(session_id)
+        with span("expand"):
+            expanded = self._expand_query(user_query, user_profile, mode)
+        cache_key = query_vector = None
+        if self._use_answer_cache(chat_history):
+            try:
+                query_vector = self.kb.embed_query(expanded[0])
+                cache_key = self._answer_cache_key(query_vector, user_profile, search_categories, mode, expanded[1])
+                with span("answer_cache"):
+                    cached = self.answer_cache.lookup(*cache_key)
+            except Exception as e:
+                print(f"⚠️ 응답 캐시 조회 실패 (캐시 없이 진행): {e}")
+                cache_key, cached = None, None
+            if cached is not None:
+                answer = cached.pop("answer")
+                yield dict(cached, type="meta")
+                yield {"type": "token", "content": answer}
+                self._remember(session_id, user_query, answer)
+                yield {"type": "done", "answer": answer}
+                return
+        started = time.perf_counter()
+
+        messages, final_results, dedup_report, prompt_report = self._prepare(
+            user_query, user_profile, search_categories, mode, chat_history, expanded, query_vector
+        )
+        meta = self._response_meta(final_results, dedup_report, prompt_report)
+        yield dict(meta, type="meta")
+
+        parts = []
+        llm_started = time.perf_counter()
+        try:
+            for chunk in self.llm.stream(messages):
+                text = chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+                if text:
+                    if not parts:
+                        # 스트리밍은 소비 속도에 따라 총 시간이 달라지므로 첫 조각까지의 시간만 기록
+                        record_span("llm_first_token", time.perf_counter() - llm_started)
+                    parts.append(text)
+                    yield {"type": "token", "content": text}
+        except Exception as e:
+            if parts:
+                print(f"⚠️ 스트리밍 중단: {e}")
+            else:
+                print(f"⚠️ LLM 호출 실패: {e}")
+                parts.append(LLM_ERROR_MESSAGE)
+                yield {"type": "token", "content": LLM_ERROR_MESSAGE}
+
+        meta["answer"] = "".join(parts)
+        self._store_answer(cache_key, user_query, meta, started)
+        self._remember(session_id, user_query, meta["answer"])
+        yield {"type": "done", "answer": meta["answer"]}
+
+    def query_batch(self, requests: List[Dict], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        여러 질문을 한 번에 처리합니다. (코호트 전체의 일일 플랜 생성 등)
+
+        - requests: query() 인자 dict 목록 {"user_query", "user_profile", "search_categories", "mode", "chat_history"}
+        - 모든 검색어를 embed_queries 한 번의 배치로 임베딩 (검색과 응답 캐시 조회에 같은 벡터 사용)
+        - 항목별 검색 → 컨텍스트 구성 → LLM 호출을 최대 max_concurrency개 동시에 실행
+
+        결과는 입력 순서대로 반환하며, 실패한 항목은 query()와 같은 형태에 "error"(사유)가 채워집니다.
+        """
+        max_concurrency = max_concurrency or config.QUERY_BATCH_CONCURRENCY
+        items = [dict(_BATCH_DEFAULTS, **request) for request in requests]
+        results: List[Optional[Dict]] = [None] * len(items)
+
+        # 1. 검색어 확장 + 임베딩할 문장 수집
+        expanded, use_cache, texts = {}, {}, []
+        for i, item in enumerate(items):
+            try:
+                with span("expand"):
+                    expanded[i] = self._expand_query(item["user_query"], item["user_profile"], item["mode"])
+                use_cache[i] = self._use_answer_cache(item["chat_history"])
+                texts.append(expanded[i][0])  # 검색과 응답 캐시 조회에 같은 벡터 사용
+            except Exception as e:
+                results[i] = self._error_result(e)
+
+        # 2. 배치 임베딩 (캐시 적중분 제외, 같은 문장은 한 번만)
+        try:
+            vectors = dict(zip(texts, self.kb.embed_queries(texts)))
+        except Exception as e:
+            print(f"⚠️ 배치 임베딩 실패: {e}")
+            return [result or self._error_result(e) for result in results]
+
+        # 3. 항목별 검색 + LLM (동시 실행 수 제한)
+        def run(i: int) -> Dict:
+            item = items[i]
+            started = time.perf_counter()
+            enhanced_query, target_calories = expanded[i]
+            cache_key = None
+            if use_cache[i]:
+                cache_key = self._answer_cache_key(
+                    vectors[enhanced_query], item["user_profile"], item["search_categories"], item["mode"], target_calories
+                )
+                with span("answer_cache"):
+                    cached = self.answer_cache.lookup(*cache_key)
+                if cached is not None:
+                    cached["error"] = None
+                    return cached
+
+            search_results_raw = self._retrieve(enhanced_query, item["search_categories"], vectors[enhanced_query])
+            messages, final_results, dedup_report, prompt_report = self._assemble(
+                item["user_query"], item["user_profile"], item["mode"], item["chat_history"], search_results_raw, target_calories
+            )
+
+            result = self._response_meta(final_results, dedup_report, prompt_report)
+            try:
+                with span("llm"):
+                    result["answer"] = self.llm.invoke(messages).content
+                result["error"] = None
+            except Exception as e:
+                print(f"⚠️ LLM 호출 실패: {e}")
+                result["answer"] = LLM_ERROR_MESSAGE
+                result["error"] = str(e)
+            self._store_answer(cache_key, item["user_query"], result, started)
+            return result
+
+        pending = [i for i in range(len(items)) if results[i] is None]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending) or 1)), thread_name_prefix="batch") as executor:
+            futures = {i: executor.submit(run, i) for i in pending}
+            for i, future in futures.items():
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"⚠️ 배치 항목 {i} 처리 실패: {e}")
+                    results[i] = self._error_result(e)
+        return results
+
+    @staticmethod
+    def _error_result(error: Exception) -> Dict:
+        return {"answer": LLM_ERROR_MESSAGE, "sources": [], "confidence": 0.0, "error": str(error)}
+
+    def _remember(self, session_id: Optional[str], user_query: str, answer: str):
+        """세션 메모리에 이번 턴 기록 (오류 안내 문구는 대화 맥락이 아니므로 제외)"""
+        if session_id and answer and answer != LLM_ERROR_MESSAGE:
+            self.memory.add_turn(session_id, user_query, answer)
+
+    def _use_answer_cache(self, chat_history: List) -> bool:
+        if self.answer_cache is None:
+            return False
+        if any(msg.get("content") for msg in chat_history):
+            # 이전 대화에 의존하는 턴은 같은 질문이라도 답이 달라지므로 캐시를 쓰지 않음
+            self.answer_cache.bypass()
+            return False
+        return True
+
+    def _answer_cache_key(
+        self,
+        query_vector: List[float],
+        user_profile: Optional[Union[Dict, object]],
+        search_categories: Optional[List[str]],
+        mode: str,
+        target_calories: int
+    ) -> Tuple:
+        """응답 캐시 조회 인자 (검색어 벡터, 모드+검색 범위, 프로필 지문)"""
+        scope = mode if not search_categories else f"{mode}|{','.join(sorted(search_categories))}"
+        fingerprint = profile_fingerprint(user_profile, target_calories, config.ANSWER_CACHE_CALORIE_BUCKET)
+        return query_vector, scope, fingerprint
+
+    def _store_answer(self, cache_key: Optional[Tuple], user_query: str, result: Dict, started: float):
+        # 오류 응답이나 빈 응답은 저장하지 않음
+        if cache_key is None or not result.get("answer") or result["answer"] == LLM_ERROR_MESSAGE:
+            return
+        query_vector, scope, fingerprint = cache_key
+        self.answer_cache.store(user_query, query_vector, scope, fingerprint, result, time.perf_counter() - started)
+
+    def _response_meta(self, final_results: List, dedup_report: DedupReport, prompt_report: PromptReport) -> Dict:
         formatted_sources = []
         for doc, score in final_results:
             source_item = doc.metadata.copy()
@@ -161,9 +595,10 @@ class FitLifeRAG:
             formatted_sources.append(source_item)
 
         return {
-            "answer": response_content,
             "sources": formatted_sources,
-            "confidence": self._calculate_confidence(final_results)
+            "confidence": self._calculate_confidence(final_results),
+            "dedup": dedup_report.to_dict(),
+            "prompt_tokens": prompt_report.to_dict()
         }
     
     def _create_xai_prompt(self, mode, profile_info, query, context, target_calories=2000):
@@ -231,17 +666,62 @@ class FitLifeRAG:
         user_message = f"{profile_info}\n[목표 칼로리]: {target_calories}kcal\n[질문]: {query}\n[참고 자료]:\n{context}"
         return system_prompt, user_message
 
-    def _build_context(self, search_results: List) -> str:
-        if not search_results: return "관련 자료 없음."
-        context_parts = []
-        for i, (doc, score) in enumerate(search_results, 1):
-            source = doc.metadata.get("source", "출처 미상")
-            title = doc.metadata.get("title", "제목 없음")
-            content = doc.page_content
-            # 하이브리드 검색 점수 표기 (디버깅용)
-            context_parts.append(f"[{i}] {title} (유사도: {score:.2f}) | {content}")
-        return "\n".join(context_parts)
-    
+    def _select_documents(self, search_results: List, target_count: int) -> Tuple[List, DedupReport]:
+        """
+        후보 풀 → 중복 제거 → MMR 선택 순서로 LLM에게 넘길 문서를 고릅니다.
+
+        - 본문이 같거나 임베딩 유사도가 RAG_DEDUP_THRESHOLD 이상인 문서는 최고 점수 하나만 남김
+        - 남은 문서 중 MMR(Maximal Marginal Relevance)로 target_count개 선택
+          (jitter가 0이면 같은 검색 결과에서 항상 같은 조합 → 재현/캐시 가능)
+        """
+        if not search_results:
+            return [], DedupReport()
+
+        # 벡터를 구하지 못한 문서가 있으면 None → 정확한 중복만 제거하고 점수순으로 선택
+        try:
+            vectors = self.kb.document_vectors([doc for doc, _ in search_results])
+        except Exception as e:
+            print(f"⚠️ 문서 벡터 조회 실패 (점수순 선택): {e}")
+            vectors = None
+
+        scores = [score for _, score in search_results]
+        keep, report = collapse_duplicates(
+            scores,
+            [doc.page_content for doc, _ in search_results],
+            vectors,
+            threshold=config.RAG_DEDUP_THRESHOLD
+        )
+
+        # 절약한 토큰: 점수순으로 target_count개를 그대로 보냈다면 프롬프트에 들어갔을 중복 문서 분량
+        baseline = sorted(range(len(search_results)), key=lambda i: scores[i], reverse=True)[:target_count]
+        kept = set(keep)
+        report.tokens_saved = sum(
+            estimate_tokens(self._format_context_line(0, *search_results[i])) for i in baseline if i not in kept
+        )
+
+        if len(keep) > target_count and vectors is not None:
+            picked = mmr_select(
+                vectors[keep],
+                [scores[i] for i in keep],
+                target_count,
+                lambda_mult=config.RAG_MMR_LAMBDA,
+                jitter=config.RAG_MMR_JITTER,
+                seed=config.RAG_MMR_SEED
+            )
+            keep = [keep[i] for i in picked]
+        else:
+            keep = keep[:target_count]
+
+        # LLM이 읽기 편하도록 다시 점수순 정렬
+        return sorted((search_results[i] for i in keep), key=lambda x: x[1], reverse=True), report
+
+    @staticmethod
+    def _format_context_line(i: int, doc, score: float) -> str:
+        source = doc.metadata.get("source", "출처 미상")
+        title = doc.metadata.get("title", "제목 없음")
+        # 하이브리드 검색 점수 표기 (디버깅용)
+        return f"[{i}] {title} (유사도: {score:.2f}) | {doc.page_content}"
+
     def _format_profile(self, profile: Union[Dict, object]) -> str:
         # 프로필 포맷팅
         parts = ["[사용자 프로필]"]
@@ -0,0 +1,171 @@
+"""
+FitLife AI - 오늘의 식단/운동 플랜 사전 계산 저장소
+맞춤 추천 탭의 질문은 목표 + (운동 여부 | 컨디션) + 프로필로만 정해지므로 사용자별 경우의 수가 몇 개뿐입니다.
+precompute_plans.py가 밤마다 경우별 답변을 만들어 daily_plans 테이블에 저장하고,
+화면에서는 프로필 해시가 같을 때만 저장된 답변을 바로 보여 줍니다. (다르면 실시간 생성)
+
+    store = DailyPlanStore()
+    variant = food_variant(workout_done)
+    plan = store.get(username, variant, plan_profile_hash(profile))
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Union
+
+from supabase import create_client, Client
+
+import src.config as config
+from src.models.user_profile import UserProfile
+
+from .answer_cache import _as_set, _profile_value
+from .embedding_cache import normalize_query
+
+# 경우(variant) → (모드, 검색 카테고리, 목표 뒤에 붙일 질문)
+PLAN_VARIANTS = {
+    "food_workout": ("food", ["food"], "{goal} 식단 추천. (방금 고강도 운동을 했으니 근육 회복을 위한 고단백 식단 위주로)"),
+    "food_rest": ("food", ["food"], "{goal} 식단 추천. (활동량이 적으므로 저칼로리, 소화가 잘 되는 식단 위주로)"),
+    "exercise_low": ("exercise", ["video"], "{goal}을 위한 운동 루틴. (컨디션이 안 좋으니 저강도, 스트레칭 위주로)"),
+    "exercise_normal": ("exercise", ["video"], "{goal}을 위한 운동 루틴."),
+    "exercise_high": ("exercise", ["video"], "{goal}을 위한 운동 루틴. (컨디션 최상, 고강도 인터벌 포함)"),
+}
+
+
+def food_variant(workout_done: bool) -> str:
+    return "food_workout" if workout_done else "food_rest"
+
+
+def exercise_variant(condition: str) -> str:
+    """컨디션 슬라이더 값 → 경우 ("보통"/"좋음"은 같은 질문)"""
+    return {"나쁨": "exercise_low", "최상": "exercise_high"}.get(condition, "exercise_normal")
+
+
+def plan_request(variant: str, profile: Union[Dict, object]) -> Dict:
+    """FitLifeRAG.query / query_batch에 넘길 인자"""
+    mode, categories, template = PLAN_VARIANTS[variant]
+    return {
+        "user_query": template.format(goal=_profile_value(profile, "goal") or "건강유지"),
+        "user_profile": profile,
+        "search_categories": categories,
+        "mode": mode,
+    }
+
+
+def plan_profile_hash(profile: Union[Dict, object]) -> str:
+    """
+    플랜 프롬프트에 들어가는 프로필 요소만 뽑은 해시
+    (나이/성별/목표/질환/알러지/특이사항/권장 칼로리 - chain._format_profile과 같은 항목)
+    권장 칼로리는 활동량에 따라 달라지므로 활동량은 users.activity_level에 저장해 사전 계산에서도 같은 값을 씁니다.
+    """
+    calories = _profile_value(profile, "recommended_calories") or _profile_value(profile, "calories") or 2000
+    parts = {
+        "age": int(_profile_value(profile, "age") or 0),
+        "gender": str(_profile_value(profile, "gender") or ""),
+        "goal": str(_profile_value(profile, "goal") or ""),
+        "diseases": _as_set(_profile_value(profile, "diseases")),
+        "allergies": _as_set(_profile_value(profile, "allergies")),
+        "notes": normalize_query(_profile_value(profile, "notes") or ""),
+        "calories": int(calories),
+    }
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def profile_from_user(row: Dict) -> UserProfile:
+    """users 테이블 행 → UserProfile (화면 입력 전 기본값과 같은 값으로 채움)"""
+    def as_list(value) -> List[str]:
+        if isinstance(value, str):
+            value = value.split(",")
+        return [v.strip() for v in (value or []) if v and v.strip()]
+
+    return UserProfile(
+        user_id=row.get("username", ""),
+        name=row.get("name") or "",
+        age=int(row.get("age") or 30),
+        gender=row.get("gender") or "남성",
+        height=float(row.get("height") or 170.0),
+        weight=float(row.get("weight") or 70.0),
+        diseases=as_list(row.get("diseases")),
+        allergies=as_list(row.get("allergies")),
+        goal=row.get("goal") or "건강유지",
+        activity_level=row.get("activity_level") or "보통",
+        notes=row.get("notes") or "",
+    )
+
+
+class DailyPlanStore:
+    """daily_plans 테이블 읽기/쓰기 (plan_key = "사용자:경우")"""
+
+    def __init__(self, supabase_client: Optional[Client] = None, ttl_hours: Optional[float] = None):
+        self.supabase = supabase_client or create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+        self.table = config.DAILY_PLANS_TABLE
+        self.ttl = timedelta(hours=ttl_hours if ttl_hours is not None else config.DAILY_PLAN_TTL_HOURS)
+
+    @staticmethod
+    def plan_key(username: str, variant: str) -> str:
+        return f"{username}:{variant}"
+
+    def _is_fresh(self, row: Dict, profile_hash: str) -> bool:
+        if row.get("profile_hash") != profile_hash:
+            return False
+        try:
+            generated_at = datetime.fromisoformat(str(row.get("generated_at")))
+        except ValueError:
+            return False
+        if generated_at.tzinfo is None:
+            generated_at = generated_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - generated_at < self.ttl
+
+    def get(self, username: str, variant: str, profile_hash: str) -> Optional[Dict]:
+        """프로필 해시가 같고 만료되지 않은 플랜만 반환 (없거나 조회 실패 시 None → 실시간 생성)"""
+        try:
+            response = self.supabase.table(self.table).select("*")\
+                .eq("plan_key", self.plan_key(username, variant))\
+                .execute()
+        except Exception as e:
+            print(f"⚠️ 사전 계산 플랜 조회 실패: {e}")
+            return None
+        row = response.data[0] if response.data else None
+        return row if row and self._is_fresh(row, profile_hash) else None
+
+    def fresh_keys(self, usernames: List[str], hashes: Dict[str, str]) -> set:
+        """이미 최신 플랜이 있는 plan_key 집합 (hashes: username → 프로필 해시)"""
+        if not usernames:
+            return set()
+        response = self.supabase.table(self.table)\
+            .select("plan_key, username, profile_hash, generated_at")\
+            .in_("username", usernames)\
+            .execute()
+        return {
+            row["plan_key"] for row in response.data or []
+            if self._is_fresh(row, hashes.get(row.get("username"), ""))
+        }
+
+    def save(self, username: str, variant: str, profile_hash: str, result: Dict):
+        self.save_many([(username, variant, profile_hash, result)])
+
+    @staticmethod
+    def _slim_source(source: Dict) -> Dict:
+        """본문은 빼고 화면에 쓰는 메타데이터만 저장 (jsonb로 직렬화 가능한 값으로)"""
+        slim = {k: v for k, v in source.items() if k != "content"}
+        if "score" in slim:
+            slim["score"] = float(slim["score"])
+        return slim
+
+    def save_many(self, plans: List[tuple]):
+        """plans: (username, variant, profile_hash, query 결과) 목록을 한 번에 업서트"""
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {
+                "plan_key": self.plan_key(username, variant),
+                "username": username,
+                "variant": variant,
+                "profile_hash": profile_hash,
+                "answer": result.get("answer", ""),
+                "sources": [self._slim_source(source) for source in result.get("sources", [])],
+                "generated_at": now,
+            }
+            for username, variant, profile_hash, result in plans
+        ]
+        if rows:
+            self.supabase.table(self.table).upsert(rows, on_conflict="plan_key").execute()
@@ -0,0 +1,73 @@
+"""
+FitLife AI - 검색 결과 중복 제거
+여러 카테고리/API 페이지에서 같은 문서(예: "현미밥")가 여러 번 검색되면
+프롬프트에 같은 내용이 반복되어 입력 토큰만 늘어납니다.
+
+1. 정확한 중복: 공백을 정규화한 본문 해시가 같으면 하나만 남김
+2. 유사 중복 : 임베딩 코사인 유사도가 threshold 이상이면 하나만 남김
+두 경우 모두 점수가 가장 높은 문서를 대표로 유지합니다.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class DedupReport:
+    """중복 제거 결과 요약"""
+    exact: int = 0
+    near: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def removed(self) -> int:
+        return self.exact + self.near
+
+    def to_dict(self):
+        return {"exact": self.exact, "near": self.near, "removed": self.removed, "tokens_saved": self.tokens_saved}
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(" ".join(str(text).split()).encode("utf-8")).hexdigest()
+
+
+def collapse_duplicates(
+    scores: List[float],
+    contents: List[str],
+    vectors: Optional[np.ndarray] = None,
+    threshold: float = 0.95
+) -> Tuple[List[int], DedupReport]:
+    """
+    남길 문서의 인덱스(점수 내림차순)와 제거 통계를 반환합니다.
+    vectors가 없으면 정확한 중복만 제거합니다.
+    """
+    report = DedupReport()
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+
+    seen = set()
+    unique = []
+    for i in order:
+        key = content_key(contents[i])
+        if key in seen:
+            report.exact += 1
+            continue
+        seen.add(key)
+        unique.append(i)
+
+    if vectors is None or len(unique) < 2:
+        return unique, report
+
+    sub = np.asarray(vectors, dtype=np.float32)[unique]
+    sub = sub / np.clip(np.linalg.norm(sub, axis=1, keepdims=True), 1e-12, None)
+    pairwise = sub @ sub.T
+
+    kept_local = []
+    for local in range(len(unique)):
+        # 이미 남긴(더 높은 점수의) 문서와 너무 비슷하면 제거
+        if kept_local and pairwise[local, kept_local].max() >= threshold:
+            report.near += 1
+            continue
+        kept_local.append(local)
+    return [unique[local] for local in kept_local], report
@@ -0,0 +1,61 @@
+"""
+FitLife AI - 검색 결과 다양화 (MMR: Maximal Marginal Relevance)
+관련도가 높으면서도 이미 고른 문서와 겹치지 않는 문서를 차례로 고릅니다.
+
+    점수 = λ × 관련도 - (1 - λ) × (이미 고른 문서들과의 최대 코사인 유사도)
+
+후보 간 유사도는 한 번의 행렬곱(V @ Vᵀ)으로 계산하고, 선택 루프에서는
+"선택된 문서와의 최대 유사도" 벡터만 갱신하므로 후보 n개 / 선택 k개에 O(n·k)입니다.
+
+seed를 주지 않고 jitter도 0이면 같은 입력에 항상 같은 결과를 돌려주므로
+프롬프트가 재현 가능하고 응답 캐시의 키로 쓸 수 있습니다.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+
+def mmr_select(
+    doc_vectors: np.ndarray,
+    relevance: List[float],
+    k: int,
+    lambda_mult: float = 0.7,
+    jitter: float = 0.0,
+    seed: Optional[int] = None
+) -> List[int]:
+    """
+    MMR로 k개를 골라 선택 순서대로 인덱스를 반환합니다.
+
+    - doc_vectors: (n, dim) 후보 문서 벡터
+    - relevance  : 후보별 관련도 (하이브리드 점수 등, 내부에서 0~1로 정규화)
+    - jitter     : 관련도에 더할 균등 잡음 폭 (0이면 완전 결정적, seed로 재현 가능)
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    if k >= n:
+        return list(np.argsort(-np.asarray(relevance, dtype=np.float32), kind="stable"))
+
+    vectors = np.asarray(doc_vectors, dtype=np.float32)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    pairwise = vectors @ vectors.T
+
+    rel = np.asarray(relevance, dtype=np.float32)
+    span = rel.max() - rel.min()
+    rel = (rel - rel.min()) / span if span > 0 else np.ones(n, dtype=np.float32)
+    if jitter > 0:
+        rel = rel + np.random.default_rng(seed).uniform(0, jitter, n).astype(np.float32)
+
+    selected = [int(np.argmax(rel))]
+    max_sim = pairwise[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    for _ in range(k - 1):
+        scores = lambda_mult * rel - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, pairwise[best], out=max_sim)
+    return selected
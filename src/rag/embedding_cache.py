@@ -0,0 +1,156 @@
+"""
+FitLife AI - 쿼리 임베딩 캐시 (LRU + TTL)
+같은 질문이 반복될 때 임베딩 모델의 forward pass를 건너뛰기 위한 캐시입니다.
+
+- 메모리 계층: OrderedDict 기반 LRU, 항목별 만료 시간(TTL)
+- 디스크 계층(선택): sqlite 파일에 저장하여 재시작 후에도 캐시 유지
+  열 때와 prune_every번 저장할 때마다 만료된 행을 지우고, disk_max_rows를 넘으면 오래된 행부터 삭제
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """공백/대소문자 차이를 무시하도록 질의문을 정규화합니다."""
+    return " ".join(str(text).split()).lower()
+
+
+class EmbeddingCache:
+    """쿼리 텍스트 + 모델명 기준 임베딩 캐시"""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 1024,
+        ttl: float = 86400,
+        disk_path: Optional[str] = None,
+        disk_max_rows: int = 100000,
+        prune_every: int = 500
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_max_rows = disk_max_rows
+        self.prune_every = max(1, prune_every)
+        self._puts_since_prune = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_pruned = 0
+
+        self._db = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_created ON query_embeddings (created_at)")
+            self._db.commit()
+            with self._lock:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """만료된 행 삭제 + disk_max_rows를 넘는 오래된 행 삭제 (호출하는 쪽에서 self._lock 보유)"""
+        expired = self._db.execute(
+            "DELETE FROM query_embeddings WHERE created_at <= ?", (time.time() - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM query_embeddings WHERE key IN "
+            "(SELECT key FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_rows,)
+        ).rowcount
+        self._db.commit()
+        self.disk_pruned += max(expired, 0) + max(overflow, 0)
+        self._puts_since_prune = 0
+
+    def _key(self, query: str) -> str:
+        raw = f"{self.model_name}\x00{normalize_query(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = self._key(query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vector = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] + self.ttl > now:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._store(key, vector, row[1] + self.ttl)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, vector: List[float], expires_at: float):
+        self._entries[key] = (expires_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def put(self, query: str, vector: List[float]):
+        key = self._key(query)
+        now = time.time()
+        vector = list(vector)
+        with self._lock:
+            self._store(key, vector, now + self.ttl)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                )
+                self._db.commit()
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= self.prune_every:
+                    self._prune_disk()
+
+    def get_or_compute(self, query: str, compute: Callable[[str], List[float]]) -> List[float]:
+        vector = self.get(query)
+        if vector is None:
+            vector = compute(query)
+            self.put(query, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_pruned": self.disk_pruned,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
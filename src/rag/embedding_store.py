@@ -0,0 +1,214 @@
+"""
+FitLife AI - 문서 임베딩 로컬 저장소 (append-only + 메모리 맵)
+add_documents로 계산한 문서 벡터를 content_hash 기준으로 디스크에 보관합니다.
+
+    data/embeddings/<모델>__<백엔드>/
+        vectors.f32   : float32 벡터를 순서대로 이어 붙인 원시 파일 (np.memmap으로 복사 없이 매핑)
+        meta.jsonl    : 한 줄에 한 문서 {"row", "content_hash", "id", "content", "metadata"}
+                        삭제는 {"content_hash", "deleted": true} 줄을 덧붙여 표시
+
+로컬 인덱스 재구축, 검색 백엔드 교체, 새 워커 기동 시 전체 말뭉치를 다시 임베딩하지 않고
+이 파일을 매핑해서 씁니다. 기록은 항상 벡터 → 메타데이터 순서이므로 중간에 프로세스가
+죽어도 메타데이터가 가리키는 벡터는 항상 존재합니다.
+"""
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import src.config as config
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.jsonl"
+HEADER_FILE = "header.json"
+
+
+def store_dir_for(model_name: str, backend: str, base_dir: str = None) -> Path:
+    """모델/백엔드별 저장 폴더 (서로 다른 모델의 벡터가 섞이지 않도록 분리)"""
+    key = re.sub(r"[^0-9A-Za-z._-]+", "_", f"{model_name}__{backend}")
+    return Path(base_dir or config.EMBEDDING_STORE_DIR) / key
+
+
+class EmbeddingStore:
+    """content_hash → 벡터 append-only 저장소"""
+
+    def __init__(self, directory, dim: Optional[int] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / VECTORS_FILE
+        self._meta_path = self.directory / META_FILE
+        self._header_path = self.directory / HEADER_FILE
+        self._lock = threading.Lock()
+
+        self.dim = dim
+        if self._header_path.exists():
+            self.dim = json.loads(self._header_path.read_text(encoding="utf-8"))["dim"]
+
+        self._entries: Dict[str, Dict] = {}  # content_hash → 메타데이터 줄
+        self._memmap = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 적재
+    # ------------------------------------------------------------------
+    def _vector_rows(self) -> int:
+        if not self.dim or not self._vectors_path.exists():
+            return 0
+        return self._vectors_path.stat().st_size // (self.dim * 4)
+
+    def _load(self):
+        if not self._meta_path.exists():
+            return
+        n_vectors = self._vector_rows()
+        with open(self._meta_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 기록 도중 중단된 마지막 줄은 무시
+                    continue
+                content_hash = entry.get("content_hash")
+                if entry.get("deleted"):
+                    self._entries.pop(content_hash, None)
+                elif entry.get("row", n_vectors) < n_vectors:
+                    self._entries[content_hash] = entry
+
+    def _matrix(self) -> np.ndarray:
+        """전체 벡터 파일의 읽기 전용 메모리 맵 (파일이 커지면 다시 매핑)"""
+        n = self._vector_rows()
+        if n == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._memmap is None or self._memmap.shape[0] != n:
+            self._memmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._memmap
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def append(self, rows: Iterable[Dict]) -> int:
+        """
+        rows: {"content_hash", "embedding", "id", "content", "metadata"} 리스트
+        이미 저장된 content_hash는 건너뛰고, 새로 기록한 개수를 반환합니다.
+        """
+        with self._lock:
+            new_rows = []
+            seen = set()
+            for row in rows:
+                content_hash = row.get("content_hash") or (row.get("metadata") or {}).get("content_hash")
+                if not content_hash or content_hash in self._entries or content_hash in seen:
+                    continue
+                if row.get("embedding") is None:
+                    continue
+                seen.add(content_hash)
+                new_rows.append((content_hash, row))
+            if not new_rows:
+                return 0
+
+            vectors = np.asarray([row["embedding"] for _, row in new_rows], dtype=np.float32)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._header_path.write_text(json.dumps({"dim": self.dim}), encoding="utf-8")
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"⚠️ 임베딩 차원이 다릅니다: 저장소 {self.dim}, 입력 {vectors.shape[1]}")
+
+            start = self._vector_rows()
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for offset, (content_hash, row) in enumerate(new_rows):
+                    entry = {
+                        "row": start + offset,
+                        "content_hash": content_hash,
+                        "id": row.get("id"),
+                        "content": row.get("content", ""),
+                        "metadata": row.get("metadata") or {}
+                    }
+                    self._entries[content_hash] = entry
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            return len(new_rows)
+
+    def remove(self, hashes: Iterable[str]):
+        """삭제 표시 줄을 덧붙입니다. (벡터 파일은 그대로, compact()에서 정리)"""
+        with self._lock:
+            removed = [h for h in hashes if h in self._entries]
+            if not removed:
+                return
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for content_hash in removed:
+                    self._entries.pop(content_hash)
+                    f.write(json.dumps({"content_hash": content_hash, "deleted": True}) + "\n")
+
+    def compact(self):
+        """삭제된 벡터를 제외하고 파일을 다시 씁니다. (쓰기 작업이 없을 때 실행)"""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["row"])
+            matrix = np.array(self._matrix()[[e["row"] for e in entries]]) if entries else None
+            self._memmap = None
+
+            tmp_vectors = self._vectors_path.with_suffix(".tmp")
+            tmp_meta = self._meta_path.with_suffix(".tmp")
+            with open(tmp_vectors, "wb") as f:
+                if matrix is not None:
+                    f.write(matrix.astype(np.float32).tobytes())
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                for row, entry in enumerate(entries):
+                    entry["row"] = row
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            tmp_vectors.replace(self._vectors_path)
+            tmp_meta.replace(self._meta_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._memmap = None
+            for path in (self._vectors_path, self._meta_path):
+                if path.exists():
+                    path.unlink()
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, content_hash: str):
+        return content_hash in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        """디스크 사용량 (벡터 + 메타데이터)"""
+        return sum(p.stat().st_size for p in (self._vectors_path, self._meta_path) if p.exists())
+
+    def get(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """content_hash → 벡터 (메모리 맵 뷰)"""
+        matrix = self._matrix()
+        return {h: matrix[self._entries[h]["row"]] for h in hashes if h in self._entries}
+
+    def load(self):
+        """
+        살아있는 문서 전체를 (rows, vectors)로 반환합니다.
+        rows는 {"id", "content", "metadata", "content_hash"}, vectors는 같은 순서의 (N, dim) 행렬입니다.
+        """
+        entries = sorted(self._entries.values(), key=lambda e: e["row"])
+        matrix = self._matrix()
+        row_idx = [e["row"] for e in entries]
+        # 삭제된 벡터가 없으면 메모리 맵을 그대로(복사 없이) 넘깁니다.
+        if row_idx == list(range(matrix.shape[0])):
+            vectors = matrix
+        else:
+            vectors = matrix[row_idx]
+        rows = [
+            {"id": e.get("id"), "content": e.get("content", ""),
+             "metadata": e.get("metadata") or {}, "content_hash": e["content_hash"]}
+            for e in entries
+        ]
+        return rows, vectors
+
+
+if __name__ == "__main__":
+    store = EmbeddingStore(store_dir_for(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND))
+    print(f"📁 {store.directory}")
+    print(f"- 문서 {len(store)}개, 차원 {store.dim}, 디스크 {store.nbytes / 1024 / 1024:.1f}MB")
@@ -0,0 +1,262 @@
+"""
+FitLife AI - 임베딩 모델 백엔드
+같은 sentence-transformers 모델을 PyTorch(기본) 또는 ONNX Runtime으로 실행합니다.
+
+- torch     : HuggingFaceEmbeddings (fp32 PyTorch, 기존 방식)
+- onnx      : 같은 모델을 ONNX로 내보내 onnxruntime으로 실행 (fp32)
+- onnx-int8 : ONNX 모델에 동적 int8 양자화 적용 (가장 빠르고 메모리가 작음)
+
+모델은 get_embedding_model()의 프로세스 전역 레지스트리를 통해 한 번만 로드되며,
+KnowledgeBase / PublicDataLoader / Streamlit 세션이 같은 인스턴스를 공유합니다.
+
+ONNX 백엔드는 기존 인덱스와 호환되어야 하므로 PyTorch와 같은 방식
+(mean pooling + L2 정규화)으로 문장 벡터를 만들고, compare_backends()로
+두 백엔드 벡터의 코사인 유사도를 측정할 수 있습니다.
+
+    python -m src.rag.embeddings            # torch vs onnx / onnx-int8 호환성·속도 리포트
+
+선택 의존성: pip install onnxruntime optimum[exporters]
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import src.config as config
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class OnnxEmbeddings(Embeddings):
+    """onnxruntime 기반 sentence-transformers 임베딩 (HuggingFaceEmbeddings와 같은 인터페이스)"""
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        model_dir: Optional[str] = None,
+        batch_size: int = 32,
+        max_length: int = 128
+    ):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError("⚠️ ONNX 임베딩 백엔드를 사용하려면 'pip install onnxruntime optimum[exporters]'가 필요합니다.")
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        base_dir = Path(model_dir or config.ONNX_MODEL_DIR) / model_name.replace("/", "__")
+        model_path = self._prepare_model(base_dir, quantize)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(base_dir))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _prepare_model(self, base_dir: Path, quantize: bool) -> Path:
+        """처음 한 번 ONNX로 내보내고(필요하면 int8 양자화) 이후에는 저장된 파일을 재사용합니다."""
+        fp32_path = base_dir / "model.onnx"
+        if not fp32_path.exists():
+            from optimum.exporters.onnx import main_export
+            print(f"📦 ONNX 모델 내보내는 중... ({self.model_name})")
+            main_export(self.model_name, output=str(base_dir), task="feature-extraction")
+
+        if not quantize:
+            return fp32_path
+
+        int8_path = base_dir / "model.int8.onnx"
+        if not int8_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            print("📦 int8 동적 양자화 적용 중...")
+            quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in inputs.items() if k in self._input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # sentence-transformers와 같은 mean pooling + L2 정규화
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+def create_embedding_model(model_name: str = None, backend: str = None) -> Embeddings:
+    """config.EMBEDDING_BACKEND 값에 맞는 임베딩 모델을 생성합니다."""
+    model_name = model_name or config.EMBEDDING_MODEL_NAME
+    backend = (backend or config.EMBEDDING_BACKEND).lower()
+
+    if backend == "torch":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(model_name, quantize=(backend == "onnx-int8"))
+    raise ValueError(f"⚠️ 지원하지 않는 임베딩 백엔드입니다: {backend} (선택: {', '.join(EMBEDDING_BACKENDS)})")
+
+
+def _rss_mb() -> float:
+    """현재 프로세스의 RSS(MB). /proc가 없으면 최대 RSS로 대체합니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except ImportError:
+            return 0.0
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    레지스트리가 나눠 주는 공유 임베딩 핸들
+    여러 스레드(Streamlit 세션, API 워커 스레드)가 동시에 호출해도 안전하도록 추론을 직렬화합니다.
+    """
+
+    def __init__(self, model: Embeddings, model_name: str, backend: str):
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.rss_delta_mb = 0.0
+        self.dim = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            return self.model.embed_query(text)
+
+    def warmup(self):
+        """첫 사용자 요청이 지연 초기화 비용을 내지 않도록 미리 한 번 인코딩합니다."""
+        started = time.perf_counter()
+        self.dim = len(self.embed_query("워밍업"))
+        self.warmup_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "dim": self.dim,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+            "rss_delta_mb": round(self.rss_delta_mb, 1)
+        }
+
+
+_registry: Dict[Tuple[str, str], SharedEmbeddings] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str = None, backend: str = None, warmup: bool = True) -> SharedEmbeddings:
+    """
+    프로세스 전역 임베딩 모델 레지스트리
+    (모델명, 백엔드)마다 한 번만 로드하고 이후에는 같은 핸들을 반환합니다.
+    """
+    model_name = model_name or config.EMBEDDING_MODEL_NAME
+    backend = (backend or config.EMBEDDING_BACKEND).lower()
+    key = (model_name, backend)
+
+    shared = _registry.get(key)
+    if shared is not None:
+        return shared
+
+    with _registry_lock:
+        shared = _registry.get(key)
+        if shared is None:
+            print(f"🔌 임베딩 모델 로딩 중... ({model_name}, {backend})")
+            rss_before = _rss_mb()
+            started = time.perf_counter()
+            shared = SharedEmbeddings(create_embedding_model(model_name, backend), model_name, backend)
+            shared.load_seconds = time.perf_counter() - started
+            if warmup:
+                shared.warmup()
+            shared.rss_delta_mb = _rss_mb() - rss_before
+            _registry[key] = shared
+            print(f"✅ 임베딩 모델 로드 완료! (로드 {shared.load_seconds:.1f}초, "
+                  f"워밍업 {shared.warmup_seconds:.2f}초, 메모리 +{shared.rss_delta_mb:.0f}MB)")
+    return shared
+
+
+def registry_stats() -> List[Dict]:
+    """로드된 모델별 로드 시간/메모리 정보"""
+    return [shared.stats() for shared in _registry.values()]
+
+
+def compare_backends(texts: List[str], model_name: str = None, backends: List[str] = None, repeat: int = 3) -> Dict:
+    """
+    torch 기준 벡터와 다른 백엔드 벡터의 코사인 유사도, embed_documents 속도를 비교합니다.
+    코사인 평균이 0.99 이상이면 기존 인덱스를 재임베딩 없이 그대로 써도 됩니다.
+    """
+    backends = backends or ["onnx", "onnx-int8"]
+    reference_model = create_embedding_model(model_name, "torch")
+
+    def timed(model):
+        model.embed_documents(texts[:2])  # 워밍업
+        started = time.perf_counter()
+        for _ in range(repeat):
+            vectors = model.embed_documents(texts)
+        return np.asarray(vectors, dtype=np.float32), (time.perf_counter() - started) / repeat
+
+    reference, reference_time = timed(reference_model)
+    report = {"torch": {"seconds": round(reference_time, 4), "speedup": 1.0}}
+
+    for backend in backends:
+        vectors, elapsed = timed(create_embedding_model(model_name, backend))
+        cosines = (reference * vectors).sum(axis=1)
+        report[backend] = {
+            "seconds": round(elapsed, 4),
+            "speedup": round(reference_time / elapsed, 2) if elapsed else 0.0,
+            "cosine_mean": round(float(cosines.mean()), 5),
+            "cosine_min": round(float(cosines.min()), 5)
+        }
+    return report
+
+
+if __name__ == "__main__":
+    sample_texts = [
+        "당뇨에 좋은 운동 알려줘",
+        "다이어트 식단 추천",
+        "현미밥: 칼로리 150kcal, 단백질 3g, 탄수화물 33g, 지방 1g.",
+        "운동 영상. 분류: 유연성 - 하체. 제목: 누워서 다리 스트레칭.",
+        "고혈압 환자가 피해야 할 음식은?",
+        "근육량 증가를 위한 고단백 식단",
+    ] * 8
+
+    print("=" * 60)
+    print(f"🔬 임베딩 백엔드 비교 ({config.EMBEDDING_MODEL_NAME}, 문장 {len(sample_texts)}개)")
+    print("=" * 60)
+    for name, stats in compare_backends(sample_texts).items():
+        print(f"- {name:10s} {stats}")
@@ -1,121 +1,657 @@
 """
 FitLife AI - KnowledgeBase (하이브리드 검색 엔진 탑재)
 """
+import asyncio
+import contextvars
+import json
 import os
-from typing import List, Tuple
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
 # 설정 파일 로드
 import src.config as config
+from .vector_store import MetadataFilter, create_vector_store, load_rows_by_ids
+from .embedding_cache import EmbeddingCache
+from .embeddings import get_embedding_model, registry_stats
+from .embedding_store import EmbeddingStore, store_dir_for
+from .bulk_writer import BulkWriter, BulkWriteResult, SyncResult, document_hash
+from .lexical_index import BM25Index, fuse_scores
+from ..utils.metrics import LatencyWindow, record_span, span
 
 load_dotenv()
 
-class KnowledgeBase:
+
+class _CorpusIndex:
+    """같은 문서 테이블을 보는 KnowledgeBase끼리 공유하는 어휘 역색인(BM25) + 문서 수 카운터"""
+
     def __init__(self):
+        self.lexical_index = BM25Index()
+        self.lock = threading.Lock()          # doc_counts 보호
+        self.build_lock = threading.Lock()    # 최초 구축은 한 번만 (동시에 만들어진 인스턴스는 대기)
+        self.doc_counts = {"category": Counter(), "source": Counter()}
+        self.counted_ids = set()  # 카운터에 반영된 행 id (같은 행을 두 번 세거나 빼지 않도록)
+        self.counted_at = None
+        self.ready = False
+
+    def count(self, rows: Iterable[dict], delta: int):
+        with self.lock:
+            for row in rows:
+                doc_id = row.get("id")
+                if doc_id is not None:
+                    if delta > 0:
+                        if str(doc_id) in self.counted_ids:
+                            continue  # 업서트가 기존 행을 갱신했거나 같은 배치가 다시 보고된 경우
+                        self.counted_ids.add(str(doc_id))
+                    else:
+                        self.counted_ids.discard(str(doc_id))
+                meta = row.get("metadata") or {}
+                for field in ("category", "source"):
+                    key = meta.get(field) or "unknown"
+                    self.doc_counts[field][key] += delta
+                    if self.doc_counts[field][key] <= 0:
+                        del self.doc_counts[field][key]
+
+    def reset_counts(self):
+        with self.lock:
+            for counter in self.doc_counts.values():
+                counter.clear()
+            self.counted_ids.clear()
+
+    def build(self, vector_store):
+        """기존 문서로 색인/카운터를 채웁니다. (실패하면 다음 인스턴스 생성 때 다시 시도)"""
+        with self.build_lock:
+            if self.ready:
+                return
+            try:
+                documents = vector_store.documents()
+                self.count(documents, 1)
+                self.counted_at = datetime.now(timezone.utc).isoformat()
+                if config.LEXICAL_INDEX_ENABLED:
+                    self.lexical_index.add(documents)
+                    print(f"🔤 어휘 색인 구축 완료: {len(self.lexical_index)}개 문서")
+                self.ready = True
+            except Exception as e:
+                print(f"⚠️ 기존 문서 색인 구축 실패 (벡터 검색만 사용): {e}")
+
+
+_corpus_registry: Dict[tuple, _CorpusIndex] = {}
+_corpus_registry_lock = threading.Lock()
+
+
+def get_corpus_index(key: tuple, vector_store) -> _CorpusIndex:
+    """
+    프로세스 전역 색인 레지스트리
+    키(문서 테이블)마다 기존 문서를 한 번만 읽어 구축하고 이후에는 같은 색인을 반환합니다.
+    (Supabase 백엔드의 documents()는 테이블 전체 조회이므로 인스턴스마다 다시 읽지 않도록)
+    """
+    with _corpus_registry_lock:
+        corpus = _corpus_registry.get(key)
+        if corpus is None:
+            corpus = _corpus_registry[key] = _CorpusIndex()
+    corpus.build(vector_store)
+    return corpus
+
+
+class KnowledgeBase:
+    def __init__(self, supabase_client: Optional[Client] = None, embedding_model=None):
+        """
+        supabase_client / embedding_model을 주면 그대로 사용합니다. (오프라인 대역: src.fakes)
+        """
         # 1. Supabase 클라이언트 연결
         self.supabase_url = config.SUPABASE_URL
         self.supabase_key = config.SUPABASE_KEY
         
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("⚠️ Supabase 접속 정보가 없습니다. .env 파일을 확인하세요.")
-            
-        self.supabase_client: Client = create_client(self.supabase_url, self.supabase_key)
+        if supabase_client is not None:
+            self.supabase_client = supabase_client
+        else:
+            if not self.supabase_url or not self.supabase_key:
+                raise ValueError("⚠️ Supabase 접속 정보가 없습니다. .env 파일을 확인하세요.")
+            self.supabase_client: Client = create_client(self.supabase_url, self.supabase_key)
         
-        # 2. 임베딩 모델 로드
-        print(f"🔌 임베딩 모델 로딩 중... ({config.EMBEDDING_MODEL_NAME})")
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL_NAME,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        # 2. 임베딩 모델 (config.EMBEDDING_BACKEND: torch / onnx / onnx-int8)
+        # 프로세스 전역 레지스트리에서 공유 핸들을 받으므로 KnowledgeBase를 여러 개 만들어도 모델은 한 번만 로드됩니다.
+        self.embedding_model = embedding_model or get_embedding_model(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND)
+
+        # 쿼리 임베딩 캐시 (같은 질문은 모델을 다시 돌리지 않음, 백엔드별로 구분)
+        self.query_cache = EmbeddingCache(
+            model_name=f"{config.EMBEDDING_MODEL_NAME}:{config.EMBEDDING_BACKEND}",
+            max_size=config.EMBEDDING_CACHE_SIZE,
+            ttl=config.EMBEDDING_CACHE_TTL,
+            disk_path=config.EMBEDDING_CACHE_PATH,
+            disk_max_rows=config.EMBEDDING_CACHE_DISK_MAX_ROWS
         )
-        print("✅ 임베딩 모델 로드 완료!")
 
-    def add_documents(self, documents: List[dict], category: str = "general"):
-        """
-        [업로드용] 문서 리스트를 임베딩하여 Supabase에 저장합니다.
-        """
-        data_to_insert = []
-        
-        print(f"📦 데이터 임베딩 변환 중... ({len(documents)}개)")
-        texts = [doc['content'] for doc in documents]
-        embeddings = self.embedding_model.embed_documents(texts)
-        
-        for i, doc in enumerate(documents):
-            data_to_insert.append({
+        # 문서 임베딩 로컬 저장소 (업로드한 벡터를 content_hash 기준으로 보관)
+        self.embedding_store = None
+        if config.EMBEDDING_STORE_ENABLED:
+            try:
+                self.embedding_store = EmbeddingStore(
+                    store_dir_for(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND)
+                )
+            except Exception as e:
+                print(f"⚠️ 로컬 벡터 파일을 열 수 없습니다 (사용 안 함): {e}")
+
+        # 3. 검색 백엔드 (config.VECTOR_BACKEND)
+        self.vector_store = create_vector_store(config.VECTOR_BACKEND, self.supabase_client, self.embedding_store)
+
+        # 4. 어휘 역색인 (BM25) + 문서 수 카운터
+        # 같은 문서 테이블이면 프로세스에서 한 번만 구축해 공유하고, 이후에는 업로드/삭제 시 증분 반영
+        # (세션마다 KnowledgeBase를 만들어도 테이블 전체를 다시 읽지 않도록)
+        source = self.supabase_url if supabase_client is None else supabase_client  # 주입한 클라이언트는 객체 자체로 구분
+        self._corpus = get_corpus_index((source, config.VECTOR_DB_TABLE, self.vector_store.name), self.vector_store)
+        self.lexical_index = self._corpus.lexical_index
+        self._doc_counts = self._corpus.doc_counts
+        self._stats_lock = self._corpus.lock
+        self.latency = {name: LatencyWindow(config.STATS_LATENCY_WINDOW) for name in ("embed", "rpc", "rerank")}
+
+        # 비동기 경로(aquery)용 임베딩 전용 스레드 - CPU forward pass가 이벤트 루프를 막지 않도록 분리
+        self._embed_executor = ThreadPoolExecutor(
+            max_workers=config.EMBED_EXECUTOR_WORKERS, thread_name_prefix="embed"
+        )
+
+        # document_vectors가 벡터를 구하지 못해 점수순으로 대체했음을 이미 알렸는지
+        self._vector_fallback_warned = False
+
+        # 5. 대량 업로드 작성기 (저장된 배치는 로컬 인덱스/어휘 색인에도 반영)
+        self.bulk_writer = BulkWriter(
+            self.supabase_client,
+            self.embedding_model,
+            on_batch_written=self._on_batch_written
+        )
+
+    def _on_batch_written(self, rows: List[dict]):
+        if self.embedding_store is not None:
+            try:
+                self.embedding_store.append(rows)
+            except Exception as e:
+                print(f"⚠️ 로컬 벡터 파일 기록 실패: {e}")
+        self.vector_store.add(rows)
+        if config.LEXICAL_INDEX_ENABLED:
+            self.lexical_index.add(rows)
+        self._count_documents(rows, 1)
+
+    def _count_documents(self, rows: Iterable[dict], delta: int):
+        self._corpus.count(rows, delta)
+
+    @staticmethod
+    def _to_rows(documents: Iterable[dict], category: str, source: str = "unknown") -> Iterator[dict]:
+        """원본 문서 dict를 documents 테이블 행 형태로 변환합니다."""
+        for doc in documents:
+            yield {
                 "content": doc['content'],
                 "metadata": {
                     "title": doc['title'],
-                    "source": doc.get("source", "unknown"),
+                    "source": doc.get("source", source),
                     "category": category,
                     "video_url": doc.get("video_url", ""),
                     "tags": doc.get("tags", [])  # [Update] 태그 필드 추가
-                },
-                "embedding": embeddings[i]
-            })
-            
+                }
+            }
+
+    def add_documents(self, documents: Iterable[dict], category: str = "general") -> BulkWriteResult:
+        """
+        [업로드용] 문서 리스트를 배치 단위로 임베딩하여 Supabase에 저장합니다.
+        content_hash 기준 upsert이므로 같은 문서를 다시 올려도 중복되지 않습니다.
+        """
+        print(f"📦 데이터 임베딩/저장 중... (배치 크기 {self.bulk_writer.batch_size})")
+        result = self.bulk_writer.write(self._to_rows(documents, category))
+
+        if result.failed:
+            print(f"❌ 일부 저장 실패: {result}")
+            for error in result.errors[:5]:
+                print(f"   - {error}")
+        else:
+            print(f"✅ {result}")
+        self._record_sync()
+        return result
+
+    def sync_documents(self, documents: Iterable[dict], category: str, source: str, tombstone: bool = True) -> SyncResult:
+        """
+        [증분 동기화] (category, source) 범위의 문서를 원본과 맞춥니다.
+
+        - 본문+메타데이터 해시를 저장된 해시와 비교해 추가/변경된 문서만 임베딩·저장
+        - 원본에서 사라진 문서는 삭제하지 않고 deleted_at을 채워 tombstone 처리
+        - 동기화 중에도 기존 문서는 계속 검색 가능 (clear() 후 전체 재적재 불필요)
+        """
+        started = time.time()
+        result = SyncResult()
+        stored = self._stored_hashes(category, source)
+        seen = set()
+
+        def changed_rows():
+            for row in self._to_rows(documents, category, source):
+                content_hash = document_hash(row["content"], row["metadata"])
+                if content_hash in seen:
+                    continue
+                seen.add(content_hash)
+                if content_hash in stored:
+                    result.unchanged += 1
+                    continue
+                yield row
+
+        write_result = self.bulk_writer.write(changed_rows())
+        result.added = write_result.written
+        result.failed = write_result.failed
+        result.errors.extend(write_result.errors)
+
+        vanished = {h: doc_id for h, doc_id in stored.items() if h not in seen}
+        if vanished and tombstone:
+            result.tombstoned = self._tombstone(vanished, category, source)
+
+        result.elapsed = time.time() - started
+        self._record_sync()
+        print(f"🔄 [{category}/{source}] 동기화 완료: {result}")
+        return result
+
+    def _stored_hashes(self, category: str, source: str) -> Dict[str, str]:
+        """범위 내 살아있는 문서의 content_hash → id"""
+        stored = {}
+        page_size = config.VECTOR_DB_PAGE_SIZE
+        start = 0
+        while True:
+            response = self.supabase_client.table(config.VECTOR_DB_TABLE)\
+                .select("id, content_hash")\
+                .eq("metadata->>category", category)\
+                .eq("metadata->>source", source)\
+                .is_("deleted_at", "null")\
+                .range(start, start + page_size - 1)\
+                .execute()
+            batch = response.data or []
+            for item in batch:
+                if item.get("content_hash"):
+                    stored[item["content_hash"]] = item["id"]
+            if len(batch) < page_size:
+                break
+            start += page_size
+        return stored
+
+    def _tombstone(self, vanished: Dict[str, str], category: str, source: str) -> int:
+        """원본에서 사라진 문서에 deleted_at을 기록하고 로컬 색인에서 제거합니다."""
+        now = datetime.now(timezone.utc).isoformat()
+        hashes = list(vanished)
+        done = 0
+        # in.(...) 필터는 URL에 실리므로 업로드 배치보다 작게 나눔 (해시 64자 × 200개면 URL 한도 초과)
+        for i in range(0, len(hashes), config.INGEST_FILTER_CHUNK):
+            chunk = hashes[i:i + config.INGEST_FILTER_CHUNK]
+            try:
+                self.supabase_client.table(config.VECTOR_DB_TABLE)\
+                    .update({"deleted_at": now})\
+                    .in_("content_hash", chunk)\
+                    .execute()
+                done += len(chunk)
+            except Exception as e:
+                print(f"⚠️ 삭제 표시 실패 ({len(chunk)}개): {e}")
+                continue
+            ids = [vanished[h] for h in chunk]
+            if self.embedding_store is not None:
+                self.embedding_store.remove(chunk)
+            self.vector_store.remove(ids)
+            self.lexical_index.remove(ids)
+            self._count_documents([{"id": doc_id, "metadata": {"category": category, "source": source}} for doc_id in ids], -1)
+        return done
+
+    def _record_sync(self):
+        """마지막 동기화 시각과 문서 수를 기록합니다. (다른 프로세스의 get_stats도 읽을 수 있도록 파일에 저장)"""
+        now = datetime.now(timezone.utc).isoformat()
+        self._corpus.counted_at = now
+        with self._stats_lock:
+            state = {
+                "last_sync": now,
+                "by_category": dict(self._doc_counts["category"]),
+                "by_source": dict(self._doc_counts["source"])
+            }
         try:
-            self.supabase_client.table("documents").insert(data_to_insert).execute()
-            print(f"✅ {len(data_to_insert)}개 문서 저장 완료!")
+            path = Path(config.KB_STATE_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
         except Exception as e:
-            print(f"❌ 데이터 저장 실패: {e}")
+            print(f"⚠️ 동기화 기록 저장 실패: {e}")
+
+    def _read_state(self) -> Dict:
+        try:
+            return json.loads(Path(config.KB_STATE_PATH).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
 
-    def search(self, query: str, top_k: int = 5, category: str = None) -> List[Tuple[Document, float]]:
+    def get_stats(self) -> Dict:
+        """
+        지식베이스 통계 (모니터링용, 테이블 전체 조회 없이 메모리 카운터로 응답)
+
+        - 카테고리/출처별 문서 수, 임베딩 차원, 인덱스 메모리/디스크 크기, 마지막 동기화 시각
+        - 임베딩(embed) / 벡터 검색(rpc) / 재정렬(rerank) 구간별 최근 p50/p95/p99 지연 시간
+        - 프로세스에 로드된 임베딩 모델별 로드 시간/메모리 (embeddings.registry_stats)
+        다른 프로세스(load_knowledge.py)가 더 최근에 동기화했다면 그 프로세스가 남긴 문서 수를 사용합니다.
+        """
+        state = self._read_state()
+        if state.get("last_sync") and (self._corpus.counted_at is None or state["last_sync"] > self._corpus.counted_at):
+            with self._stats_lock:
+                self._doc_counts["category"] = Counter(state.get("by_category", {}))
+                self._doc_counts["source"] = Counter(state.get("by_source", {}))
+            self._corpus.counted_at = state["last_sync"]
+
+        with self._stats_lock:
+            by_category = dict(self._doc_counts["category"])
+            by_source = dict(self._doc_counts["source"])
+
+        embedding_dim = getattr(self.embedding_model, "dim", None)
+        if embedding_dim is None and self.embedding_store is not None:
+            embedding_dim = self.embedding_store.dim
+
+        disk_bytes = self.vector_store.disk_bytes()
+        if self.embedding_store is not None:
+            disk_bytes += self.embedding_store.nbytes
+
+        return {
+            "total_documents": sum(by_category.values()),
+            "by_category": by_category,
+            "by_source": by_source,
+            "embedding_model": config.EMBEDDING_MODEL_NAME,
+            "embedding_backend": config.EMBEDDING_BACKEND,
+            "embedding_dim": embedding_dim,
+            "vector_backend": self.vector_store.name,
+            "index": {
+                "memory_bytes": self.vector_store.memory_bytes(),
+                "disk_bytes": disk_bytes,
+                "lexical_documents": len(self.lexical_index)
+            },
+            "last_sync": state.get("last_sync"),
+            "latency": {name: window.percentiles() for name, window in self.latency.items()},
+            "query_cache": self.query_cache.stats(),
+            "embedding_models": registry_stats()  # 모델별 로드/워밍업 시간, 메모리 증가량
+        }
+
+    def refresh_stats(self):
+        """문서 수 카운터를 테이블 기준으로 다시 셉니다. (카운터가 어긋났을 때 수동 실행)"""
+        documents = self.vector_store.documents()
+        self._corpus.reset_counts()
+        self._count_documents(documents, 1)
+        self._corpus.counted_at = datetime.now(timezone.utc).isoformat()
+
+    def _embed_uncached(self, query: str) -> List[float]:
+        with span("embed", self.latency["embed"]):
+            return self.embedding_model.embed_query(query)
+
+    def embed_query(self, query: str) -> List[float]:
+        """캐시를 거쳐 쿼리 임베딩을 반환합니다."""
+        return self.query_cache.get_or_compute(query, self._embed_uncached)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        여러 쿼리를 한 번에 임베딩합니다. (query_batch용)
+        캐시에 없는 쿼리만 중복을 제거해 embed_documents 한 번의 배치 forward로 계산합니다.
+        """
+        vectors = [self.query_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            with span("embed", self.latency["embed"]):
+                embedded = dict(zip(missing, self.embedding_model.embed_documents(missing)))
+            for query, vector in embedded.items():
+                self.query_cache.put(query, vector)
+            vectors = [embedded[query] if vector is None else vector for query, vector in zip(queries, vectors)]
+        return vectors
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """embed_query의 비동기 버전 (캐시 적중은 바로 반환, 미스만 임베딩 전용 스레드에서 계산)"""
+        vector = self.query_cache.get(query)
+        if vector is None:
+            loop = asyncio.get_running_loop()
+            # 현재 요청 추적(contextvars)이 임베딩 스레드에서도 보이도록 컨텍스트를 복사해 실행
+            vector = await loop.run_in_executor(
+                self._embed_executor, contextvars.copy_context().run, self._embed_uncached, query
+            )
+            self.query_cache.put(query, vector)
+        return vector
+
+    def document_vectors(self, documents: List[Document]) -> Optional[np.ndarray]:
+        """
+        검색 결과 문서들의 임베딩 (중복 제거/MMR 등 후처리용) - 요청 경로에서는 문서 임베딩(모델 호출)을 하지 않습니다.
+        1) 로컬 벡터 파일에서 content_hash로 읽고
+        2) 없으면(벡터 파일 비활성, 비어 있는 API 서버, content_hash 없는 예전 행) Supabase에 저장된 embedding을 id로 조회
+           → 조회한 벡터는 벡터 파일에도 추가해 다음 요청부터는 로컬에서 읽음
+        그래도 벡터를 구하지 못한 문서가 있으면 None을 반환합니다. (호출하는 쪽은 점수순 선택, 처음 한 번 경고)
+        """
+        if not documents:
+            return None
+        found: Dict[int, np.ndarray] = {}
+        if self.embedding_store is not None:
+            hashes = [doc.metadata.get("content_hash") for doc in documents]
+            stored = self.embedding_store.get([h for h in hashes if h])
+            found = {i: stored[h] for i, h in enumerate(hashes) if h in stored}
+
+        missing = [i for i in range(len(documents)) if i not in found]
+        if missing:
+            fetched = self._fetch_document_vectors([documents[i] for i in missing])
+            for i in missing:
+                vector = fetched.get(str(documents[i].metadata.get("id")))
+                if vector is not None:
+                    found[i] = vector
+
+        if len(found) < len(documents):
+            if not self._vector_fallback_warned:
+                self._vector_fallback_warned = True
+                print(f"⚠️ 문서 {len(documents) - len(found)}개의 벡터를 찾지 못해 중복 제거/MMR 없이 점수순으로 선택합니다. "
+                      "(이후 같은 경고는 생략)")
+            return None
+        return np.vstack([np.asarray(found[i], dtype=np.float32) for i in range(len(documents))])
+
+    def _fetch_document_vectors(self, documents: List[Document]) -> Dict[str, np.ndarray]:
+        """Supabase documents 테이블의 embedding을 id로 읽어 옵니다. → {id: 벡터}"""
+        ids = [doc.metadata["id"] for doc in documents if doc.metadata.get("id") is not None]
+        if not ids:
+            return {}
+        try:
+            rows = load_rows_by_ids(self.supabase_client, ids)
+        except Exception as e:
+            print(f"⚠️ 문서 벡터 조회 실패: {e}")
+            return {}
+
+        if self.embedding_store is not None and rows:
+            for row in rows:
+                row["content_hash"] = row["metadata"].get("content_hash") or document_hash(row["content"], row["metadata"])
+            try:
+                self.embedding_store.append(rows)
+            except Exception as e:
+                print(f"⚠️ 로컬 벡터 파일 기록 실패: {e}")
+        return {str(row["id"]): np.asarray(row["embedding"], dtype=np.float32) for row in rows}
+
+    @staticmethod
+    def _doc_key(item: dict) -> str:
+        """후보 병합용 문서 키 (id가 없으면 content_hash → 본문 순으로 대체)"""
+        if item.get("id") is not None:
+            return str(item["id"])
+        meta = item.get("metadata") or {}
+        return meta.get("content_hash") or item.get("content", "")
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        category: str = None,
+        source: str = None,
+        tags: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
         """
         [하이브리드 검색 구현]
-        벡터 유사도(Semantic) + 키워드 매칭(Lexical) 점수를 합산하여 재정렬합니다.
+        벡터 유사도(Semantic) 후보와 BM25 역색인(Lexical) 후보를 합친 뒤
+        config.HYBRID_FUSION 방식(weighted / rrf)으로 점수를 융합하여 재정렬합니다.
+        category / source / tags 필터는 색인 내부에서 적용되어 조건에 맞는 문서만 후보가 됩니다.
+        query_vector를 주면 임베딩을 건너뜁니다. (embed_queries로 미리 배치 계산한 경우)
         """
         try:
-            # 1. 벡터 검색 (의미 기반) - 넉넉하게 2배수(top_k * 2)를 가져옵니다.
-            query_vector = self.embedding_model.embed_query(query)
-            
-            params = {
-                "query_embedding": query_vector,
-                "match_threshold": 0.1, 
-                "match_count": top_k * 2 
-            }
-            
-            response = self.supabase_client.rpc("match_documents", params).execute()
-            
-            # 2. 파이썬 레벨에서 하이브리드 리랭킹 (Reranking)
-            raw_results = []
-            query_tokens = set(query.split()) # 검색어 토큰화
-            
-            for item in response.data:
-                # 카테고리 필터링
-                meta = item.get("metadata", {})
-                if category and meta.get("category") != category:
-                    continue
-                
-                content = item.get("content", "")
-                title = meta.get("title", "")
-                vector_score = item['similarity']
-                
-                # [Hybrid Logic] 키워드 가산점 로직
-                keyword_bonus = 0.0
-                matched_count = 0
-                
-                for token in query_tokens:
-                    if len(token) < 2: continue # 1글자는 무시
-                    if token in title:
-                        keyword_bonus += 0.05 # 제목에 있으면 큰 가산점
-                        matched_count += 1
-                    elif token in content:
-                        keyword_bonus += 0.02 # 본문에 있으면 작은 가산점
-                        matched_count += 1
-                
-                # 너무 과한 가산점 방지 (최대 0.15점 제한)
-                final_score = vector_score + min(keyword_bonus, 0.15)
-                
-                doc = Document(page_content=content, metadata=meta)
-                raw_results.append((doc, final_score))
-            
-            # 3. 최종 점수 기준 내림차순 정렬
-            raw_results.sort(key=lambda x: x[1], reverse=True)
-            
-            return raw_results[:top_k]
+            if query_vector is None:
+                query_vector = self.embed_query(query)
+        except Exception as e:
+            print(f"⚠️ 검색 중 오류 발생: {e}")
+            return []
+
+        filters = MetadataFilter(category=category, source=source, tags=list(tags or []))
+        return self._search_with_vector(query, query_vector, top_k, filters)
+
+    def search_many(
+        self,
+        query: str,
+        categories: List[str],
+        top_k: int = 5,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        여러 카테고리를 한 번에 검색합니다.
+        쿼리는 한 번만 임베딩하고, 카테고리별 조회는 동시에 실행한 뒤
+        중복 문서를 제거(최고 점수 유지)한 통합 후보 풀을 점수순으로 반환합니다.
+        """
+        if not categories:
+            return self.search(query, top_k=top_k, query_vector=query_vector)
+
+        try:
+            if query_vector is None:
+                query_vector = self.embed_query(query)
+        except Exception as e:
+            print(f"⚠️ 검색 중 오류 발생: {e}")
+            return []
+
+        def run(category):
+            return self._search_with_vector(query, query_vector, top_k, MetadataFilter(category=category))
+
+        # 원격 RPC는 네트워크 대기 시간이 대부분이므로 병렬로, 로컬 인덱스는 순차로 충분
+        if self.vector_store.name == "supabase" and len(categories) > 1:
+            workers = min(len(categories), config.SEARCH_MANY_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, run, category) for category in categories]
+                per_category = [future.result() for future in futures]
+        else:
+            per_category = [run(category) for category in categories]
+
+        return self._merge_results(per_category)
+
+    @staticmethod
+    def _merge_results(per_category: List[List[Tuple[Document, float]]]) -> List[Tuple[Document, float]]:
+        # 같은 제목/본문의 문서가 여러 카테고리에 걸쳐 나오면 최고 점수 하나만 남김
+        merged = {}
+        for results in per_category:
+            for doc, score in results:
+                key = (doc.metadata.get("title", ""), doc.page_content)
+                if key not in merged or score > merged[key][1]:
+                    merged[key] = (doc, score)
+
+        return sorted(merged.values(), key=lambda x: x[1], reverse=True)
+
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 5,
+        category: str = None,
+        source: str = None,
+        tags: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """search의 비동기 버전 - 임베딩은 전용 스레드, 벡터 검색(RPC)은 스레드풀에서 실행"""
+        try:
+            if query_vector is None:
+                query_vector = await self.aembed_query(query)
+        except Exception as e:
+            print(f"⚠️ 검색 중 오류 발생: {e}")
+            return []
+
+        filters = MetadataFilter(category=category, source=source, tags=list(tags or []))
+        return await asyncio.to_thread(self._search_with_vector, query, query_vector, top_k, filters)
+
+    async def asearch_many(
+        self,
+        query: str,
+        categories: List[str],
+        top_k: int = 5,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """search_many의 비동기 버전 - 카테고리별 조회를 동시에 기다립니다."""
+        if not categories:
+            return await self.asearch(query, top_k=top_k, query_vector=query_vector)
+
+        try:
+            if query_vector is None:
+                query_vector = await self.aembed_query(query)
+        except Exception as e:
+            print(f"⚠️ 검색 중 오류 발생: {e}")
+            return []
+
+        per_category = await asyncio.gather(*(
+            asyncio.to_thread(self._search_with_vector, query, query_vector, top_k, MetadataFilter(category=category))
+            for category in categories
+        ))
+        return self._merge_results(per_category)
+
+    def _search_with_vector(
+        self,
+        query: str,
+        query_vector: List[float],
+        top_k: int,
+        filters: MetadataFilter
+    ) -> List[Tuple[Document, float]]:
+        """임베딩이 끝난 쿼리로 벡터 + 어휘 후보를 모아 점수를 융합합니다."""
+        try:
+            # 1. 벡터 검색 (의미 기반) - 후보 풀(RAG_CANDIDATE_POOL)만큼 가져옵니다.
+            # 체인은 이미 top_k=RAG_CANDIDATE_POOL로 호출하므로 여기서 다시 배수로 늘리지 않고,
+            # 작은 top_k로 직접 호출해도 점수 융합할 후보는 풀 크기만큼 확보합니다.
+            with span("rpc", self.latency["rpc"]):
+                matches = self.vector_store.search(
+                    query_vector, top_k=max(top_k, config.RAG_CANDIDATE_POOL), match_threshold=0.1, filters=filters
+                )
+            rerank_started = time.perf_counter()
+
+            candidates = {}
+            vector_scores = {}
+            for item in matches:
+                key = self._doc_key(item)
+                candidates[key] = item
+                vector_scores[key] = item["similarity"]
+
+            # 2. 어휘 검색 (BM25 역색인) - 벡터 후보보다 넓은 후보군을 저렴하게 확보
+            lexical_scores = {}
+            if len(self.lexical_index):
+                lexical_hits = self.lexical_index.search(
+                    query, top_k=top_k * config.HYBRID_LEXICAL_CANDIDATES, predicate=filters.matches
+                )
+                for doc, score in lexical_hits:
+                    key = self._doc_key(doc)
+                    lexical_scores[key] = score
+                    candidates.setdefault(key, doc)
+
+                # 어휘 후보에만 있는 문서는 (가능한 백엔드라면) 정확한 벡터 유사도를 보충
+                missing = [candidates[key]["id"] for key in lexical_scores if key not in vector_scores]
+                if missing:
+                    for doc_id, score in self.vector_store.similarities(query_vector, missing).items():
+                        vector_scores[str(doc_id)] = score
+
+            # 3. 점수 융합 후 내림차순 정렬
+            fused = fuse_scores(
+                vector_scores,
+                lexical_scores,
+                method=config.HYBRID_FUSION,
+                lexical_weight=config.HYBRID_LEXICAL_WEIGHT,
+                rrf_k=config.HYBRID_RRF_K
+            )
+            ranked = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+            results = []
+            for key, score in ranked:
+                item = candidates[key]
+                # 행 id를 함께 실어 둠 (document_vectors가 id로 저장된 벡터를 조회하고 벡터 파일 행과 연결하도록)
+                metadata = dict(item.get("metadata") or {})
+                if item.get("id") is not None:
+                    metadata["id"] = item["id"]
+                doc = Document(page_content=item.get("content", ""), metadata=metadata)
+                results.append((doc, score))
+            record_span("rerank", time.perf_counter() - rerank_started, self.latency["rerank"])
+            return results
 
         except Exception as e:
             print(f"⚠️ 검색 중 오류 발생: {e}")
@@ -125,6 +661,11 @@ class KnowledgeBase:
         """데이터 초기화"""
         try:
             self.supabase_client.table("documents").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
+            self.vector_store.clear()
+            self.lexical_index.clear()
+            if self.embedding_store is not None:
+                self.embedding_store.clear()
+            self._corpus.reset_counts()
             print("🗑️ 지식베이스 초기화 완료")
         except Exception as e:
             print(f"⚠️ 초기화 오류 (무시 가능): {e}")
\ No newline at end of file
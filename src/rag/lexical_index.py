@@ -0,0 +1,167 @@
+"""
+FitLife AI - 어휘(Lexical) 역색인 + BM25
+하이브리드 검색의 키워드 점수를 미리 만들어 둔 역색인으로 계산합니다.
+
+한국어는 조사가 붙어 어절 단위 비교가 잘 맞지 않으므로("당뇨에" vs "당뇨")
+어절을 문자 2-gram으로 쪼개어 색인합니다. ("당뇨에" → "당뇨", "뇨에")
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z가-힣]+")
+
+
+def tokenize(text: str, n: int = 2) -> List[str]:
+    """어절별 문자 n-gram 토큰 (n보다 짧은 어절은 그대로 사용, 1글자는 제외)"""
+    tokens = []
+    for word in _WORD_PATTERN.findall(str(text).lower()):
+        if len(word) < 2:
+            continue
+        if len(word) <= n:
+            tokens.append(word)
+            continue
+        tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    문자 n-gram 기반 BM25 역색인
+
+    - 제목은 본문보다 중요하므로 title_boost 배만큼 반복 색인합니다.
+    - 문서는 id 기준으로 관리하며 같은 id를 다시 추가하면 무시합니다.
+    - 프로세스 안의 KnowledgeBase들이 함께 쓰므로 추가/삭제/검색은 락 안에서 처리합니다.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, title_boost: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self._lock = threading.RLock()  # remove → clear/add 재진입
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._postings: Dict[str, Dict[int, int]] = {}
+            self._doc_len: List[int] = []
+            self._docs: List[Dict] = []
+            self._id_to_idx: Dict[str, int] = {}
+            self._total_len = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _doc_tokens(self, content: str, metadata: Dict) -> List[str]:
+        title = (metadata or {}).get("title", "")
+        return tokenize(title) * self.title_boost + tokenize(content)
+
+    def add(self, rows: List[Dict]):
+        """rows: {"id", "content", "metadata"} 리스트 (임베딩은 필요 없음)"""
+        with self._lock:
+            for row in rows:
+                doc_id = str(row.get("id"))
+                if doc_id in self._id_to_idx:
+                    continue
+                idx = len(self._docs)
+                self._id_to_idx[doc_id] = idx
+                self._docs.append({
+                    "id": row.get("id"),
+                    "content": row.get("content", ""),
+                    "metadata": row.get("metadata") or {}
+                })
+
+                tokens = self._doc_tokens(row.get("content", ""), row.get("metadata"))
+                self._doc_len.append(len(tokens))
+                self._total_len += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    self._postings.setdefault(term, {})[idx] = tf
+
+    def remove(self, ids: List):
+        """문서를 색인에서 제거합니다. (드문 작업이므로 남은 문서로 다시 구축)"""
+        with self._lock:
+            removed = {str(i) for i in ids}
+            if not removed & set(self._id_to_idx):
+                return
+            remaining = [doc for doc in self._docs if str(doc["id"]) not in removed]
+            self.clear()
+            self.add(remaining)
+
+    def _idf(self, df: int) -> float:
+        n = len(self._docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        predicate: Optional[Callable[[Dict], bool]] = None
+    ) -> List[Tuple[Dict, float]]:
+        """BM25 점수 상위 top_k 문서를 (문서, 점수) 리스트로 반환합니다."""
+        with self._lock:
+            if not self._docs or top_k <= 0:
+                return []
+
+            avgdl = self._total_len / len(self._docs) or 1.0
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = self._idf(len(postings))
+                for idx, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[idx] / avgdl)
+                    scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+            results = []
+            for idx, score in ranked:
+                doc = self._docs[idx]
+                if predicate and not predicate(doc["metadata"]):
+                    continue
+                results.append((doc, score))
+                if len(results) >= top_k:
+                    break
+            return results
+
+
+def fuse_scores(
+    vector_scores: Dict[str, float],
+    lexical_scores: Dict[str, float],
+    method: str = "weighted",
+    lexical_weight: float = 0.15,
+    rrf_k: int = 60
+) -> Dict[str, float]:
+    """
+    벡터 점수와 BM25 점수를 합칩니다.
+
+    - weighted: 벡터 유사도 + lexical_weight × (BM25 / 후보 중 최대 BM25)
+    - rrf     : Reciprocal Rank Fusion, 두 목록 모두 1위면 1.0이 되도록 정규화
+    """
+    keys = set(vector_scores) | set(lexical_scores)
+
+    if method == "rrf":
+        def ranks(scores):
+            ordered = sorted(scores, key=scores.get, reverse=True)
+            return {key: rank for rank, key in enumerate(ordered, 1)}
+
+        vector_rank = ranks(vector_scores)
+        lexical_rank = ranks(lexical_scores)
+        best = 2.0 / (rrf_k + 1)
+        fused = {}
+        for key in keys:
+            score = 0.0
+            if key in vector_rank:
+                score += 1.0 / (rrf_k + vector_rank[key])
+            if key in lexical_rank:
+                score += 1.0 / (rrf_k + lexical_rank[key])
+            fused[key] = score / best
+        return fused
+
+    max_lexical = max(lexical_scores.values(), default=0.0) or 1.0
+    return {
+        key: vector_scores.get(key, 0.0) + lexical_weight * lexical_scores.get(key, 0.0) / max_lexical
+        for key in keys
+    }
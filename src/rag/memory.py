@@ -0,0 +1,190 @@
+"""
+FitLife AI - 세션별 대화 메모리 (롤링 요약 + 최근 대화 원문)
+대화가 길어져도 매 턴 프롬프트에 들어가는 대화 분량이 일정하도록,
+오래된 턴은 가벼운 모델로 요약에 접어 넣고 최근 몇 턴만 원문으로 유지합니다.
+
+    memory = ConversationMemory()
+    history = memory.context(session_id)        # [{"role": "summary", ...}, 최근 메시지...]
+    memory.add_turn(session_id, 질문, 답변)
+
+- 원문 대화가 recent_turns + summarize_every 턴을 넘으면 가장 오래된 summarize_every 턴을 요약에 반영
+- 요약은 백그라운드 스레드에서 실행 (응답 지연에 영향 없음), 끝나기 전까지는 해당 턴을 원문으로 유지
+- 요약이 계속 실패해도 원문은 recent_turns + 2 × summarize_every 턴까지만 보관 (넘치면 오래된 턴부터 버림)
+- 세션은 LRU(max_sessions) + 마지막 사용 후 ttl초가 지나면 만료
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from .. import config
+from ..utils.llm_guard import ResilientLLM
+from .prompt_budget import truncate_to_tokens
+
+SUMMARY_SYSTEM_PROMPT = """당신은 건강 상담 대화를 요약하는 도우미입니다.
+기존 요약과 새 대화를 합쳐 다음 상담에 필요한 정보만 남긴 한국어 요약으로 갱신하세요.
+- 사용자의 건강 상태, 목표, 선호/제약(알러지, 통증 등)
+- 이미 추천받은 식단/운동과 사용자의 반응
+- 아직 해결되지 않은 질문
+요약문만 출력하고 {max_tokens}토큰을 넘기지 마세요."""
+
+
+@dataclass
+class _Session:
+    summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (질문, 답변) 원문
+    summarized_turns: int = 0
+    summarizing: bool = False
+    last_used: float = field(default_factory=time.time)
+
+
+class ConversationMemory:
+    """session_id별 롤링 요약 + 최근 대화 원문"""
+
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory")
+
+    def __init__(
+        self,
+        llm=None,
+        recent_turns: Optional[int] = None,
+        summarize_every: Optional[int] = None,
+        summary_tokens: Optional[int] = None,
+        max_sessions: Optional[int] = None,
+        ttl: Optional[float] = None,
+        background: bool = True
+    ):
+        """llm을 주면 요약에 그대로 사용합니다. (기본: config.MEMORY_SUMMARY_MODEL)"""
+        if llm is None:
+            llm = ChatGoogleGenerativeAI(
+                model=config.MEMORY_SUMMARY_MODEL,
+                google_api_key=config.GOOGLE_API_KEY,
+                temperature=0.2,
+                max_output_tokens=config.MEMORY_SUMMARY_TOKENS * 2
+            )
+        self.llm = ResilientLLM(llm, name="gemini-summary")
+        self.recent_turns = recent_turns if recent_turns is not None else config.MEMORY_RECENT_TURNS
+        self.summarize_every = max(1, summarize_every or config.MEMORY_SUMMARIZE_EVERY)
+        self.summary_tokens = summary_tokens or config.MEMORY_SUMMARY_TOKENS
+        self.max_sessions = max_sessions or config.MEMORY_MAX_SESSIONS
+        self.ttl = ttl or config.MEMORY_SESSION_TTL
+        self.background = background  # False면 add_turn 안에서 바로 요약 (스크립트/점검용)
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.summaries = 0
+        self.summary_failures = 0
+        self.dropped_turns = 0
+
+    # ------------------------------------------------------------------
+    # 세션 관리
+    # ------------------------------------------------------------------
+    def _session(self, session_id: str) -> _Session:
+        """세션을 꺼내거나 새로 만듭니다. (호출하는 쪽에서 self._lock 보유)"""
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None or now - session.last_used > self.ttl:
+            session = _Session()
+            self._sessions[session_id] = session
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    # ------------------------------------------------------------------
+    # 읽기 / 쓰기
+    # ------------------------------------------------------------------
+    def context(self, session_id: str) -> List[Dict]:
+        """
+        프롬프트에 넣을 대화 기록 (chat_history 형식)
+        첫 항목은 항상 role="summary"(아직 요약이 없으면 빈 문자열)이고, 뒤에 요약되지 않은 턴의 원문이 이어집니다.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            history = [{"role": "summary", "content": session.summary}]
+            for question, answer in session.turns:
+                history.append({"role": "user", "content": question})
+                history.append({"role": "assistant", "content": answer})
+        return history
+
+    def add_turn(self, session_id: str, user_message: str, answer: str):
+        """한 턴(질문 + 답변)을 기록하고, 원문이 쌓였으면 오래된 턴을 요약에 반영합니다."""
+        with self._lock:
+            session = self._session(session_id)
+            session.turns.append((user_message, answer))
+
+            # 요약이 계속 실패하는 경우의 상한 (원문이 끝없이 늘지 않도록)
+            hard_limit = self.recent_turns + 2 * self.summarize_every
+            overflow = len(session.turns) - hard_limit
+            if overflow > 0 and not session.summarizing:
+                del session.turns[:overflow]
+                self.dropped_turns += overflow
+                print(f"⚠️ 대화 요약 지연: 오래된 대화 {overflow}턴을 버립니다.")
+
+            if session.summarizing or len(session.turns) <= self.recent_turns + self.summarize_every:
+                return
+            session.summarizing = True
+            folding = list(session.turns[:self.summarize_every])
+            previous = session.summary
+
+        if self.background:
+            self._executor.submit(self._fold, session, previous, folding)
+        else:
+            self._fold(session, previous, folding)
+
+    def _fold(self, session: _Session, previous: str, folding: List[Tuple[str, str]]):
+        """folding 턴을 기존 요약에 합쳐 새 요약을 만들고, 성공하면 해당 원문을 지웁니다."""
+        try:
+            summary = self._summarize(previous, folding)
+        except Exception as e:
+            print(f"⚠️ 대화 요약 실패 (원문 유지): {e}")
+            with self._lock:
+                session.summarizing = False
+                self.summary_failures += 1
+            return
+
+        with self._lock:
+            session.summarizing = False
+            del session.turns[:len(folding)]  # 요약 중에는 상한으로 버리지 않으므로 앞부분이 그대로 folding
+            session.summary = summary
+            session.summarized_turns += len(folding)
+            self.summaries += 1
+
+    def _summarize(self, previous: str, turns: List[Tuple[str, str]]) -> str:
+        per_message = config.MEMORY_SUMMARY_INPUT_TOKENS
+        lines = []
+        for question, answer in turns:
+            lines.append(f"- 사용자: {truncate_to_tokens(question, per_message)}")
+            lines.append(f"- AI: {truncate_to_tokens(answer, per_message)}")
+        prompt = (
+            f"[기존 요약]\n{previous or '(없음)'}\n\n"
+            f"[새 대화]\n" + "\n".join(lines) + "\n\n[갱신된 요약]"
+        )
+        messages = [
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT.format(max_tokens=self.summary_tokens)),
+            HumanMessage(content=prompt)
+        ]
+        content = self.llm.invoke(messages).content
+        text = content if isinstance(content, str) else str(content)
+        return truncate_to_tokens(text.strip(), self.summary_tokens)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures,
+                "dropped_turns": self.dropped_turns,
+                "llm": self.llm.stats()
+            }
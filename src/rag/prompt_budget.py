@@ -0,0 +1,156 @@
+"""
+FitLife AI - 토큰 예산 기반 프롬프트 조립
+프롬프트 길이가 Gemini 지연 시간과 비용을 좌우하므로, 정해진 토큰 예산 안에서 우선순위대로 채웁니다.
+
+    1. 고정 부분 (시스템 프롬프트 + 질문) - 항상 포함
+    2. 사용자 프로필
+    3. 참고 문서 (순위 순서, 넘치면 문장 경계에서 자름)
+    4. 최근 대화 (가장 최근부터, 넘치면 문장 경계에서 자름)
+
+대화가 있으면 최대 history_reserve 토큰(대화 분량 이내)은 문서가 아닌 대화 몫으로 남겨 둡니다.
+토큰 수는 utils.tokens.estimate_tokens의 근사값입니다.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from ..utils.tokens import estimate_tokens
+
+# 문장 끝(. ! ? 。 뒤 공백) 또는 줄바꿈에서 나눔 - "(유사도: 0.82)"처럼 공백 없는 마침표는 나누지 않음
+_SENTENCE_END = re.compile(r"(?<=[.!?。])\s+|\n+")
+_ELLIPSIS = "…"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    text를 max_tokens 이하로 줄입니다. 가능한 한 문장 단위로 자르고,
+    첫 문장조차 들어가지 않으면 글자 단위로 자릅니다. 잘린 경우 끝에 "…"를 붙입니다.
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = max_tokens - 1  # 말줄임표 몫
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        if not sentence:
+            continue
+        cost = estimate_tokens(sentence) + 1  # 구분 공백 포함 (보수적으로)
+        if used + cost > limit:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept) + _ELLIPSIS
+
+    # 글자 단위: 한글 음절은 약 1토큰이므로 limit 글자부터 줄여 가며 맞춤
+    cut = text[:max(limit, 0)]
+    while cut and estimate_tokens(cut) > limit:
+        cut = cut[:-max(1, len(cut) // 10)]
+    return cut + _ELLIPSIS if cut else ""
+
+
+@dataclass
+class PromptReport:
+    """구간별 토큰 수와 포함/생략 현황"""
+    budget: int
+    sections: Dict[str, int] = field(default_factory=dict)
+    docs_used: int = 0
+    docs_truncated: int = 0
+    docs_dropped: int = 0
+    history_used: int = 0
+    history_truncated: int = 0
+    history_dropped: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "budget": self.budget,
+            "total": self.total,
+            "sections": dict(self.sections),
+            "docs_used": self.docs_used,
+            "docs_truncated": self.docs_truncated,
+            "docs_dropped": self.docs_dropped,
+            "history_used": self.history_used,
+            "history_truncated": self.history_truncated,
+            "history_dropped": self.history_dropped
+        }
+
+
+class PromptBudget:
+    """우선순위(프로필 → 문서 → 대화)대로 토큰 예산을 채우는 조립기"""
+
+    def __init__(self, budget: int = 4000, min_snippet_tokens: int = 40, history_reserve: int = 300):
+        self.budget = budget
+        self.min_snippet_tokens = min_snippet_tokens
+        self.history_reserve = history_reserve
+
+    def fill(
+        self,
+        fixed: Dict[str, str],
+        profile: str,
+        doc_lines: List[str],
+        history_lines: List[str]
+    ) -> Tuple[str, List[str], List[str], PromptReport]:
+        """
+        - fixed        : 항상 포함할 구간 {"system": ..., "query": ...}
+        - doc_lines    : 순위 순서의 문서 줄
+        - history_lines: 시간 순서의 대화 줄 (뒤쪽이 최근)
+        반환: (프로필, 포함된 문서 줄, 포함된 대화 줄(시간 순서), 리포트)
+        포함된 문서는 doc_lines의 앞부분이므로 len(문서 줄)로 몇 개가 쓰였는지 알 수 있습니다.
+        """
+        report = PromptReport(budget=self.budget)
+        for name, text in fixed.items():
+            report.sections[name] = estimate_tokens(text)
+        remaining = self.budget - report.total
+
+        # 1. 프로필
+        profile = truncate_to_tokens(profile, remaining) if profile else ""
+        report.sections["profile"] = estimate_tokens(profile)
+        remaining -= report.sections["profile"]
+
+        # 2. 문서 (대화가 있으면 일부를 대화 몫으로 남김)
+        history_need = sum(estimate_tokens(line) + 1 for line in history_lines)
+        reserve = min(self.history_reserve, history_need, max(remaining, 0))
+        doc_room = remaining - reserve
+        docs = []
+        for line in doc_lines:
+            cost = estimate_tokens(line) + 1  # 줄바꿈 몫
+            if cost <= doc_room:
+                docs.append(line)
+                doc_room -= cost
+                continue
+            if doc_room >= self.min_snippet_tokens:
+                snippet = truncate_to_tokens(line, doc_room - 1)
+                if snippet:
+                    docs.append(snippet)
+                    report.docs_truncated += 1
+            break
+        report.docs_used = len(docs)
+        report.docs_dropped = len(doc_lines) - len(docs)
+        report.sections["context"] = sum(estimate_tokens(line) + 1 for line in docs)
+        remaining -= report.sections["context"]
+
+        # 3. 대화 (최근 것부터 채우고 시간 순서로 되돌림)
+        history = []
+        for line in reversed(history_lines):
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                if remaining >= self.min_snippet_tokens:
+                    snippet = truncate_to_tokens(line, remaining - 1)
+                    if snippet:
+                        history.append(snippet)
+                        report.history_truncated += 1
+                break
+            history.append(line)
+            remaining -= cost
+        history.reverse()
+        report.history_used = len(history)
+        report.history_dropped = len(history_lines) - len(history)
+        report.sections["history"] = sum(estimate_tokens(line) + 1 for line in history)
+
+        return profile, docs, history, report
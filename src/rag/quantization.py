@@ -0,0 +1,247 @@
+"""
+FitLife AI - 문서 벡터 압축 (float16 / PCA 차원 축소 / int8 스칼라 양자화)
+로컬 인덱스(numpy)의 메모리 사용량과 스캔 비용을 줄이기 위한 코덱 모음입니다.
+
+- float16 : 절반 크기, 정확도 손실 거의 없음 (384차원 기준 1.5KB → 768B)
+- pca     : 주성분 VECTOR_PCA_DIM개로 투영 (384 → 128차원이면 1/3)
+- int8    : 차원별 스케일로 -127~127 정수화 (1/4 크기)
+
+압축 점수로 후보를 넉넉히(top_k × VECTOR_RESCORE_FACTOR) 고른 뒤
+원본 float32 벡터로 다시 점수를 매기므로(rescoring) 최종 순위는 정확 검색과 거의 같습니다.
+
+    python -m src.rag.quantization --k 10    # 저장된 문서 벡터로 recall@k / 메모리 리포트
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import src.config as config
+
+COMPRESSION_METHODS = ("none", "float16", "pca", "int8")
+
+_BLOCK_ROWS = 8192  # float16/int8 코드를 float32로 풀 때 한 번에 처리할 행 수 (임시 메모리 제한)
+
+
+def _blocked_dot(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """압축 코드를 블록 단위로 float32로 변환해 내적합니다. (전체 행렬을 한 번에 풀지 않음)"""
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], _BLOCK_ROWS):
+        block = codes[start:start + _BLOCK_ROWS].astype(np.float32)
+        scores[start:start + _BLOCK_ROWS] = block @ query
+    return scores
+
+
+class VectorCodec:
+    """압축 코덱 공통 인터페이스 (입력은 L2 정규화된 float32 행렬)"""
+
+    name = "none"
+
+    def fit(self, vectors: np.ndarray) -> "VectorCodec":
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """압축 코드와 쿼리의 근사 내적"""
+        return codes @ query
+
+
+class Float16Codec(VectorCodec):
+    name = "float16"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return _blocked_dot(codes, query)
+
+
+class PCACodec(VectorCodec):
+    """
+    평균 중심화 후 상위 주성분으로 투영
+    x·q ≈ mean·q + (P(x - mean))·(Pq) 이므로 쿼리만 한 번 투영하면 됩니다.
+    """
+
+    name = "pca"
+
+    def __init__(self, dim: int = None, sample_size: int = 20000):
+        self.dim = dim or config.VECTOR_PCA_DIM
+        self.sample_size = sample_size
+        self.mean = None
+        self.components = None
+
+    def fit(self, vectors: np.ndarray) -> "PCACodec":
+        sample = vectors
+        if vectors.shape[0] > self.sample_size:
+            idx = np.random.default_rng(0).choice(vectors.shape[0], self.sample_size, replace=False)
+            sample = vectors[np.sort(idx)]
+        sample = np.asarray(sample, dtype=np.float32)
+        self.mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = vt[:min(self.dim, vt.shape[0])].astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return ((np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T).astype(np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ (self.components @ query) + float(self.mean @ query)
+
+
+class Int8Codec(VectorCodec):
+    """차원별 대칭 스케일(max|x| / 127)로 int8 정수화"""
+
+    name = "int8"
+
+    def __init__(self):
+        self.scale = None
+
+    def fit(self, vectors: np.ndarray) -> "Int8Codec":
+        max_abs = np.abs(vectors).max(axis=0) if vectors.shape[0] else np.ones(vectors.shape[1])
+        self.scale = (np.maximum(max_abs, 1e-8) / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # x·q ≈ (code × scale)·q = code·(scale × q)
+        return _blocked_dot(codes, query * self.scale)
+
+
+def create_codec(method: str) -> VectorCodec:
+    method = (method or "none").lower()
+    if method == "float16":
+        return Float16Codec()
+    if method == "pca":
+        return PCACodec()
+    if method == "int8":
+        return Int8Codec()
+    if method == "none":
+        return VectorCodec()
+    raise ValueError(f"⚠️ 지원하지 않는 압축 방식입니다: {method} (선택: {', '.join(COMPRESSION_METHODS)})")
+
+
+def compressed_top_k(
+    codec: VectorCodec,
+    codes: np.ndarray,
+    full: np.ndarray,
+    query: np.ndarray,
+    top_k: int,
+    rescore_factor: int = None,
+    row_ids: np.ndarray = None
+):
+    """
+    압축 점수로 top_k × rescore_factor개 후보를 고르고 원본 벡터(full)로 재채점합니다.
+    row_ids를 주면 그 행들 안에서만 찾습니다. (메타데이터 필터)
+    반환: (행 번호 배열, 점수 배열) - 점수 내림차순
+    """
+    rescore_factor = rescore_factor or config.VECTOR_RESCORE_FACTOR
+    subset = codes if row_ids is None else codes[row_ids]
+    n = subset.shape[0]
+    if n == 0 or top_k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    approx = codec.scores(subset, query)
+    pool = min(n, top_k * max(rescore_factor, 1))
+    candidates = np.argpartition(-approx, pool - 1)[:pool] if pool < n else np.arange(n)
+    if row_ids is not None:
+        candidates = row_ids[candidates]
+    candidates = np.sort(candidates)  # 메모리 맵을 순서대로 읽도록 정렬
+
+    exact = np.asarray(full[candidates], dtype=np.float32) @ query
+    order = np.argsort(-exact)[:top_k]
+    return candidates[order], exact[order]
+
+
+def _exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ query
+    top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+    return top[np.argsort(-sims[top])]
+
+
+def _approx_top_k(codec: VectorCodec, codes: np.ndarray, query: np.ndarray, k: int) -> List[int]:
+    sims = codec.scores(codes, query)
+    top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+    return top.tolist()
+
+
+def compression_report(
+    vectors: np.ndarray,
+    k: int = 10,
+    n_queries: int = 200,
+    methods: List[str] = None,
+    rescore_factor: int = None
+) -> Dict:
+    """
+    정확 검색(float32) 대비 압축 방식별 recall@k, 벡터당 바이트, 검색 시간을 측정합니다.
+    쿼리는 말뭉치에서 뽑은 벡터에 약간의 잡음을 더해 만듭니다.
+    """
+    methods = methods or ["float16", "pca", "int8"]
+    rescore_factor = rescore_factor or config.VECTOR_RESCORE_FACTOR
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    k = min(k, vectors.shape[0])
+
+    rng = np.random.default_rng(42)
+    picks = rng.choice(vectors.shape[0], min(n_queries, vectors.shape[0]), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.05, (len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    started = time.perf_counter()
+    truth = [set(_exact_top_k(vectors, q, k).tolist()) for q in queries]
+    report = {"float32": {
+        "bytes_per_vector": vectors.shape[1] * 4,
+        "total_mb": round(vectors.nbytes / 1024 / 1024, 2),
+        "recall": 1.0,
+        "recall_rescored": 1.0,
+        "query_ms": round((time.perf_counter() - started) / len(queries) * 1000, 3)
+    }}
+
+    for method in methods:
+        codec = create_codec(method).fit(vectors)
+        codes = codec.encode(vectors)
+
+        raw_hits = sum(len(expected & set(_approx_top_k(codec, codes, q, k))) for q, expected in zip(queries, truth))
+
+        started = time.perf_counter()
+        rescored_hits = 0
+        for q, expected in zip(queries, truth):
+            rows, _ = compressed_top_k(codec, codes, vectors, q, k, rescore_factor)
+            rescored_hits += len(expected & set(rows.tolist()))
+        elapsed = (time.perf_counter() - started) / len(queries)
+
+        report[method] = {
+            "bytes_per_vector": int(codes.nbytes / codes.shape[0]),
+            "total_mb": round(codes.nbytes / 1024 / 1024, 2),
+            "recall": round(raw_hits / (k * len(queries)), 4),
+            "recall_rescored": round(rescored_hits / (k * len(queries)), 4),
+            "query_ms": round(elapsed * 1000, 3)
+        }
+    return report
+
+
+if __name__ == "__main__":
+    from .embedding_store import EmbeddingStore, store_dir_for
+
+    parser = argparse.ArgumentParser(description="문서 벡터 압축 방식별 recall@k / 메모리 비교")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(store_dir_for(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND))
+    _, matrix = store.load()
+    if matrix.shape[0] == 0:
+        print("⚠️ 저장된 문서 벡터가 없습니다. 먼저 load_knowledge.py로 지식베이스를 구축하세요.")
+        raise SystemExit(1)
+
+    print("=" * 60)
+    print(f"🗜️ 벡터 압축 리포트 (문서 {matrix.shape[0]}개, {matrix.shape[1]}차원, recall@{args.k}, "
+          f"재채점 후보 ×{config.VECTOR_RESCORE_FACTOR})")
+    print("=" * 60)
+    for name, stats in compression_report(matrix, k=args.k, n_queries=args.queries).items():
+        print(f"- {name:8s} {stats}")
@@ -0,0 +1,720 @@
+"""
+FitLife AI - 벡터 인덱스 백엔드
+KnowledgeBase가 사용하는 검색 백엔드를 교체 가능하게 분리합니다.
+
+- supabase : 기존 방식 (match_documents RPC 원격 호출)
+- numpy    : 프로세스 내 float32 행렬 + 정확한 코사인 Top-K (argpartition)
+             (VECTOR_COMPRESSION 설정 시 float16 / pca / int8 압축 + 원본 벡터 재채점)
+- chroma   : chromadb 로컬 영구 저장소 (CHROMA_PERSIST_DIR)
+
+모든 백엔드는 RPC 응답과 같은 형태의 dict 리스트
+({"id", "content", "metadata", "similarity"})를 반환하므로
+KnowledgeBase의 리랭킹 로직은 백엔드와 무관하게 동작합니다.
+
+메타데이터 필터(category / source / tags)는 각 백엔드 내부에서 평가되므로
+필터에 맞는 문서만 top_k개 돌아옵니다. (가져온 뒤 버리는 over-fetch 없음)
+"""
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+import src.config as config
+from .quantization import compressed_top_k, create_codec
+
+
+@dataclass
+class MetadataFilter:
+    """
+    검색 필터 조건
+    - category / source: 정확히 일치
+    - tags: 나열한 태그를 모두 가진 문서만
+    """
+    category: Optional[str] = None
+    source: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.category or self.source or self.tags)
+
+    def matches(self, meta: Dict) -> bool:
+        meta = meta or {}
+        if self.category and meta.get("category") != self.category:
+            return False
+        if self.source and meta.get("source") != self.source:
+            return False
+        if self.tags and not set(self.tags).issubset(meta.get("tags") or []):
+            return False
+        return True
+
+
+def load_rows_from_supabase(supabase_client, page_size: int = None, with_embedding: bool = True) -> List[Dict]:
+    """
+    Supabase documents 테이블 전체를 페이지 단위로 읽어옵니다. (로컬 인덱스 적재용)
+    pgvector 컬럼은 문자열("[0.1, ...]")로 내려오므로 리스트로 변환합니다.
+    """
+    page_size = page_size or config.VECTOR_DB_PAGE_SIZE
+    columns = "id, content, metadata, embedding" if with_embedding else "id, content, metadata"
+    rows = []
+    start = 0
+    while True:
+        response = supabase_client.table(config.VECTOR_DB_TABLE)\
+            .select(columns)\
+            .is_("deleted_at", "null")\
+            .range(start, start + page_size - 1)\
+            .execute()
+        batch = response.data or []
+        rows.extend(row for row in (_parse_row(item, with_embedding) for item in batch) if row is not None)
+        if len(batch) < page_size:
+            break
+        start += page_size
+    return rows
+
+
+def _parse_row(item: Dict, with_embedding: bool) -> Optional[Dict]:
+    row = {
+        "id": item.get("id"),
+        "content": item.get("content", ""),
+        "metadata": item.get("metadata") or {}
+    }
+    if with_embedding:
+        embedding = item.get("embedding")
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        if not embedding:
+            return None
+        row["embedding"] = embedding
+    return row
+
+
+def load_live_hashes(supabase_client, page_size: int = None) -> Dict[str, Optional[str]]:
+    """삭제되지 않은 행의 id → content_hash (본문/임베딩 없이 가볍게 조회)"""
+    page_size = page_size or config.VECTOR_DB_PAGE_SIZE
+    live = {}
+    start = 0
+    while True:
+        response = supabase_client.table(config.VECTOR_DB_TABLE)\
+            .select("id, content_hash")\
+            .is_("deleted_at", "null")\
+            .range(start, start + page_size - 1)\
+            .execute()
+        batch = response.data or []
+        for item in batch:
+            live[str(item.get("id"))] = item.get("content_hash")
+        if len(batch) < page_size:
+            break
+        start += page_size
+    return live
+
+
+def load_rows_by_ids(supabase_client, ids: List) -> List[Dict]:
+    """지정한 id의 행을 임베딩과 함께 읽어옵니다. (in.(...) 필터는 URL에 실리므로 작게 나눠 조회)"""
+    rows = []
+    chunk_size = config.INGEST_FILTER_CHUNK
+    for i in range(0, len(ids), chunk_size):
+        response = supabase_client.table(config.VECTOR_DB_TABLE)\
+            .select("id, content, metadata, embedding")\
+            .in_("id", ids[i:i + chunk_size])\
+            .is_("deleted_at", "null")\
+            .execute()
+        rows.extend(row for row in (_parse_row(item, True) for item in response.data or []) if row is not None)
+    return rows
+
+
+class VectorStore:
+    """벡터 인덱스 백엔드 공통 인터페이스"""
+
+    name = "base"
+
+    def add(self, rows: List[Dict]):
+        """rows: {"id", "content", "metadata", "embedding"} 리스트"""
+        raise NotImplementedError
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        match_threshold: float = 0.1,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict]:
+        raise NotImplementedError
+
+    def remove(self, ids: List):
+        """삭제(tombstone)된 문서를 인덱스에서 제거합니다."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def documents(self) -> List[Dict]:
+        """색인된 문서({"id", "content", "metadata"}) 전체. 어휘 색인 구축에 사용합니다."""
+        raise NotImplementedError
+
+    def similarities(self, query_vector: List[float], ids: List) -> Dict:
+        """주어진 문서들의 벡터 유사도. 계산할 수 없는 백엔드는 빈 dict를 반환합니다."""
+        return {}
+
+    def memory_bytes(self) -> int:
+        """프로세스 메모리에 올라간 인덱스 크기 (원격 백엔드는 0)"""
+        return 0
+
+    def disk_bytes(self) -> int:
+        """로컬 디스크에 저장된 인덱스 크기 (원격 백엔드는 0)"""
+        return 0
+
+
+# 함수/시그니처가 없을 때의 오류 코드 (PostgREST: 스키마 캐시에 함수 없음, PostgreSQL: undefined_function)
+_MISSING_FUNCTION_CODES = ("PGRST202", "42883")
+
+
+def _is_missing_function(error: Exception) -> bool:
+    code = str(getattr(error, "code", "") or "")
+    return code in _MISSING_FUNCTION_CODES or any(c in str(error) for c in _MISSING_FUNCTION_CODES)
+
+
+class SupabaseVectorStore(VectorStore):
+    """
+    match_documents RPC를 사용하는 원격 백엔드
+    필터가 있으면 확장 RPC(match_documents_filtered, setup_db.py --documents로 생성)를 호출합니다.
+    """
+
+    name = "supabase"
+
+    def __init__(self, supabase_client):
+        self.supabase_client = supabase_client
+        self._filtered_rpc_available = True
+
+    def add(self, rows: List[Dict]):
+        # 원격 테이블 자체가 인덱스이므로 별도 작업이 필요 없습니다.
+        pass
+
+    def remove(self, ids: List):
+        # tombstone 행은 RPC가 deleted_at 조건으로 제외합니다.
+        pass
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        match_threshold: float = 0.1,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict]:
+        params = {
+            "query_embedding": list(query_vector),
+            "match_threshold": match_threshold,
+            "match_count": top_k
+        }
+
+        if filters and not filters.is_empty:
+            if self._filtered_rpc_available:
+                try:
+                    filtered_params = dict(params)
+                    filtered_params.update({
+                        "filter_category": filters.category,
+                        "filter_source": filters.source,
+                        "filter_tags": filters.tags or None
+                    })
+                    response = self.supabase_client.rpc(config.VECTOR_DB_FILTERED_QUERY_FUNC, filtered_params).execute()
+                    return response.data or []
+                except Exception as e:
+                    # 타임아웃/5xx 같은 일시적 오류는 그대로 올려 보냄 (한 번의 오류로 필터 RPC를 끄지 않도록)
+                    if not _is_missing_function(e):
+                        raise
+                    # 마이그레이션 전 DB: 기존 RPC + 후처리 필터로 대체 (이후 호출부터 바로 대체 경로 사용)
+                    print(f"⚠️ 필터 RPC 사용 불가, 기존 RPC로 대체합니다: {e}")
+                    self._filtered_rpc_available = False
+
+            params["match_count"] = top_k * config.VECTOR_DB_FALLBACK_OVERFETCH
+            response = self.supabase_client.rpc(config.VECTOR_DB_QUERY_FUNC, params).execute()
+            return [item for item in (response.data or []) if filters.matches(item.get("metadata"))][:top_k]
+
+        response = self.supabase_client.rpc(config.VECTOR_DB_QUERY_FUNC, params).execute()
+        return response.data or []
+
+    def clear(self):
+        pass
+
+    def count(self) -> int:
+        response = self.supabase_client.table(config.VECTOR_DB_TABLE)\
+            .select("id", count="exact").is_("deleted_at", "null").limit(1).execute()
+        return response.count or 0
+
+    def documents(self) -> List[Dict]:
+        return load_rows_from_supabase(self.supabase_client, with_embedding=False)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    프로세스 내 NumPy 인덱스
+    정규화된 float32 행렬과 쿼리 벡터의 내적(=코사인 유사도)으로 정확한 Top-K를 구합니다.
+
+    category / source / tag별 행 번호 파티션을 함께 유지하므로,
+    필터 검색은 해당 파티션의 행만 점수를 계산합니다.
+    """
+
+    name = "numpy"
+
+    def __init__(self, dim: Optional[int] = None):
+        # add(업로드/테이블 차이 보충)와 검색 직전 _consolidate가 다른 스레드에서 겹칠 수 있으므로
+        # _pending/_rows/행렬을 바꾸거나 함께 읽는 구간은 모두 이 락 안에서 처리합니다. (clear → super().clear() 재진입)
+        self._lock = threading.RLock()
+        self.dim = dim
+        self._rows: List[Dict] = []
+        self._id_to_idx: Dict[str, int] = {}
+        self._partitions: Dict[tuple, List[int]] = {}  # ("category", "food") -> [행 번호, ...]
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, rows: List[Dict]):
+        if not rows:
+            return
+        self.add_vectors(rows, np.asarray([row["embedding"] for row in rows], dtype=np.float32))
+
+    def add_vectors(self, rows: List[Dict], vectors: np.ndarray):
+        """
+        rows와 같은 순서의 (N, dim) 행렬을 그대로 추가합니다. (EmbeddingStore 메모리 맵 적재용)
+        이미 있는 id는 기존 행을 지우고 새 값으로 바꿉니다. (업서트가 기존 행을 갱신한 경우 중복 방지)
+        """
+        with self._lock:
+            if not rows:
+                return
+            existing = [str(row.get("id")) for row in rows if str(row.get("id")) in self._id_to_idx]
+            if existing:
+                self.remove(existing)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._pending.append(self._normalize(vectors))
+            for row in rows:
+                idx = len(self._rows)
+                meta = row.get("metadata") or {}
+                self._id_to_idx[str(row.get("id"))] = idx
+                self._rows.append({
+                    "id": row.get("id"),
+                    "content": row.get("content", ""),
+                    "metadata": meta
+                })
+                for key in self._partition_keys(meta):
+                    self._partitions.setdefault(key, []).append(idx)
+
+    @staticmethod
+    def _partition_keys(meta: Dict) -> List[tuple]:
+        keys = [("category", meta.get("category")), ("source", meta.get("source"))]
+        keys.extend(("tag", tag) for tag in meta.get("tags") or [])
+        return keys
+
+    def _filtered_rows(self, filters: MetadataFilter) -> np.ndarray:
+        """필터 조건별 파티션의 교집합 (행 번호 배열)"""
+        keys = []
+        if filters.category:
+            keys.append(("category", filters.category))
+        if filters.source:
+            keys.append(("source", filters.source))
+        keys.extend(("tag", tag) for tag in filters.tags)
+
+        selected = None
+        for key in keys:
+            rows = np.asarray(self._partitions.get(key, []), dtype=np.int64)
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+            if selected.size == 0:
+                break
+        return selected
+
+    def _consolidate(self):
+        with self._lock:
+            # 추가된 벡터는 검색 직전에 한 번만 이어 붙입니다. (add 호출마다 복사하지 않음)
+            if self._pending:
+                self._matrix = np.vstack([self._matrix] + self._pending)
+                self._pending = []
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        match_threshold: float = 0.1,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict]:
+        with self._lock:
+            self._consolidate()
+            if not self._rows or top_k <= 0:
+                return []
+
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+            row_ids = None
+            if filters and not filters.is_empty:
+                row_ids = self._filtered_rows(filters)
+                if row_ids.size == 0:
+                    return []
+
+            results = []
+            for idx, score in zip(*self._top_k(query, row_ids, top_k)):
+                score = float(score)
+                if score < match_threshold:
+                    break
+                row = self._rows[idx]
+                results.append({
+                    "id": row["id"],
+                    "content": row["content"],
+                    "metadata": row["metadata"],
+                    "similarity": score
+                })
+            return results
+
+    def _top_k(self, query: np.ndarray, row_ids: Optional[np.ndarray], top_k: int):
+        """정확한 내적 Top-K → (행 번호 배열, 점수 배열), 점수 내림차순"""
+        sims = self._matrix @ query if row_ids is None else self._matrix[row_ids] @ query
+        n = sims.shape[0]
+        k = min(top_k, n)
+        if k < n:
+            top_idx = np.argpartition(-sims, k - 1)[:k]
+        else:
+            top_idx = np.arange(n)
+        top_idx = top_idx[np.argsort(-sims[top_idx])]
+        rows = top_idx if row_ids is None else row_ids[top_idx]
+        return rows, sims[top_idx]
+
+    def _full_vectors(self, idx: List[int]) -> np.ndarray:
+        """원본(float32) 정규화 벡터"""
+        return self._matrix[idx]
+
+    def similarities(self, query_vector: List[float], ids: List) -> Dict:
+        with self._lock:
+            self._consolidate()
+            idx = [self._id_to_idx[str(i)] for i in ids if str(i) in self._id_to_idx]
+            if not idx:
+                return {}
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+            sims = np.asarray(self._full_vectors(idx), dtype=np.float32) @ query
+            return {self._rows[i]["id"]: float(score) for i, score in zip(idx, sims)}
+
+    def remove(self, ids: List):
+        with self._lock:
+            removed = {str(i) for i in ids}
+            if not removed & set(self._id_to_idx):
+                return
+            self._consolidate()
+            keep = [i for i, row in enumerate(self._rows) if str(row["id"]) not in removed]
+            matrix = self._full_vectors(keep)
+            rows = [self._rows[i] for i in keep]
+
+            # 드문 작업이므로 남은 행으로 행렬/파티션을 다시 구성합니다.
+            self.clear()
+            self._pending = [matrix]
+            for row in rows:
+                idx = len(self._rows)
+                self._id_to_idx[str(row["id"])] = idx
+                self._rows.append(row)
+                for key in self._partition_keys(row["metadata"]):
+                    self._partitions.setdefault(key, []).append(idx)
+
+    def clear(self):
+        with self._lock:
+            self._rows = []
+            self._id_to_idx = {}
+            self._partitions = {}
+            self._pending = []
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def memory_bytes(self) -> int:
+        return int(self._matrix.nbytes + sum(v.nbytes for v in self._pending))
+
+    def documents(self) -> List[Dict]:
+        with self._lock:
+            return list(self._rows)
+
+
+class CompressedVectorStore(NumpyVectorStore):
+    """
+    압축 코드(float16 / pca / int8)만 메모리에 올리는 NumPy 인덱스 (config.VECTOR_COMPRESSION)
+
+    원본 float32 벡터는 임시 파일로 내려 메모리 맵으로 두고,
+    압축 점수 상위 top_k × VECTOR_RESCORE_FACTOR개 후보만 읽어 정확한 점수로 재채점합니다.
+    코덱(PCA 주성분, int8 스케일)은 문서 수가 처음 학습 때의 2배가 되면 다시 학습합니다.
+    """
+
+    def __init__(self, method: str, dim: Optional[int] = None, spill_dir: str = None):
+        self.method = method
+        self.spill_dir = spill_dir or config.VECTOR_RESCORE_DIR
+        self._spill = None
+        super().__init__(dim)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self.codec = create_codec(self.method)
+            self._codes = None
+            self._fitted_rows = 0
+            self._full = None
+            if self._spill is not None:
+                self._spill.close()
+            Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            self._spill = tempfile.TemporaryFile(dir=self.spill_dir)  # 닫히면 자동 삭제
+
+    def _consolidate(self):
+        with self._lock:
+            if not self._pending:
+                return
+            new = np.vstack(self._pending).astype(np.float32)
+            self._pending = []
+
+            self._spill.seek(0, os.SEEK_END)
+            self._spill.write(new.tobytes())
+            self._spill.flush()
+            n = len(self._rows)
+            self._full = np.memmap(self._spill, dtype=np.float32, mode="r", shape=(n, self.dim))
+
+            if self._codes is None or n >= 2 * self._fitted_rows:
+                self.codec.fit(self._full)
+                self._codes = np.concatenate([
+                    self.codec.encode(self._full[start:start + 8192]) for start in range(0, n, 8192)
+                ])
+                self._fitted_rows = n
+            else:
+                self._codes = np.concatenate([self._codes, self.codec.encode(new)])
+
+    def _top_k(self, query: np.ndarray, row_ids: Optional[np.ndarray], top_k: int):
+        return compressed_top_k(self.codec, self._codes, self._full, query, top_k, row_ids=row_ids)
+
+    def _full_vectors(self, idx: List[int]) -> np.ndarray:
+        return np.asarray(self._full[idx], dtype=np.float32)
+
+    def memory_bytes(self) -> int:
+        codes = self._codes.nbytes if self._codes is not None else 0
+        return int(codes + sum(v.nbytes for v in self._pending))
+
+    def disk_bytes(self) -> int:
+        return int(self._full.nbytes) if self._full is not None else 0
+
+
+class ChromaVectorStore(VectorStore):
+    """chromadb 기반 로컬 영구 인덱스 (재시작 후에도 유지)"""
+
+    name = "chroma"
+
+    def __init__(self, persist_dir: str = None, collection_name: str = None):
+        try:
+            import chromadb
+        except ImportError:
+            raise ImportError("⚠️ chroma 백엔드를 사용하려면 'pip install chromadb'가 필요합니다.")
+
+        self.persist_dir = str(persist_dir or config.CHROMA_PERSIST_DIR)
+        self.client = chromadb.PersistentClient(path=self.persist_dir)
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name or config.VECTOR_DB_TABLE,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    @staticmethod
+    def _to_chroma_metadata(meta: Dict) -> Dict:
+        # chroma 메타데이터는 스칼라 값만 허용하므로 리스트는 쉼표 문자열로 저장합니다.
+        flat = {}
+        for k, v in (meta or {}).items():
+            if isinstance(v, (list, tuple)):
+                flat[k] = ",".join(str(x) for x in v)
+            elif v is None:
+                flat[k] = ""
+            else:
+                flat[k] = v
+        return flat
+
+    @staticmethod
+    def _from_chroma_metadata(meta: Dict) -> Dict:
+        meta = dict(meta or {})
+        if isinstance(meta.get("tags"), str):
+            meta["tags"] = [t for t in meta["tags"].split(",") if t]
+        return meta
+
+    def add(self, rows: List[Dict]):
+        if not rows:
+            return
+        self.collection.upsert(
+            ids=[str(row["id"]) for row in rows],
+            embeddings=[list(row["embedding"]) for row in rows],
+            documents=[row.get("content", "") for row in rows],
+            metadatas=[self._to_chroma_metadata(row.get("metadata")) for row in rows]
+        )
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        match_threshold: float = 0.1,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict]:
+        if top_k <= 0 or self.collection.count() == 0:
+            return []
+
+        # category/source는 chroma where 절로 색인 내부에서 거릅니다.
+        # tags는 쉼표 문자열로 저장되어 where로 표현할 수 없으므로 후보를 넉넉히 받아 후처리합니다.
+        conditions = []
+        if filters and filters.category:
+            conditions.append({"category": filters.category})
+        if filters and filters.source:
+            conditions.append({"source": filters.source})
+        where = None
+        if len(conditions) == 1:
+            where = conditions[0]
+        elif conditions:
+            where = {"$and": conditions}
+
+        n_results = top_k
+        if filters and filters.tags:
+            n_results = top_k * config.VECTOR_DB_FALLBACK_OVERFETCH
+
+        response = self.collection.query(
+            query_embeddings=[list(query_vector)],
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        results = []
+        for doc_id, content, meta, distance in zip(
+            response["ids"][0], response["documents"][0],
+            response["metadatas"][0], response["distances"][0]
+        ):
+            score = 1.0 - float(distance)
+            if score < match_threshold:
+                continue
+            meta = self._from_chroma_metadata(meta)
+            if filters and filters.tags and not filters.matches(meta):
+                continue
+            results.append({
+                "id": doc_id,
+                "content": content,
+                "metadata": meta,
+                "similarity": score
+            })
+        return results[:top_k]
+
+    def remove(self, ids: List):
+        if ids:
+            self.collection.delete(ids=[str(i) for i in ids])
+
+    def clear(self):
+        ids = self.collection.get(include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in Path(self.persist_dir).rglob("*") if p.is_file())
+
+    def documents(self) -> List[Dict]:
+        response = self.collection.get(include=["documents", "metadatas"])
+        return [
+            {"id": doc_id, "content": content, "metadata": self._from_chroma_metadata(meta)}
+            for doc_id, content, meta in zip(response["ids"], response["documents"], response["metadatas"])
+        ]
+
+
+def _hydrate_from_embedding_store(store: VectorStore, embedding_store) -> int:
+    rows, vectors = embedding_store.load()
+    if not rows:
+        return 0
+    if isinstance(store, NumpyVectorStore):
+        store.add_vectors(rows, vectors)
+    else:
+        store.add([dict(row, embedding=vector.tolist()) for row, vector in zip(rows, vectors)])
+    return len(rows)
+
+
+def _attach_hashes(rows: List[Dict]):
+    from .bulk_writer import document_hash
+    for row in rows:
+        row["content_hash"] = row["metadata"].get("content_hash") or document_hash(row["content"], row["metadata"])
+
+
+def _reconcile_with_supabase(store: VectorStore, supabase_client, embedding_store) -> Tuple[int, int]:
+    """
+    로컬 벡터 파일로 적재한 인덱스를 Supabase의 살아있는 행과 맞춥니다. → (보충한 행 수, 제거한 행 수)
+    벡터 파일은 이 프로세스가 올린 문서/검색 때 채운 문서만 담고 있을 수 있으므로(부분 저장소),
+    행 수가 다르면 빠진 행은 임베딩과 함께 읽어 오고, 테이블에서 삭제된 행은 인덱스에서 뺍니다.
+    """
+    if SupabaseVectorStore(supabase_client).count() == len(embedding_store):
+        return 0, 0
+
+    live = load_live_hashes(supabase_client)
+    live_hashes = {h for h in live.values() if h}
+    missing_ids = [doc_id for doc_id, content_hash in live.items() if not content_hash or content_hash not in embedding_store]
+
+    local_rows, _ = embedding_store.load()
+    stale = [row for row in local_rows if row["content_hash"] not in live_hashes]
+    if stale:
+        store.remove([row["id"] for row in stale])
+        embedding_store.remove([row["content_hash"] for row in stale])
+
+    rows = load_rows_by_ids(supabase_client, missing_ids) if missing_ids else []
+    if rows:
+        store.add(rows)
+        _attach_hashes(rows)
+        embedding_store.append(rows)
+    return len(rows), len(stale)
+
+
+def create_vector_store(backend: str, supabase_client=None, embedding_store=None) -> VectorStore:
+    """
+    config.VECTOR_BACKEND 값에 맞는 백엔드를 생성합니다.
+    로컬 백엔드(numpy/chroma)가 비어 있으면 EmbeddingStore(로컬 벡터 파일)에서 먼저 적재하고,
+    그것도 비어 있으면 Supabase 테이블에서 한 번 읽어 온 뒤 EmbeddingStore에도 채워 둡니다.
+    """
+    backend = (backend or "supabase").lower()
+
+    if backend == "supabase":
+        return SupabaseVectorStore(supabase_client)
+
+    if backend == "numpy":
+        compression = (config.VECTOR_COMPRESSION or "none").lower()
+        store = NumpyVectorStore() if compression == "none" else CompressedVectorStore(compression)
+    elif backend == "chroma":
+        store = ChromaVectorStore()
+    else:
+        raise ValueError(f"⚠️ 지원하지 않는 벡터 백엔드입니다: {backend}")
+
+    if store.count() == 0 and embedding_store is not None and len(embedding_store):
+        try:
+            loaded = _hydrate_from_embedding_store(store, embedding_store)
+            print(f"📥 로컬 인덱스({store.name}) 적재 완료 (로컬 벡터 파일): {loaded}개")
+        except Exception as e:
+            print(f"⚠️ 로컬 벡터 파일 적재 실패 (Supabase에서 적재): {e}")
+            store.clear()
+
+        if supabase_client is not None and store.count():
+            try:
+                added, removed = _reconcile_with_supabase(store, supabase_client, embedding_store)
+                if added or removed:
+                    print(f"📥 로컬 벡터 파일과 테이블 차이 반영: 보충 {added}개 / 제거 {removed}개")
+            except Exception as e:
+                print(f"⚠️ 로컬 인덱스를 테이블과 맞추지 못했습니다 (로컬 벡터 파일 기준으로 검색): {e}")
+
+    if supabase_client is not None and store.count() == 0:
+        try:
+            rows = load_rows_from_supabase(supabase_client)
+            store.add(rows)
+            print(f"📥 로컬 인덱스({store.name}) 적재 완료: {len(rows)}개")
+            if embedding_store is not None:
+                _attach_hashes(rows)
+                embedding_store.append(rows)
+        except Exception as e:
+            print(f"⚠️ 로컬 인덱스 적재 실패 (빈 인덱스로 시작): {e}")
+    return store
@@ -0,0 +1,370 @@
+"""
+LLM 호출 보호 유틸리티 - 재시도(지수 백오프 + 지터) / 시도별 타임아웃 / 헤징 / 서킷 브레이커
+
+    llm = ResilientLLM(ChatGoogleGenerativeAI(...), name="gemini")
+    llm.invoke(messages)           # 동기
+    await llm.ainvoke(messages)    # 비동기
+    for chunk in llm.stream(messages): ...
+
+- 재시도 대기: 0 ~ min(max_delay, base_delay × 2^시도) 사이 무작위 (full jitter)
+  → 여러 요청이 같은 순간에 다시 몰리는 재시도 폭주를 막음
+- 시도별 타임아웃: timeout초 안에 응답이 없으면 그 시도는 실패로 보고 다음 시도로 넘어감
+- 헤징: 최근 응답 시간의 hedge_percentile 분위수가 지나도 응답이 없으면 같은 요청을 하나 더 보내
+  먼저 도착한 응답을 사용 (꼬리 지연 감소)
+- 서킷 브레이커: 연속 실패가 쌓이면 일정 시간 호출 없이 즉시 실패 (CircuitOpenError)
+  같은 name의 ResilientLLM(예: 챗봇과 비전 분석의 Gemini)은 브레이커를 공유합니다.
+- 동시 호출 상한: 진행 중인 동기 호출(타임아웃/헤지로 버려졌지만 아직 끝나지 않은 호출 포함)이
+  LLM_MAX_IN_FLIGHT개면 큐에 쌓지 않고 즉시 실패 (LLMOverloadedError, 브레이커 실패로 세지 않음)
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Iterator, Optional
+
+import src.config as config
+from .metrics import LatencyWindow
+
+
+class CircuitOpenError(RuntimeError):
+    """서킷 브레이커가 열려 있어 호출하지 않고 실패한 경우"""
+
+
+class LLMOverloadedError(RuntimeError):
+    """진행 중인 호출이 상한에 닿아 보내지 않고 실패한 경우"""
+
+
+class BreakerPermit:
+    """acquire()로 받은 호출 권한 (trial=True면 half_open의 유일한 시험 호출)"""
+
+    __slots__ = ("trial",)
+
+    def __init__(self, trial: bool):
+        self.trial = trial
+
+
+class CircuitBreaker:
+    """
+    closed → (연속 실패 failure_threshold회) → open → (reset_timeout초 경과) → half_open
+    half_open에서 한 번 시험 호출하여 성공하면 closed, 실패하면 다시 open
+
+    호출마다 acquire()로 권한을 받고, 끝나면 그 권한으로 record_success / record_failure / release 중 하나를 호출합니다.
+    시험 호출 표시는 시험 권한을 가진 호출만 해제하므로, closed일 때 시작한 호출이 늦게 끝나도 다른 시험 호출에 영향이 없습니다.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def acquire(self) -> Optional[BreakerPermit]:
+        """호출 권한 (거절이면 None)"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return BreakerPermit(trial=False)
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return BreakerPermit(trial=True)
+            return None
+
+    def record_success(self, permit: BreakerPermit):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            if permit.trial:
+                self._trial_running = False
+
+    def release(self, permit: BreakerPermit):
+        """
+        성공/실패를 기록하지 못하고 끝난 호출의 권한 반납
+        (스트림을 끝까지 읽지 않고 버림 / 요청 취소 등 - 시험 권한을 반납하지 않으면 half_open에서 영원히 거절됨)
+        """
+        if permit.trial:
+            with self._lock:
+                self._trial_running = False
+
+    def record_failure(self, permit: BreakerPermit):
+        with self._lock:
+            self._failures += 1
+            if permit.trial or self._failures >= self.failure_threshold:
+                if self._opened_at is None or permit.trial:
+                    self.opened_count += 1
+                self._opened_at = time.monotonic()
+            if permit.trial:
+                self._trial_running = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """프로바이더 이름별로 공유되는 서킷 브레이커"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_RESET)
+        return _breakers[name]
+
+
+class ResilientLLM:
+    """LangChain 채팅 모델을 감싸 invoke / ainvoke / stream에 보호 로직을 적용합니다."""
+
+    # 시도별 타임아웃/헤징에 쓰는 공용 스레드 (타임아웃된 호출은 백그라운드에서 끝까지 실행됨)
+    # 스레드 수 = 호출 권한 수이므로 권한을 받은 호출은 큐에서 기다리지 않고 바로 실행됩니다.
+    _executor = ThreadPoolExecutor(max_workers=config.LLM_MAX_IN_FLIGHT, thread_name_prefix="llm")
+    _in_flight = threading.BoundedSemaphore(config.LLM_MAX_IN_FLIGHT)
+
+    def __init__(
+        self,
+        llm,
+        name: str = "gemini",
+        max_attempts: int = None,
+        base_delay: float = None,
+        max_delay: float = None,
+        timeout: float = None,
+        hedge_percentile: float = None
+    ):
+        self.llm = llm
+        self.name = name
+        self.max_attempts = max_attempts or config.LLM_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else config.LLM_RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else config.LLM_RETRY_MAX_DELAY
+        self.timeout = timeout if timeout is not None else config.LLM_TIMEOUT
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else config.LLM_HEDGE_PERCENTILE
+        self.breaker = get_breaker(name)
+        self.latency = LatencyWindow(config.STATS_LATENCY_WINDOW)              # 전체 응답 시간 (헤징 기준)
+        self.first_token_latency = LatencyWindow(config.STATS_LATENCY_WINDOW)  # 스트리밍 첫 조각까지 (헤징에 쓰지 않음)
+
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.rejected = 0
+        self.overloaded = 0
+
+    # ------------------------------------------------------------------
+    # 공통
+    # ------------------------------------------------------------------
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _hedge_delay(self) -> Optional[float]:
+        """헤지 요청을 보낼 시점 (관측값이 충분하지 않거나 비활성화면 None)"""
+        if not self.hedge_percentile or len(self.latency) < config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.quantile(self.hedge_percentile)
+
+    def _check_breaker(self) -> BreakerPermit:
+        permit = self.breaker.acquire()
+        if permit is None:
+            self.rejected += 1
+            raise CircuitOpenError(f"⚠️ {self.name} 서비스가 불안정하여 잠시 호출을 중단했습니다.")
+        return permit
+
+    def stats(self) -> Dict:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+            "overloaded": self.overloaded,
+            "latency": self.latency.percentiles(),
+            "first_token_latency": self.first_token_latency.percentiles()
+        }
+
+    # ------------------------------------------------------------------
+    # 동기
+    # ------------------------------------------------------------------
+    def _submit(self, messages, **kwargs):
+        """
+        호출 권한이 있으면 스레드에서 실행 → (future, 시작 시각 기록용 dict), 권한이 없으면 None
+        권한은 호출이 실제로 끝날 때 반납하므로 버려진 호출도 끝날 때까지 자리를 차지합니다.
+        """
+        if not self._in_flight.acquire(blocking=False):
+            return None
+        call = {"started_at": None}
+
+        def run():
+            call["started_at"] = time.perf_counter()
+            try:
+                return self.llm.invoke(messages, **kwargs)
+            finally:
+                self._in_flight.release()
+
+        return self._executor.submit(run), call
+
+    def _attempt(self, messages, **kwargs):
+        """한 번의 시도 (타임아웃 + 필요 시 헤지 요청) - 타임아웃은 호출이 실행되기 시작한 시점부터"""
+        submitted = time.perf_counter()
+        first = self._submit(messages, **kwargs)
+        if first is None:
+            self.overloaded += 1
+            raise LLMOverloadedError(f"⚠️ {self.name} 동시 호출이 많아 잠시 후 다시 시도해주세요.")
+        calls = {first[0]: first[1]}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < self.timeout:
+            done, _ = wait(calls, timeout=hedge_delay)
+            if not done:
+                hedge = self._submit(messages, **kwargs)  # 권한이 없으면 헤지 생략
+                if hedge is not None:
+                    self.hedges += 1
+                    calls[hedge[0]] = hedge[1]
+
+        def remaining() -> float:
+            started = first[1]["started_at"] or submitted
+            return self.timeout - (time.perf_counter() - started)
+
+        error = None
+        pending = set(calls)
+        while pending and remaining() > 0:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.latency.observe(time.perf_counter() - (calls[future]["started_at"] or submitted))
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        self.timeouts += 1
+        raise FutureTimeoutError(f"{self.name} 응답 시간 초과 ({self.timeout:g}초)")
+
+    def invoke(self, messages, **kwargs):
+        permit = self._check_breaker()  # 성공/실패를 기록하면 None (남아 있으면 finally에서 반납)
+        try:
+            for attempt in range(self.max_attempts):
+                try:
+                    result = self._attempt(messages, **kwargs)
+                    self.breaker.record_success(permit)
+                    permit = None
+                    return result
+                except LLMOverloadedError:
+                    raise  # 제공자 장애가 아니므로 브레이커 실패로 세지 않고 바로 실패 (권한은 finally에서 반납)
+                except Exception as e:
+                    self.breaker.record_failure(permit)
+                    permit = None
+                    if attempt == self.max_attempts - 1:
+                        raise
+                    permit = self.breaker.acquire()  # 재시도도 브레이커 권한을 받아야 함
+                    if permit is None:
+                        raise
+                    self.retries += 1
+                    print(f"⚠️ {self.name} 호출 실패, 재시도합니다 ({attempt + 1}/{self.max_attempts}): {e}")
+                    time.sleep(self._backoff(attempt))
+        finally:
+            if permit is not None:
+                self.breaker.release(permit)
+
+    # ------------------------------------------------------------------
+    # 비동기
+    # ------------------------------------------------------------------
+    async def _aattempt(self, messages, **kwargs):
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(self.llm.ainvoke(messages, **kwargs))]
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < self.timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(self.llm.ainvoke(messages, **kwargs)))
+
+        error = None
+        pending = set(tasks)
+        try:
+            while pending:
+                remaining = self.timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.observe(time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if error is not None and not pending:
+            raise error
+        self.timeouts += 1
+        raise asyncio.TimeoutError(f"{self.name} 응답 시간 초과 ({self.timeout:g}초)")
+
+    async def ainvoke(self, messages, **kwargs):
+        permit = self._check_breaker()  # 요청이 취소되면(CancelledError) 성공/실패 없이 끝나므로 finally에서 반납
+        try:
+            for attempt in range(self.max_attempts):
+                try:
+                    result = await self._aattempt(messages, **kwargs)
+                    self.breaker.record_success(permit)
+                    permit = None
+                    return result
+                except Exception as e:
+                    self.breaker.record_failure(permit)
+                    permit = None
+                    if attempt == self.max_attempts - 1:
+                        raise
+                    permit = self.breaker.acquire()  # 재시도도 브레이커 권한을 받아야 함
+                    if permit is None:
+                        raise
+                    self.retries += 1
+                    print(f"⚠️ {self.name} 호출 실패, 재시도합니다 ({attempt + 1}/{self.max_attempts}): {e}")
+                    await asyncio.sleep(self._backoff(attempt))
+        finally:
+            if permit is not None:
+                self.breaker.release(permit)
+
+    # ------------------------------------------------------------------
+    # 스트리밍
+    # ------------------------------------------------------------------
+    def stream(self, messages, **kwargs) -> Iterator:
+        """
+        첫 조각을 받기 전 실패하면 백오프 후 재시도하고, 조각을 내보낸 뒤의 실패는 그대로 전달합니다.
+        (이미 보낸 조각을 되돌릴 수 없으므로 스트리밍에는 헤징/타임아웃을 적용하지 않음)
+        """
+        permit = self._check_breaker()  # 소비자가 도중에 버리면(GeneratorExit) 성공/실패 없이 끝나므로 finally에서 반납
+        try:
+            for attempt in range(self.max_attempts):
+                started = time.perf_counter()
+                emitted = False
+                try:
+                    for chunk in self.llm.stream(messages, **kwargs):
+                        if not emitted:
+                            self.first_token_latency.observe(time.perf_counter() - started)
+                            emitted = True
+                        yield chunk
+                    self.breaker.record_success(permit)
+                    permit = None
+                    return
+                except Exception as e:
+                    self.breaker.record_failure(permit)
+                    permit = None
+                    if emitted or attempt == self.max_attempts - 1:
+                        raise
+                    permit = self.breaker.acquire()  # 재시도도 브레이커 권한을 받아야 함
+                    if permit is None:
+                        raise
+                    self.retries += 1
+                    print(f"⚠️ {self.name} 스트리밍 실패, 재시도합니다 ({attempt + 1}/{self.max_attempts}): {e}")
+                    time.sleep(self._backoff(attempt))
+        finally:
+            if permit is not None:
+                self.breaker.release(permit)
@@ -0,0 +1,172 @@
+"""
+지표 유틸리티 - 구간별 지연 시간(rolling window) 집계 + 단계별 추적(span) / Prometheus 히스토그램
+
+    with span("rpc"):                  # 단계 시간을 히스토그램(/metrics)과 현재 요청 추적에 기록
+        ...
+    with trace_request() as timings:   # 이 블록 안의 span이 timings[단계] += 초 로 모임
+        ...
+
+config.TRACING_ENABLED가 False이고 추적 중인 요청도 없으면 span은 시간을 재지 않고 바로 통과합니다.
+asyncio.to_thread는 컨텍스트를 복사하므로 스레드에서 실행한 span도 같은 요청 추적에 기록됩니다.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+import src.config as config
+
+
+class LatencyWindow:
+    """
+    최근 maxlen개 관측값으로 p50/p95/p99를 계산하는 롤링 윈도우
+    기록은 O(1)이고, 정렬은 통계를 조회할 때만 수행합니다.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self._values = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+            self.total += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def __len__(self):
+        return len(self._values)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """최근 관측값의 q 분위수 (초 단위, 관측값이 없으면 None)"""
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def percentiles(self) -> Dict:
+        """밀리초 단위 p50/p95/p99 (관측값이 없으면 None)"""
+        with self._lock:
+            values = sorted(self._values)
+            total = self.total
+        if not values:
+            return {"count": total, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+        def pick(q):
+            return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+        return {"count": total, "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+class Histogram:
+    """Prometheus 형식의 누적 버킷 히스토그램 (초 단위)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self._counts[i] += 1
+                    break
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self) -> Tuple[list, float, int]:
+        """(le별 누적 개수, 합계, 개수)"""
+        with self._lock:
+            counts, total, count = list(self._counts), self.sum, self.count
+        cumulative, running = [], 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            cumulative.append((bound, running))
+        return cumulative, total, count
+
+
+class StageMetrics:
+    """단계 이름별 히스토그램 모음 (/metrics 노출용)"""
+
+    def __init__(self, metric: str = "fitlife_stage_seconds", buckets: Tuple[float, ...] = None):
+        self.metric = metric
+        self.buckets = buckets or config.TRACING_BUCKETS
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def render(self) -> str:
+        """Prometheus 텍스트 노출 형식"""
+        lines = [
+            f"# HELP {self.metric} FitLife RAG pipeline stage latency in seconds",
+            f"# TYPE {self.metric} histogram"
+        ]
+        for stage in sorted(self._histograms):
+            cumulative, total, count = self._histograms[stage].snapshot()
+            for bound, n in cumulative:
+                lines.append(f'{self.metric}_bucket{{stage="{stage}",le="{bound:g}"}} {n}')
+            lines.append(f'{self.metric}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{self.metric}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{self.metric}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+stage_metrics = StageMetrics()
+
+_current_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("fitlife_trace", default=None)
+_trace_lock = threading.Lock()
+
+
+def record_span(name: str, seconds: float, window: Optional[LatencyWindow] = None):
+    """직접 잰 구간 시간을 기록합니다. (with 블록으로 감싸기 어려운 곳용)"""
+    if window is not None:
+        window.observe(seconds)
+    if config.TRACING_ENABLED:
+        stage_metrics.observe(name, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        with _trace_lock:
+            trace[name] = trace.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name: str, window: Optional[LatencyWindow] = None) -> Iterator[None]:
+    """단계 하나의 시간을 잽니다. window를 주면 해당 LatencyWindow에도 기록합니다."""
+    if window is None and not config.TRACING_ENABLED and _current_trace.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started, window)
+
+
+@contextmanager
+def trace_request() -> Iterator[Dict[str, float]]:
+    """블록 안에서 기록된 span을 단계별 합계(초)로 모읍니다. 같은 단계가 여러 번이면 더합니다."""
+    timings: Dict[str, float] = {}
+    token = _current_trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_trace.reset(token)
@@ -0,0 +1,114 @@
+"""
+동일 요청 병합 (single-flight) - 같은 키의 요청이 동시에 여러 개 들어오면 한 번만 계산하고 결과를 나눠 씀
+
+    flights = SingleFlight()
+    result = flights.do(key, fn, *args)                 # 동기 (스레드 간 병합)
+    result = await flights.do_async(key, coro_fn, *args)  # 비동기 (같은 이벤트 루프 안에서 병합)
+
+- 먼저 도착한 요청(leader)만 fn을 실행하고, 실행 중에 들어온 같은 키의 요청은 끝날 때까지 기다렸다가 같은 결과를 받음
+- 결과가 dict이면 뒤따른 요청에는 얕은 사본을 돌려줌 (호출하는 쪽에서 키를 고쳐도 서로 영향 없음)
+- leader가 실패하면 기다리던 요청도 같은 예외를 받음 (실패를 재시도하는 것은 ResilientLLM의 몫)
+- 완료되면 바로 잊으므로 캐시가 아님 - 끝난 뒤에 들어온 같은 요청은 다시 계산
+- 비동기 계산은 별도 Task로 실행하므로 leader의 클라이언트가 끊겨도 기다리던 요청은 결과를 받음
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+def _share(result):
+    return dict(result) if isinstance(result, dict) else result
+
+
+class _Call:
+    """진행 중인 동기 계산 하나"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """키별 진행 중 계산 병합기 (동기 / 비동기)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[Tuple[int, str], asyncio.Task] = {}  # (이벤트 루프 id, 키)
+
+        self.leaders = 0     # 실제로 계산한 요청 수
+        self.coalesced = 0   # 진행 중인 계산에 합류한 요청 수
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return _share(call.result)
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """fn은 코루틴 함수 - 같은 이벤트 루프에서 실행 중인 같은 키의 Task를 함께 기다림"""
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[task_key] = loop.create_task(fn(*args, **kwargs))
+                task.add_done_callback(lambda t: self._forget(task_key, t))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        result = await asyncio.shield(task)
+        return result if leader else _share(result)
+
+    def _forget(self, task_key: Tuple[int, str], task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        if not task.cancelled():
+            task.exception()  # 기다리던 요청이 모두 취소된 경우에도 "never retrieved" 경고가 나지 않도록
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._calls) + len(self._tasks),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_flight_group(name: str) -> SingleFlight:
+    """이름별로 프로세스 전체가 공유하는 병합기 (예: 세션마다 만들어지는 ImageAnalyzer끼리 공유)"""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight()
+        return _groups[name]
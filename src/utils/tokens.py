@@ -0,0 +1,20 @@
+"""
+토큰 수 추정 유틸리티 - 프롬프트 길이/비용 계산용
+정확한 토크나이저 없이 쓸 수 있도록 문자 종류별 평균값으로 근사합니다.
+"""
+import re
+
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    대략적인 LLM 입력 토큰 수
+    - 한글 음절: 음절당 약 1토큰
+    - 그 외(영문/숫자/기호/공백): 4글자당 약 1토큰
+    """
+    if not text:
+        return 0
+    text = str(text)
+    hangul = len(_HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
@@ -1,28 +1,35 @@
 """
 이미지 분석 모듈 v2.4 (완성된 음식 분석 + 하위 호환성 FridgeAnalyzer 포함)
 """
+import asyncio
 import base64
+import hashlib
 import json
 import re
 from typing import List, Dict, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
 from src.config import GOOGLE_API_KEY
+from src.utils.llm_guard import ResilientLLM
+from src.utils.singleflight import get_flight_group
 
 class ImageAnalyzer:
     """통합 이미지 분석기 - 식재료 & 운동기구 & 완성된 음식"""
     
     def __init__(self):
-        self.vision_model = ChatGoogleGenerativeAI(
+        # 챗봇(FitLifeRAG)과 같은 "gemini" 서킷 브레이커를 공유 → 장애 시 양쪽 모두 즉시 실패
+        self.vision_model = ResilientLLM(ChatGoogleGenerativeAI(
             model="gemini-2.5-flash",
             google_api_key=GOOGLE_API_KEY,
             temperature=0.1
-        )
-        self.llm = ChatGoogleGenerativeAI(
+        ), name="gemini")
+        self.llm = ResilientLLM(ChatGoogleGenerativeAI(
             model="gemini-2.5-flash",
             google_api_key=GOOGLE_API_KEY,
             temperature=0.7
-        )
+        ), name="gemini")
+        # 같은 이미지 + 모드 + 프로필의 동시 분석 병합 (세션마다 만든 분석기끼리도 공유)
+        self.flights = get_flight_group("vision")
     
     def _encode_image(self, image_bytes: bytes) -> str:
         return base64.b64encode(image_bytes).decode("utf-8")
@@ -108,7 +115,8 @@ class ImageAnalyzer:
             result = self._parse_json_response(response.content)
             if result: result["success"] = True
             return result or {"success": False}
-        except: return {"success": False}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
     # 4. 운동기구 분석
     def analyze_equipment(self, image_bytes: bytes) -> Dict:
@@ -121,7 +129,8 @@ class ImageAnalyzer:
             result = self._parse_json_response(response.content)
             if result: result["success"] = True
             return result or {"success": False}
-        except: return {"success": False}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
     def suggest_exercises(self, equipment: List[str], target_area: str = "전신", duration: int = 30) -> Dict:
         prompt = f"기구: {equipment}, 부위: {target_area}, 시간: {duration}분. 운동 루틴 추천. JSON (한글)."
@@ -130,10 +139,20 @@ class ImageAnalyzer:
             result = self._parse_json_response(response.content)
             if result: result["success"] = True
             return result or {"success": False}
-        except: return {"success": False}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
 
     # Wrapper (비동기 호환)
     async def analyze_image(self, image_bytes: bytes, mode: str = "general", user_profile: str = "") -> Dict:
+        """
+        모드별 분석을 스레드에서 실행 (이벤트 루프를 막지 않음)
+        같은 이미지를 같은 모드/프로필로 분석 중이면 새로 호출하지 않고 그 결과를 함께 받습니다.
+        Streamlit은 호출마다 asyncio.run으로 새 루프를 만들므로 루프가 아닌 스레드 기준으로 병합합니다.
+        """
+        key = hashlib.sha1(image_bytes).hexdigest() + f":{mode}:{user_profile}"
+        return await asyncio.to_thread(self.flights.do, key, self._analyze_by_mode, image_bytes, mode, user_profile)
+
+    def _analyze_by_mode(self, image_bytes: bytes, mode: str, user_profile: str) -> Dict:
         if mode == "meal":
             return self.analyze_cooked_food(image_bytes, user_profile)
         elif mode == "ingredients":
@@ -1,5 +1,12 @@
-"""FitLife AI - 통합 테스트"""
+"""
+FitLife AI - 통합 테스트
+
+    python test_all.py            # 전체 (API 키 / Supabase 필요한 항목 포함)
+    python test_all.py --offline  # 오프라인 대역(src.fakes)만으로 동기화/적재/캐시/브레이커 점검
+"""
 import sys
+import tempfile
+import time
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -45,12 +52,232 @@ def test_xai():
     result = xai.analyze_health_factors(health_data)
     print(f"   ✅ 건강 점수: {result['health_score']}점")
 
+# --------------------------------------------------------------------------
+# 오프라인 점검 (FakeSupabaseClient / HashEmbeddings / FakeChatModel)
+# --------------------------------------------------------------------------
+def _offline_config(backend: str = "numpy"):
+    """로컬 파일 경로를 임시 폴더로 돌리고 검색 백엔드를 지정합니다."""
+    import src.config as config
+    tmp = tempfile.mkdtemp(prefix="fitlife_test_")
+    config.VECTOR_BACKEND = backend
+    config.VECTOR_COMPRESSION = "none"
+    config.EMBEDDING_STORE_ENABLED = True
+    config.EMBEDDING_STORE_DIR = f"{tmp}/embeddings"
+    config.KB_STATE_PATH = f"{tmp}/kb_state.json"
+    config.EMBEDDING_CACHE_PATH = None
+    config.ANSWER_CACHE_PATH = None
+    return config, tmp
+
+
+def _sample_docs(n: int, prefix: str = "닭가슴살"):
+    return [{"title": f"{prefix} 메뉴 {i}", "content": f"{prefix} 단백질 식단 {i}번 레시피"} for i in range(n)]
+
+
+def test_offline_incremental_sync():
+    print("6️⃣ 증분 동기화 / tombstone 테스트 (오프라인)...")
+    _offline_config()
+    from src.fakes import FakeSupabaseClient, HashEmbeddings
+    from src.rag.knowledge_base import KnowledgeBase
+    client = FakeSupabaseClient()
+    kb = KnowledgeBase(supabase_client=client, embedding_model=HashEmbeddings())
+    docs = _sample_docs(10)
+
+    first = kb.sync_documents(docs, "food", "test")
+    assert (first.added, first.unchanged, first.tombstoned) == (10, 0, 0), first
+    again = kb.sync_documents(docs, "food", "test")
+    assert (again.added, again.unchanged) == (0, 10), again
+
+    shrunk = kb.sync_documents(docs[:4], "food", "test")
+    assert (shrunk.unchanged, shrunk.tombstoned) == (4, 6), shrunk
+    assert kb.vector_store.count() == 4 and len(kb.lexical_index) == 4
+    assert kb.get_stats()["total_documents"] == 4
+    live = [row for row in client.tables["documents"] if row.get("deleted_at") is None]
+    assert len(live) == 4
+
+    # 삭제 표시된 문서가 다시 나타나면 되살아나고, 중복 행은 생기지 않음
+    restored = kb.sync_documents(docs, "food", "test")
+    assert (restored.added, restored.unchanged) == (6, 4), restored
+    assert len(client.tables["documents"]) == 10 and kb.vector_store.count() == 10
+    print(f"   ✅ {first} → {shrunk} → {restored}")
+
+
+def test_offline_bulk_retry():
+    print("7️⃣ 대량 업로드 재시도 테스트 (오프라인)...")
+    _offline_config()
+    from src.fakes import FakeSupabaseClient, HashEmbeddings
+    from src.rag.bulk_writer import BulkWriter
+    client = FakeSupabaseClient()
+    failures = {"left": 2}
+    table = client.table
+
+    def flaky_table(name):
+        query = table(name)
+        upsert = query.upsert
+
+        def failing_upsert(rows, on_conflict=None):
+            if failures["left"] > 0:
+                failures["left"] -= 1
+                raise ConnectionError("일시적 오류")
+            return upsert(rows, on_conflict=on_conflict)
+        query.upsert = failing_upsert
+        return query
+
+    client.table = flaky_table
+    written = []
+    writer = BulkWriter(client, HashEmbeddings(), batch_size=4, max_retries=3, backoff=0.0, on_batch_written=written.extend)
+    rows = [{"content": doc["content"], "metadata": {"title": doc["title"]}} for doc in _sample_docs(10)]
+    result = writer.write(rows)
+    assert (result.written, result.failed) == (10, 0), result
+    assert all(row["id"] for row in written)
+
+    # 같은 문서를 다시 올리면 임베딩 없이 건너뜀 (멱등)
+    again = writer.write(rows)
+    assert (again.written, again.skipped) == (0, 10), again
+    assert len(client.tables["documents"]) == 10
+    print(f"   ✅ 일시적 실패 2회 후 {result}")
+
+
+def test_offline_hydrate_search():
+    print("8️⃣ 로컬 벡터 파일 적재 후 검색 테스트 (오프라인)...")
+    config, tmp = _offline_config("numpy")
+    from src.fakes import FakeSupabaseClient, HashEmbeddings
+    from src.rag.knowledge_base import KnowledgeBase
+    from src.rag.embedding_store import EmbeddingStore, store_dir_for
+    client = FakeSupabaseClient()
+    writer_kb = KnowledgeBase(supabase_client=client, embedding_model=HashEmbeddings())
+    writer_kb.add_documents(_sample_docs(12) + _sample_docs(8, prefix="스쿼트"), category="food")
+    rows, vectors = writer_kb.embedding_store.load()
+
+    # 새 서버: 일부만 담긴 벡터 파일에서 시작해도 테이블 기준으로 빠진 행을 채움
+    config.EMBEDDING_STORE_DIR = f"{tmp}/partial"
+    partial = EmbeddingStore(store_dir_for(config.EMBEDDING_MODEL_NAME, config.EMBEDDING_BACKEND))
+    partial.append([dict(row, embedding=vector.tolist()) for row, vector in zip(rows[:5], vectors[:5])])
+
+    kb = KnowledgeBase(supabase_client=client, embedding_model=HashEmbeddings())
+    assert kb.vector_store.count() == 20 and len(kb.embedding_store) == 20
+    results = kb.search("스쿼트 식단", top_k=3)
+    assert results and "스쿼트" in results[0][0].metadata["title"], results
+    assert results[0][0].metadata.get("id") is not None
+    vectors = kb.document_vectors([doc for doc, _ in results])
+    assert vectors is not None and vectors.shape[0] == len(results)
+    print(f"   ✅ 부분 벡터 파일 5개 → 인덱스 {kb.vector_store.count()}개, 1위: {results[0][0].metadata['title']}")
+
+
+def test_offline_answer_cache_and_mmr():
+    print("9️⃣ 응답 캐시 / MMR 선택 테스트 (오프라인)...")
+    config, _ = _offline_config("numpy")
+    config.ANSWER_CACHE_ENABLED = True
+    from src.fakes import FakeSupabaseClient, HashEmbeddings, FakeChatModel
+    from src.rag.chain import FitLifeRAG
+    from src.rag.knowledge_base import KnowledgeBase
+    import src.rag.chain as chain
+    kb = KnowledgeBase(supabase_client=FakeSupabaseClient(), embedding_model=HashEmbeddings())
+    kb.add_documents(_sample_docs(30), category="food")
+    llm = FakeChatModel(latency=0, tokens_per_second=0, answer_tokens=5)
+    rag = FitLifeRAG(kb=kb, llm=llm)
+
+    mmr_calls = []
+    mmr_select = chain.mmr_select
+    chain.mmr_select = lambda *args, **kwargs: mmr_calls.append(1) or mmr_select(*args, **kwargs)
+    try:
+        profile = {"goal": "체중감량", "diseases": ["당뇨"]}
+        first = rag.query("닭가슴살 식단 추천", profile, ["food"], "food")
+        second = rag.query("닭가슴살 식단 추천", profile, ["food"], "food")
+    finally:
+        chain.mmr_select = mmr_select
+    assert first["answer"] == second["answer"] and llm.calls == 1
+    assert rag.answer_cache.stats()["hits"] == 1
+    assert mmr_calls, "MMR이 실행되지 않았습니다"
+    print(f"   ✅ LLM 호출 {llm.calls}회, 캐시 적중 1회, 출처 {len(first['sources'])}개")
+
+
+def test_offline_singleflight():
+    print("🔟 동일 요청 병합 테스트 (오프라인)...")
+    import threading
+    from src.utils.singleflight import SingleFlight
+    flights = SingleFlight()
+    calls = []
+
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.1)
+        return {"value": x}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", slow, 1))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len(results) == 8
+    assert all(result == {"value": 1} for result in results)
+    stats = flights.stats()
+    assert stats["leaders"] == 1 and stats["coalesced"] == 7 and stats["in_flight"] == 0
+    print(f"   ✅ 동시 요청 8개 → 계산 1회 ({stats})")
+
+
+def test_offline_circuit_breaker():
+    print("1️⃣1️⃣ 서킷 브레이커 테스트 (오프라인)...")
+    from src.utils.llm_guard import CircuitBreaker, CircuitOpenError, ResilientLLM
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.record_failure(breaker.acquire())
+    assert breaker.state == "open" and breaker.acquire() is None
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    trial = breaker.acquire()
+    assert trial is not None and trial.trial
+    assert breaker.acquire() is None, "half_open에서는 시험 호출 하나만 허용"
+    breaker.record_failure(trial)
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    trial = breaker.acquire()
+    breaker.release(trial)  # 결과 없이 끝난 시험 호출 → 다음 호출이 다시 시험 가능
+    trial = breaker.acquire()
+    assert trial is not None and trial.trial
+    breaker.record_success(trial)
+    assert breaker.state == "closed"
+
+    # ResilientLLM: 연속 실패로 열리면 모델을 호출하지 않고 바로 거절
+    class Failing:
+        calls = 0
+
+        def invoke(self, messages, **kwargs):
+            Failing.calls += 1
+            raise RuntimeError("provider down")
+
+    llm = ResilientLLM(Failing(), name="offline-test", max_attempts=1, timeout=1.0, hedge_percentile=0)
+    llm.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        try:
+            llm.invoke("hi")
+        except RuntimeError:
+            pass
+    try:
+        llm.invoke("hi")
+        raise AssertionError("브레이커가 열리지 않았습니다")
+    except CircuitOpenError:
+        pass
+    assert Failing.calls == 2 and llm.stats()["rejected"] == 1
+    print(f"   ✅ closed → open → half_open → closed, 열린 동안 거절 {llm.stats()['rejected']}회")
+
+
+OFFLINE_TESTS = [
+    test_user_profile, test_offline_incremental_sync, test_offline_bulk_retry, test_offline_hydrate_search,
+    test_offline_answer_cache_and_mmr, test_offline_singleflight, test_offline_circuit_breaker
+]
+
+
 def main():
     print("=" * 50)
     print("🏃 FitLife AI - 통합 테스트")
     print("=" * 50)
     
-    tests = [test_config, test_user_profile, test_knowledge_base, test_rag, test_xai]
+    tests = [test_config, test_user_profile, test_knowledge_base, test_rag, test_xai] + OFFLINE_TESTS[1:]
+    if "--offline" in sys.argv:
+        tests = OFFLINE_TESTS
     passed = 0
     
     for test in tests:
@@ -62,6 +289,8 @@ def main():
     
     print("=" * 50)
     print(f"결과: {passed}/{len(tests)} 통과")
+    if passed < len(tests):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()